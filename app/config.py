@@ -15,6 +15,14 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str = ""
     SUPABASE_BUCKET: str = "user_uploads"
     GOOGLE_CLIENT_ID: str | None = None
+    TTS_CACHE_DIR: str = "cache/tts"
+    TTS_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    LLM_CACHE_DIR: str = "cache/llm"
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    MODEL_FALLBACKS: dict[str, list[str]] = {} # Per call site model chain overrides, e.g. {"clips": ["gemini-2.5-flash"]}
+    LLM_HEDGE_BUDGET: float = 0.0 # Opt-in: max extra calls from hedging as a fraction of hedgeable calls, e.g. 0.05
+    REDIS_URL: str | None = None # Shared lock store for cross-worker request coalescing
     
     model_config = ConfigDict(env_file=".env")
 
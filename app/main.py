@@ -10,12 +10,24 @@ from slowapi.errors import RateLimitExceeded
 from contextlib import asynccontextmanager
 from app.database import engine, get_db, Base
 from app.config import settings
-from app.services.gemini_engine import process_video_content
+from app.services.gemini_engine import process_video_content, extract_video_id
+from app.services.singleflight import video_flight, make_key
 from app.routers import auth, editor, legal, upload, analytics
 from app.models import SlideDeck, User
+from app.services.deck_service import write_deck_content
+from app.services import metrics, model_guard
+from app.services.model_guard import ModelUnavailableError
 import httpx
 import os
 
+def _video_flight_key(video_url: str, user_tier: str, slide_count: str, language: str) -> str:
+    """Requests for the same video, tier, length and language share one generation."""
+    try:
+        video = extract_video_id(video_url)
+    except ValueError:
+        video = video_url
+    return make_key(video, user_tier, slide_count, language.lower())
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Create tables (if simplified flow)
@@ -55,6 +67,8 @@ app.include_router(upload.router, prefix="/upload", tags=["upload"])
 app.include_router(analytics.router, prefix="/api", tags=["analytics"])
 from app.routers import dashboard
 app.include_router(dashboard.router, prefix="/api", tags=["dashboard"])
+from app.routers import search
+app.include_router(search.router, prefix="/api", tags=["search"])
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -76,6 +90,17 @@ async def handle_error(request: Request, x_n8n_auth: str = Header(None)):
     print(f"CRITICAL_ERROR_LOG: Node {error_data.get('node', 'Unknown')} failed. Message: {error_data.get('message', 'No message')}")
     return {"status": "Agent alerted for repair"}
 
+@app.get("/metrics")
+async def get_metrics(x_n8n_auth: str = Header(None)):
+    if x_n8n_auth != settings.AUTH_SECRET_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    counters = metrics.snapshot()
+    counters["tts_cache_hit_ratio"] = metrics.ratio("tts_cache_hits", "tts_cache_misses")
+    counters["answer_cache_hit_ratio"] = metrics.ratio("answer_cache_hits", "answer_cache_misses")
+    counters["llm_cache_hit_ratio"] = metrics.ratio("llm_cache_hits", "llm_cache_misses")
+    counters["models"] = model_guard.snapshot()
+    return counters
+
 @app.post("/process-video")
 @limiter.limit("5/minute")
 async def process_video_endpoint(
@@ -92,8 +117,13 @@ async def process_video_endpoint(
          raise HTTPException(status_code=401, detail="Unauthorized")
 
     try:
-        result = await process_video_content(video_url, user_tier, user_id, slide_count, language=language)
+        result = await video_flight.do(
+            _video_flight_key(video_url, user_tier, slide_count, language),
+            process_video_content, video_url, user_tier, user_id, slide_count, language=language
+        )
         return result
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print(f"Error processing video: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -192,14 +222,15 @@ async def upload_video_form(
     user_tier = user.tier if user else "student"
     user_id = user.id if user else 1 
     try:
-        result = await process_video_content(video_url, user_tier, user_id, slide_count, language=language)
+        result = await video_flight.do(
+            _video_flight_key(video_url, user_tier, slide_count, language),
+            process_video_content, video_url, user_tier, user_id, slide_count, language=language
+        )
         if user:
-            new_deck = SlideDeck(
-                user_id=user.id,
-                video_url=video_url,
-                summary_content=result.get("content", ""),
-            )
+            new_deck = SlideDeck(user_id=user.id, video_url=video_url)
             db.add(new_deck)
+            await db.flush()
+            await write_deck_content(db, new_deck, "", result.get("content", ""))
             await db.commit()
             await db.refresh(new_deck)
             result["deck_id"] = new_deck.id # Return ID for frontend redirect
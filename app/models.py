@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Text, LargeBinary, UniqueConstraint, DDL, event
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -40,10 +41,110 @@ class SlideDeck(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     video_url = Column(String, nullable=False)
-    summary_content = Column(Text)
+    title = Column(String, nullable=True)
+    preview = Column(String, nullable=True) # First ~100 chars of plain text, filled on write
+    summary_content = deferred(Column(Text)) # Can be huge; only loaded when explicitly requested
     pdf_path = Column(String)
+    version = Column(Integer, default=0, server_default="0", nullable=False) # Bumped on every content change
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+# Library listings page through a user's decks newest-first
+Index("ix_slide_decks_user_id_created_at", SlideDeck.user_id, SlideDeck.created_at.desc())
+
+class DeckVersion(Base):
+    __tablename__ = "deck_versions"
+    __table_args__ = (UniqueConstraint("deck_id", "version", name="uq_deck_versions_deck_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    deck_id = Column(Integer, ForeignKey("slide_decks.id", ondelete="CASCADE"), nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False) # snapshot (zlib full text) or delta (zlib JSON text ops)
+    payload = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SearchDocument(Base):
+    """Plain-text copy of a deck or generated artifact, kept for full-text search."""
+    __tablename__ = "search_documents"
+    __table_args__ = (UniqueConstraint("deck_id", "kind", name="uq_search_documents_deck_kind"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    deck_id = Column(Integer, ForeignKey("slide_decks.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String, nullable=False) # deck, quiz, flashcards, ...
+    title = Column(String)
+    body = Column(Text)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Postgres: a generated, weighted tsvector column with a GIN index
+event.listen(SearchDocument.__table__, "after_create", DDL(
+    "ALTER TABLE search_documents ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED"
+).execute_if(dialect="postgresql"))
+event.listen(SearchDocument.__table__, "after_create", DDL(
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_search_vector ON search_documents USING GIN (search_vector)"
+).execute_if(dialect="postgresql"))
+
+# SQLite (dev/tests): an external-content FTS5 table kept in sync by triggers
+event.listen(SearchDocument.__table__, "after_create", DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents_fts USING fts5("
+    "title, body, content='search_documents', content_rowid='id', tokenize='porter unicode61')"
+).execute_if(dialect="sqlite"))
+event.listen(SearchDocument.__table__, "after_create", DDL(
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+).execute_if(dialect="sqlite"))
+event.listen(SearchDocument.__table__, "after_create", DDL(
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END"
+).execute_if(dialect="sqlite"))
+event.listen(SearchDocument.__table__, "after_create", DDL(
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+).execute_if(dialect="sqlite"))
+event.listen(SearchDocument.__table__, "before_drop", DDL(
+    "DROP TABLE IF EXISTS search_documents_fts"
+).execute_if(dialect="sqlite"))
+
+class DeckArtifact(Base):
+    """A generated study artifact (quiz, slides, ...) saved against the deck it was made from."""
+    __tablename__ = "deck_artifacts"
+    __table_args__ = (UniqueConstraint("deck_id", "artifact_type", "params_hash", name="uq_deck_artifacts_deck_type_params"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    deck_id = Column(Integer, ForeignKey("slide_decks.id", ondelete="CASCADE"), nullable=False, index=True)
+    artifact_type = Column(String, nullable=False) # slides, quiz, flashcards, blog, carousel, audio_script
+    params_hash = Column(String, nullable=False) # Hash of source text + generation options
+    deck_version = Column(Integer, nullable=False, default=0) # Deck content version it was generated from
+    payload = Column(LargeBinary, nullable=False) # zlib-compressed JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ChatSession(Base):
+    """Server-side tutoring chat about one deck or video."""
+    __tablename__ = "chat_sessions"
+
+    id = Column(String, primary_key=True) # Random hex token, also used as the client handle
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    deck_id = Column(Integer, ForeignKey("slide_decks.id", ondelete="CASCADE"), nullable=True, index=True)
+    video_url = Column(String, nullable=True)
+    summary = Column(Text, nullable=False, default="") # Running summary of compacted older turns
+    history_json = Column(Text, nullable=False, default="[]") # Most recent turns only
+    turn_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ContentBlob(Base):
+    """Uploaded editor text, stored once per content hash and referenced by content_id."""
+    __tablename__ = "content_blobs"
+
+    id = Column(String, primary_key=True) # sha256 hex of the UTF-8 text
+    data = Column(LargeBinary, nullable=False) # zlib-compressed text
+    size = Column(Integer, nullable=False) # Uncompressed bytes
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True) # Pushed back on every upload and read
+
 class AnalyticsEvent(Base):
     __tablename__ = "analytics_events"
 
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, desc
-from app.database import get_db
+from app.database import get_db, engine
 from app.models import User, AnalyticsEvent, SlideDeck
 from app.routers.auth import get_replit_user
 from pydantic import BaseModel
 from typing import Optional, List
 import datetime
+import csv
+import io
+import json
+import zlib
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -85,3 +90,120 @@ async def get_analytics_dashboard(
     except Exception as e:
         print(f"Analytics Dashboard Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+# Rows fetched per connection checkout during exports. Each batch is read through a
+# server-side cursor and the connection goes back to the pool before the next one,
+# so a slow download never pins a pooled connection for the whole export.
+EXPORT_BATCH_SIZE = 5000
+EXPORT_PARTITION_SIZE = 500
+EXPORT_COLUMNS = ["id", "timestamp", "user_id", "user_email", "event_type", "resource_id", "metadata"]
+
+def _export_query(class_code: str, start: Optional[datetime.datetime], end: Optional[datetime.datetime]):
+    query = (
+        select(
+            AnalyticsEvent.id,
+            AnalyticsEvent.timestamp,
+            AnalyticsEvent.user_id,
+            User.email,
+            AnalyticsEvent.event_type,
+            AnalyticsEvent.resource_id,
+            AnalyticsEvent.metadata_json,
+        )
+        .join(User, User.id == AnalyticsEvent.user_id)
+        .where(User.joined_class_code == class_code)
+    )
+    if start:
+        query = query.where(AnalyticsEvent.timestamp >= start)
+    if end:
+        query = query.where(AnalyticsEvent.timestamp < end)
+    return query
+
+async def _iter_event_rows(query):
+    """Yields lists of plain row tuples, keyset-paginated on the event id."""
+    last_id = 0
+    while True:
+        fetched = 0
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                query.where(AnalyticsEvent.id > last_id)
+                .order_by(AnalyticsEvent.id)
+                .limit(EXPORT_BATCH_SIZE)
+                .execution_options(yield_per=EXPORT_PARTITION_SIZE)
+            )
+            async for partition in result.partitions():
+                fetched += len(partition)
+                last_id = partition[-1][0]
+                yield partition
+        if fetched < EXPORT_BATCH_SIZE:
+            break
+
+def _encode_rows(rows, fmt: str) -> str:
+    if fmt == "ndjson":
+        lines = []
+        for row in rows:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            if record["timestamp"] is not None:
+                record["timestamp"] = record["timestamp"].isoformat()
+            lines.append(json.dumps(record))
+        return "\n".join(lines) + "\n"
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        row = list(row)
+        if row[1] is not None:
+            row[1] = row[1].isoformat()
+        writer.writerow(row)
+    return buffer.getvalue()
+
+async def _stream_export(query, fmt: str, compress: bool):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        header = io.StringIO()
+        csv.writer(header).writerow(EXPORT_COLUMNS)
+        yield _emit(header.getvalue())
+
+    async for rows in _iter_event_rows(query):
+        chunk = _emit(_encode_rows(rows, fmt))
+        if chunk:
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
+
+@router.get("/export")
+async def export_events(
+    format: str = "csv",
+    gzip: bool = False,
+    class_code: Optional[str] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_replit_user)
+):
+    """Streams raw events of a professor's class as CSV or NDJSON (optionally gzipped)."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    if user.tier != "professor" or not user.my_class_code:
+        raise HTTPException(status_code=403, detail="Only professors with a class can export events")
+    if class_code and class_code != user.my_class_code:
+        raise HTTPException(status_code=403, detail="You can only export your own class")
+
+    query = _export_query(user.my_class_code, start, end)
+    # The auth lookup checked out a connection; hand it back before streaming starts.
+    await db.close()
+
+    filename = f"analytics_export.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        _stream_export(query, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -1,38 +1,87 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import undefer
 from app.database import get_db
-from app.models import SlideDeck
+from sqlalchemy.exc import IntegrityError
+from app.models import SlideDeck, DeckVersion
 from app.routers import auth
+from app.services.deck_service import write_deck_content, DEFAULT_DECK_TITLE
+from app.services.deck_history import apply_ops, load_version
+import base64
+import datetime
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 100
+
+def _encode_cursor(created_at, deck_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{deck_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, deck_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(created_at), int(deck_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _deck_listing_query(user_id: int):
+    # Only the listing columns: summary_content is never read here
+    return (
+        select(SlideDeck.id, SlideDeck.title, SlideDeck.preview, SlideDeck.video_url, SlideDeck.created_at)
+        .where(SlideDeck.user_id == user_id)
+        .order_by(SlideDeck.created_at.desc(), SlideDeck.id.desc())
+    )
+
 @router.get("/recent-activity")
 async def get_recent_activity(user = Depends(auth.get_replit_user), db: AsyncSession = Depends(get_db)):
     if not user:
         return []
         
-    result = await db.execute(
-        select(SlideDeck).where(SlideDeck.user_id == user.id).order_by(SlideDeck.created_at.desc()).limit(5)
-    )
-    recent_decks = result.scalars().all()
+    result = await db.execute(_deck_listing_query(user.id).limit(5))
+    recent_decks = result.all()
     
     return [
         {
             "id": deck.id,
-            "title": "Video Summary", 
+            "title": deck.title or DEFAULT_DECK_TITLE,
             "date": deck.created_at.strftime("%b %d, %Y") if deck.created_at else "Recently",
             "url": deck.video_url,
-            "preview": deck.summary_content[:100] + "..." if deck.summary_content else ""
+            "preview": deck.preview or ""
         }
         for deck in recent_decks
     ]
 
+def _deck_etag(deck) -> str:
+    # The version counter changes with every content write, so no hashing is needed
+    return f'"deck-{deck.id}-v{deck.version or 0}"'
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+async def _load_content(db: AsyncSession, deck_id: int) -> str:
+    result = await db.execute(select(SlideDeck.summary_content).where(SlideDeck.id == deck_id))
+    return result.scalar() or ""
+
 @router.get("/api/deck/{deck_id}")
-async def get_deck_content(deck_id: int, user = Depends(auth.get_replit_user), db: AsyncSession = Depends(get_db)):
+async def get_deck_content(
+    deck_id: int,
+    request: Request,
+    response: Response,
+    user = Depends(auth.get_replit_user),
+    db: AsyncSession = Depends(get_db)
+):
     if not user:
          return {"error": "Unauthorized"}, 401
          
+    # summary_content stays deferred until we know the client's copy is stale
     result = await db.execute(
         select(SlideDeck).where(SlideDeck.id == deck_id, SlideDeck.user_id == user.id)
     )
@@ -40,21 +89,49 @@ async def get_deck_content(deck_id: int, user = Depends(auth.get_replit_user), d
     
     if not deck:
         return {"error": "Deck not found"}, 404
+
+    etag = _deck_etag(deck)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
         
     return {
         "id": deck.id,
-        "title": "Video Summary", # In real app, store title in DB
-        "content": deck.summary_content,
-        "video_url": deck.video_url
+        "title": deck.title or DEFAULT_DECK_TITLE,
+        "content": await _load_content(db, deck.id),
+        "video_url": deck.video_url,
+        "version": deck.version or 0
     }
 
 from pydantic import BaseModel
 
 class DeckUpdate(BaseModel):
-    content: str
+    content: str | None = None # Full replacement
+    base_version: int | None = None # Version the client edited; required with ops
+    ops: list | None = None # Text ops: {"retain": n} | {"insert": "..."} | {"delete": n}
+
+async def _get_owned_deck(db: AsyncSession, deck_id: int, user, with_content: bool = False):
+    query = select(SlideDeck).where(SlideDeck.id == deck_id, SlideDeck.user_id == user.id)
+    if with_content:
+        query = query.options(undefer(SlideDeck.summary_content))
+    deck = (await db.execute(query)).scalars().first()
+    if not deck:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return deck
+
+def _version_conflict(current_version: int):
+    return HTTPException(status_code=409, detail={"error": "Version conflict", "version": current_version})
 
 @router.put("/api/deck/{deck_id}")
-async def save_deck_content(deck_id: int, update: DeckUpdate, user = Depends(auth.get_replit_user), db: AsyncSession = Depends(get_db)):
+async def save_deck_content(
+    deck_id: int,
+    update: DeckUpdate,
+    request: Request,
+    response: Response,
+    user = Depends(auth.get_replit_user),
+    db: AsyncSession = Depends(get_db)
+):
     if not user:
         return {"error": "Unauthorized"}, 401
     
@@ -63,27 +140,129 @@ async def save_deck_content(deck_id: int, update: DeckUpdate, user = Depends(aut
     
     if not deck:
         return {"error": "Deck not found"}, 404
-        
-    deck.summary_content = update.content
+
+    current_version = deck.version or 0
+    if_match = request.headers.get("If-Match")
+    if if_match and not _etag_matches(if_match, _deck_etag(deck)):
+        raise HTTPException(
+            status_code=412,
+            detail={"error": "Deck was modified elsewhere", "version": current_version},
+            headers={"ETag": _deck_etag(deck)}
+        )
+    if update.base_version is not None and update.base_version != current_version:
+        raise _version_conflict(current_version)
+
+    current_content = await _load_content(db, deck.id)
+    if update.ops is not None:
+        if update.base_version is None:
+            raise HTTPException(status_code=400, detail="base_version is required when sending ops")
+        try:
+            new_content = apply_ops(current_content, update.ops)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif update.content is not None:
+        new_content = update.content
+    else:
+        raise HTTPException(status_code=400, detail="Send either content or ops")
+
+    if new_content == current_content:
+        # Redundant autosave: nothing to write
+        response.headers["ETag"] = _deck_etag(deck)
+        return {"status": "unchanged", "version": current_version}
+
+    version = await write_deck_content(db, deck, current_content, new_content, update.ops)
     db.add(deck)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another save claimed this version number first
+        await db.rollback()
+        raise _version_conflict(current_version + 1)
     
-    return {"status": "saved"}
+    response.headers["ETag"] = _deck_etag(deck)
+    return {"status": "saved", "version": version}
 
-@router.get("/api/decks")
-async def get_all_decks(user = Depends(auth.get_replit_user), db: AsyncSession = Depends(get_db)):
+@router.get("/api/deck/{deck_id}/versions")
+async def list_deck_versions(deck_id: int, user = Depends(auth.get_replit_user), db: AsyncSession = Depends(get_db)):
     if not user:
-        return []
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    await _get_owned_deck(db, deck_id, user)
 
     result = await db.execute(
-        select(SlideDeck).where(SlideDeck.user_id == user.id).order_by(SlideDeck.created_at.desc()).limit(20)
+        select(DeckVersion.version, DeckVersion.kind, DeckVersion.created_at)
+        .where(DeckVersion.deck_id == deck_id)
+        .order_by(DeckVersion.version.desc())
+        .limit(100)
     )
-    decks = result.scalars().all()
+    return [
+        {
+            "version": row.version,
+            "kind": row.kind,
+            "date": row.created_at.isoformat() if row.created_at else None
+        }
+        for row in result.all()
+    ]
+
+@router.get("/api/deck/{deck_id}/versions/{version}")
+async def get_deck_version(deck_id: int, version: int, user = Depends(auth.get_replit_user), db: AsyncSession = Depends(get_db)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    await _get_owned_deck(db, deck_id, user)
+
+    content = await load_version(db, deck_id, version)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return {"id": deck_id, "version": version, "content": content}
+
+@router.post("/api/deck/{deck_id}/versions/{version}/restore")
+async def restore_deck_version(deck_id: int, version: int, user = Depends(auth.get_replit_user), db: AsyncSession = Depends(get_db)):
+    """Undo: makes an old version's content the newest version."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    deck = await _get_owned_deck(db, deck_id, user, with_content=True)
+
+    content = await load_version(db, deck_id, version)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    new_version = await write_deck_content(db, deck, deck.summary_content or "", content)
+    db.add(deck)
+    await db.commit()
+    return {"status": "restored", "version": new_version, "content": content}
+
+@router.get("/api/decks")
+async def get_all_decks(
+    response: Response,
+    limit: int = 20,
+    cursor: str | None = None,
+    user = Depends(auth.get_replit_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Keyset-paginated library listing. The next page cursor is sent in X-Next-Cursor."""
+    if not user:
+        return []
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = _deck_listing_query(user.id)
+    if cursor:
+        created_at, last_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            SlideDeck.created_at < created_at,
+            and_(SlideDeck.created_at == created_at, SlideDeck.id < last_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    decks = result.all()
+    if len(decks) > limit:
+        decks = decks[:limit]
+        last = decks[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
     
     return [
         {
             "id": deck.id,
-            "title": "Video Summary",  # Placeholder title
+            "title": deck.title or DEFAULT_DECK_TITLE,
             "date": deck.created_at.strftime("%b %d") if deck.created_at else "Recently"
         }
         for deck in decks
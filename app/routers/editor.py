@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Response, Depends
+from fastapi import APIRouter, HTTPException, Response, Depends, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from fpdf import FPDF
 import io
@@ -12,13 +13,37 @@ from app.services.gemini_engine import (
     generate_flashcards_from_text, 
     identify_viral_clips,
     generate_audio_script,
+    stream_audio_script,
+    stream_study_items,
     chat_with_video,
+    extract_video_id,
     generate_blog_from_text,
     generate_carousel_from_text
 )
-from app.services.audio_engine import synthesize_podcast_audio
+from app.services.audio_engine import synthesize_podcast_audio, stream_podcast_audio
+from app.services.mp3_frames import index_path_for
+from app.services.clip_renderer import render_clips
+from app.services.singleflight import generation_flight, make_key
+from app.services import llm_cache
+from app.services.model_guard import ModelUnavailableError, call_with_fallback, model_chain, run_model_call
+from app.services.hedging import hedged, hedge_model
+from app.routers.upload import UPLOAD_BASE_DIR, remove_file_after_delay
 from app.routers.auth import get_replit_user
+from app.limiter import limiter
+from app.database import get_db, AsyncSessionLocal
+from app.models import SlideDeck, ChatSession
+from app.services.content_store import store_content, load_content, content_info
+from app.services.chat_sessions import get_history, record_exchange
+from app.services.deck_service import strip_html
+from app.services.deck_artifacts import params_hash, save_artifact, load_artifact
+from app.services.search_index import index_document, artifact_to_text
+from sqlalchemy import select
+import aiofiles
+from pathlib import Path
+import asyncio
 import json
+import math
+import re
 import uuid
 
 router = APIRouter()
@@ -30,50 +55,160 @@ class RewriteRequest(BaseModel):
     tone: str
 
 class StudyRequest(BaseModel):
-    text: str
+    text: str = ""
+    content_id: str | None = None # From POST /editor/content; replaces text
     language: str = "English"
+    deck_id: int | None = None # When set, the result is indexed for search under this deck
 
 class ClipsRequest(BaseModel):
     video_url: str
+    render: bool = False # Also cut the clips out of an uploaded copy of the video
+    source_path: str | None = None # Upload path returned by /upload/upload-content
 
 class PPTXRequest(BaseModel):
-    text: str
+    text: str = ""
+    content_id: str | None = None
     theme: str = "default"
     aspect_ratio: str = "16:9" 
     writing_style: str = "neutral"
     slide_count: int = 10
     html_content: str = None 
+    html_content_id: str | None = None
     language: str = "English"
 
 class ReportRequest(BaseModel):
-    text: str
+    text: str = ""
+    content_id: str | None = None
 
 class AudioRequest(BaseModel):
-    text: str 
+    text: str = ""
+    content_id: str | None = None
     language: str = "English"
+    deck_id: int | None = None
 
 class ScriptRequest(BaseModel):
     script: list 
 
 class ChatRequest(BaseModel):
-    text: str 
+    text: str = ""
+    content_id: str | None = None
     history: list = [] 
     question: str
+    video_url: str | None = None # Lets the server retrieve from the full cached transcript
 
-async def _generate_pdf_bytes(request: PPTXRequest, user) -> bytes:
-    json_str = await convert_text_to_slides_json(
-        request.text, 
-        count=request.slide_count, 
+STUDY_PACK_ARTIFACTS = ("slides", "quiz", "flashcards", "blog", "carousel", "audio_script")
+
+class StudyPackRequest(BaseModel):
+    text: str = ""
+    content_id: str | None = None
+    artifacts: list[str] = list(STUDY_PACK_ARTIFACTS)
+    language: str = "English"
+    deck_id: int | None = None # Persist the artifacts under this deck
+    slide_count: int = 10
+    writing_style: str = "neutral"
+
+class ContentRequest(BaseModel):
+    text: str
+
+class ChatSessionRequest(BaseModel):
+    deck_id: int | None = None
+    video_url: str | None = None
+
+class ChatMessageRequest(BaseModel):
+    question: str
+
+def _generation_failed(e: Exception, status_code: int) -> HTTPException:
+    """Overloaded models become a retryable 503; other errors keep the endpoint's status."""
+    if isinstance(e, ModelUnavailableError):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return HTTPException(status_code=status_code, detail=str(e))
+
+async def _resolve_content(db, request):
+    """Replaces content_id / html_content_id references with the stored text."""
+    for id_field, text_field in (("content_id", "text"), ("html_content_id", "html_content")):
+        content_id = getattr(request, id_field, None)
+        if not content_id:
+            continue
+        text = await load_content(db, content_id)
+        if text is None:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired {id_field}")
+        setattr(request, text_field, text)
+
+@router.post("/content")
+@limiter.limit("10/minute")
+async def upload_content(request: Request, content: ContentRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    """Stores editor text once; pass the returned content_id instead of text afterwards."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        blob = await store_content(db, content.text)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"content_id": blob.id, "size": blob.size, "expires_at": blob.expires_at}
+
+@router.get("/content/{content_id}")
+async def get_content_info(content_id: str, db = Depends(get_db)):
+    """Lets clients skip re-uploading text the server already has."""
+    info = await content_info(db, content_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="Content not found")
+    return info
+
+async def _index_deck_artifact(db, user, deck_id: int | None, kind: str, data):
+    """Makes a generated artifact searchable under the user's deck. Best effort."""
+    if not user or not deck_id:
+        return
+    try:
+        result = await db.execute(select(SlideDeck.title).where(SlideDeck.id == deck_id, SlideDeck.user_id == user.id))
+        row = result.first()
+        if not row:
+            return
+        await index_document(db, user.id, deck_id, kind, row.title, artifact_to_text(kind, data))
+        await db.commit()
+    except Exception as e:
+        print(f"Search indexing failed for deck {deck_id} ({kind}): {e}")
+
+SEARCHABLE_ARTIFACTS = {"quiz", "flashcards", "blog", "carousel"}
+
+def _artifact_key(kind: str, text: str, language: str, slide_count: int = 10, writing_style: str = "neutral") -> str:
+    options = {"count": slide_count, "tone": writing_style} if kind == "slides" else {}
+    return params_hash(kind, text, language=language, **options)
+
+async def _owned_deck_version(db, user, deck_id: int | None) -> int | None:
+    """Current content version of the caller's deck, or None if there is no such deck."""
+    if not user or not deck_id:
+        return None
+    result = await db.execute(select(SlideDeck.version).where(SlideDeck.id == deck_id, SlideDeck.user_id == user.id))
+    return result.scalar()
+
+async def _save_deck_artifact(db, user, deck_id: int, deck_version: int | None, kind: str, key: str, data):
+    """Stores a freshly generated artifact for the deck and makes it searchable. Best effort."""
+    if deck_version is None:
+        return
+    try:
+        await save_artifact(db, deck_id, kind, key, data, deck_version)
+        await db.commit()
+    except Exception as e:
+        print(f"Saving {kind} for deck {deck_id} failed: {e}")
+        await db.rollback()
+    if kind in SEARCHABLE_ARTIFACTS:
+        await _index_deck_artifact(db, user, deck_id, kind, data)
+
+async def _slides_json(request: PPTXRequest) -> str:
+    """Slide JSON for an export; identical concurrent exports share one generation."""
+    return await generation_flight.do(
+        make_key("slides", request.text, request.slide_count, request.writing_style, request.html_content, request.language),
+        convert_text_to_slides_json,
+        request.text,
+        count=request.slide_count,
         tone=request.writing_style,
         html_content=request.html_content,
         language=request.language
     )
 
-    try:
-        slide_data = json.loads(json_str)
-    except Exception as e:
-         print(f"JSON Parse Error: {e} | Content: {json_str[:100]}...")
-         slide_data = [{"title": "Error Parsing Slides", "content": "The AI response could not be parsed."}]
+async def _generate_pdf_bytes(request: PPTXRequest, user) -> bytes:
+    # The generator repairs malformed model output, so this is always valid JSON
+    slide_data = json.loads(await _slides_json(request))
 
     if request.aspect_ratio == "1:1":
         pdf = FPDF(orientation='P', unit='mm', format=(200, 200))
@@ -157,7 +292,8 @@ async def _generate_pdf_bytes(request: PPTXRequest, user) -> bytes:
     return pdf.output()
 
 @router.post("/export-pdf")
-async def generate_text_report(request: ReportRequest):
+async def generate_text_report(request: ReportRequest, db = Depends(get_db)):
+    await _resolve_content(db, request)
     try:
         pdf = FPDF(orientation='P', unit='mm', format='A4')
         pdf.add_page()
@@ -176,77 +312,182 @@ async def generate_text_report(request: ReportRequest):
         pdf.cell(0, 10, "Generated by MODYFIRE", align='C')
         return Response(content=bytes(pdf.output()), headers={"Content-Disposition": "attachment; filename='summary_report.pdf'"}, media_type="application/pdf")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _generation_failed(e, 500)
 
 @router.post("/export-slides-pdf")
-async def generate_user_slides_pdf(request: PPTXRequest, user = Depends(get_replit_user)):
+async def generate_user_slides_pdf(request: PPTXRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
     try:
         pdf_bytes = await _generate_pdf_bytes(request, user)
         return Response(content=bytes(pdf_bytes), headers={"Content-Disposition": "attachment; filename='study_slides.pdf'"}, media_type="application/pdf")
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _generation_failed(e, 400)
 
 @router.post("/preview-pdf")
-async def preview_user_slides_pdf(request: PPTXRequest, user = Depends(get_replit_user)):
+async def preview_user_slides_pdf(request: PPTXRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
     try:
         pdf_bytes = await _generate_pdf_bytes(request, user)
         return Response(content=bytes(pdf_bytes), headers={"Content-Disposition": "inline; filename='preview.pdf'"}, media_type="application/pdf")
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _generation_failed(e, 400)
 
 @router.post("/export-pptx")
-async def generate_user_pptx(request: PPTXRequest, user = Depends(get_replit_user)):
+async def generate_user_pptx(request: PPTXRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
     try:
-        json_str = await convert_text_to_slides_json(request.text, count=request.slide_count, tone=request.writing_style, html_content=request.html_content, language=request.language)
+        json_str = await _slides_json(request)
         slide_data = json.loads(json_str)
         pptx_bytes = generate_pptx(slide_data, watermark=(not user or (user.tier == "student" and user.credits <= 1)), theme_name=request.theme, aspect_ratio=request.aspect_ratio)
         return Response(content=pptx_bytes, headers={"Content-Disposition": "attachment; filename='study_notes.pptx'"}, media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation")
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _generation_failed(e, 400)
 
 @router.post("/rewrite")
 async def rewrite_text(request: RewriteRequest):
     try:
         prompt = f"Rewrite the following text to be {request.tone}. Text: {request.text}"
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt
+        primary = model_chain("rewrite")[0]
+        alternate = hedge_model("rewrite")
+        attempt = lambda model: (client.models.generate_content(model=model, contents=prompt), model)
+        send = lambda: hedged(
+            ("rewrite", primary), lambda: call_with_fallback("rewrite", attempt),
+            lambda: call_with_fallback("rewrite", attempt, prefer=alternate), ("rewrite", alternate or primary)
         )
+        response = await run_model_call(llm_cache.generate, client, primary, prompt, send=send)
         return {"rewritten_text": response.text}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _generation_failed(e, 500)
 
 @router.post("/generate-quiz")
-async def create_quiz(request: StudyRequest):
+async def create_quiz(request: StudyRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
+    deck_version = await _owned_deck_version(db, user, request.deck_id)
+    key = _artifact_key("quiz", request.text, request.language)
+    if deck_version is not None:
+        cached = await load_artifact(db, request.deck_id, "quiz", key, deck_version)
+        if cached is not None:
+            return {"questions": cached}
     try:
-        json_str = await generate_quiz_from_text(request.text, language=request.language)
-        return {"questions": json.loads(json_str)}
+        json_str = await generation_flight.do(make_key("quiz", request.text, request.language), generate_quiz_from_text, request.text, language=request.language)
+        questions = json.loads(json_str)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _generation_failed(e, 400)
+    await _save_deck_artifact(db, user, request.deck_id, deck_version, "quiz", key, questions)
+    return {"questions": questions}
 
 @router.post("/generate-flashcards")
-async def create_flashcards(request: StudyRequest):
+async def create_flashcards(request: StudyRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
+    deck_version = await _owned_deck_version(db, user, request.deck_id)
+    key = _artifact_key("flashcards", request.text, request.language)
+    if deck_version is not None:
+        cached = await load_artifact(db, request.deck_id, "flashcards", key, deck_version)
+        if cached is not None:
+            return {"flashcards": cached}
     try:
-        json_str = await generate_flashcards_from_text(request.text, language=request.language)
-        return {"flashcards": json.loads(json_str)}
+        json_str = await generation_flight.do(make_key("flashcards", request.text, request.language), generate_flashcards_from_text, request.text, language=request.language)
+        flashcards = json.loads(json_str)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _generation_failed(e, 400)
+    await _save_deck_artifact(db, user, request.deck_id, deck_version, "flashcards", key, flashcards)
+    return {"flashcards": flashcards}
+
+STREAMABLE_ARTIFACTS = ("slides", "quiz", "flashcards")
+
+@router.post("/stream/{artifact_type}")
+async def stream_study_artifact(artifact_type: str, request: PPTXRequest, db = Depends(get_db)):
+    """
+    Streams slides, quiz questions or flashcards as NDJSON, one {"item": ...}
+    line per element as soon as the model has written it, then a final status line.
+    """
+    if artifact_type not in STREAMABLE_ARTIFACTS:
+        raise HTTPException(status_code=404, detail="Unknown artifact type")
+    await _resolve_content(db, request)
+
+    async def _stream():
+        count = 0
+        try:
+            async for item in stream_study_items(
+                artifact_type, request.text, language=request.language, count=request.slide_count,
+                tone=request.writing_style, html_content=request.html_content
+            ):
+                count += 1
+                yield json.dumps({"item": item}) + "\n"
+        except Exception as e:
+            yield json.dumps({"status": "error", "error": str(e), "count": count}) + "\n"
+            return
+        yield json.dumps({"status": "done", "count": count}) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+MAX_RENDERED_CLIPS = 10
+
+def _resolve_upload(source_path: str, user_id: int) -> Path:
+    """Only files inside the caller's own upload folder can be rendered."""
+    user_dir = (UPLOAD_BASE_DIR / str(user_id)).resolve()
+    if source_path.startswith("/uploads/"):
+        source_path = UPLOAD_BASE_DIR.name + source_path[len("/uploads"):]
+    path = Path(source_path)
+    if not path.is_absolute() and path.parts[:1] != (UPLOAD_BASE_DIR.name,):
+        path = user_dir / path
+    path = path.resolve()
+    if user_dir not in path.parents or not path.is_file():
+        raise HTTPException(status_code=404, detail="Source video not found")
+    return path
 
 @router.post("/generate-clips")
-async def create_viral_clips(request: ClipsRequest):
+async def create_viral_clips(request: ClipsRequest, background_tasks: BackgroundTasks, user = Depends(get_replit_user)):
+    source = None
+    if request.render:
+        if not request.source_path:
+            raise HTTPException(status_code=400, detail="source_path is required when render is true")
+        user_id = user.id if user else 1
+        source = _resolve_upload(request.source_path, user_id)
+
     try:
-        json_str = await identify_viral_clips(request.video_url)
-        return {"clips": json.loads(json_str)}
+        json_str = await generation_flight.do(make_key("clips", request.video_url), identify_viral_clips, request.video_url)
+        clips = json.loads(json_str)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _generation_failed(e, 400)
+
+    if source is None:
+        return {"clips": clips}
+
+    clips_dir = source.parent / "clips"
+    try:
+        results = await render_clips(str(source), clips[:MAX_RENDERED_CLIPS], str(clips_dir), prefix=f"{source.stem}_{uuid.uuid4().hex[:8]}")
+    except RuntimeError as e:
+        print(f"Clip render failed for {source.name}: {e}")
+        raise HTTPException(status_code=422, detail="source_path is not a readable video")
+    for clip, result in zip(clips, results):
+        if not isinstance(clip, dict):
+            continue
+        if "output" in result:
+            output = Path(result["output"])
+            background_tasks.add_task(remove_file_after_delay, output)
+            clip["clip_url"] = f"/uploads/{user_id}/clips/{output.name}"
+            clip["render_mode"] = result["mode"]
+        else:
+            clip["render_error"] = result["error"]
+    return {"clips": clips}
 
 @router.post("/generate-audio-script")
-async def create_audio_script(request: AudioRequest):
+async def create_audio_script(request: AudioRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
+    deck_version = await _owned_deck_version(db, user, request.deck_id)
+    key = _artifact_key("audio_script", request.text, request.language)
+    if deck_version is not None:
+        cached = await load_artifact(db, request.deck_id, "audio_script", key, deck_version)
+        if cached is not None:
+            return {"script": cached}
     try:
-        json_str = await generate_audio_script(request.text, language=request.language)
-        return {"script": json.loads(json_str)}
+        json_str = await generation_flight.do(make_key("audio-script", request.text, request.language), generate_audio_script, request.text, language=request.language)
+        script = json.loads(json_str)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _generation_failed(e, 400)
+    await _save_deck_artifact(db, user, request.deck_id, deck_version, "audio_script", key, script)
+    return {"script": script}
 
 @router.post("/synthesize-audio")
 async def create_audio_file(request: ScriptRequest):
@@ -254,31 +495,372 @@ async def create_audio_file(request: ScriptRequest):
         filename = f"podcast_{uuid.uuid4().hex}.mp3"
         os.makedirs("user_uploads", exist_ok=True)
         abs_path = os.path.abspath(f"user_uploads/{filename}")
-        synthesize_podcast_audio(request.script, output_filename=abs_path)
-        return {"audio_url": f"/uploads/{filename}"}
+        # TTS is blocking network I/O; keep it off the event loop
+        await asyncio.to_thread(synthesize_podcast_audio, request.script, output_filename=abs_path)
+        return {
+            "audio_url": f"/uploads/{filename}",
+            "stream_url": f"/editor/podcast/{filename}",
+            "playlist_url": f"/editor/podcast/{filename}/playlist.m3u8"
+        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _generation_failed(e, 500)
+
+@router.post("/podcast-stream")
+async def stream_podcast(request: AudioRequest, db = Depends(get_db)):
+    """
+    Script generation and speech synthesis in one pipelined call: each dialogue
+    turn is voiced as soon as the model finishes writing it, and MP3 frames are
+    streamed back while later turns are still being generated.
+    """
+    await _resolve_content(db, request)
+    filename = f"podcast_{uuid.uuid4().hex}.mp3"
+    os.makedirs("user_uploads", exist_ok=True)
+    abs_path = os.path.abspath(f"user_uploads/{filename}")
+    turns = stream_audio_script(request.text, language=request.language)
+    return StreamingResponse(
+        stream_podcast_audio(turns, abs_path),
+        media_type="audio/mpeg",
+        headers={
+            "X-Audio-Url": f"/uploads/{filename}",
+            "X-Playlist-Url": f"/editor/podcast/{filename}/playlist.m3u8"
+        }
+    )
+
+PODCAST_FILE_RE = re.compile(r"^podcast_[0-9a-f]{32}\.mp3$")
+RANGE_CHUNK_SIZE = 64 * 1024
+
+def _podcast_path(filename: str) -> str:
+    if not PODCAST_FILE_RE.match(filename):
+        raise HTTPException(status_code=404, detail="Podcast not found")
+    path = os.path.abspath(f"user_uploads/{filename}")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Podcast not found")
+    return path
+
+def _parse_range(header: str, size: int):
+    """Parses a single 'bytes=' range into inclusive (start, end) offsets."""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if match.group(1):
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(match.group(2)), 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+async def _read_file_range(path: str, start: int, end: int):
+    async with aiofiles.open(path, 'rb') as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _load_segment_index(path: str) -> dict:
+    try:
+        with open(index_path_for(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=404, detail="Segment index not found")
+
+@router.get("/podcast/{filename}")
+async def serve_podcast(filename: str, request: Request):
+    """Serves podcast audio with HTTP Range support so players can seek without downloading."""
+    path = _podcast_path(filename)
+    size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, max-age=86400"}
+
+    range_header = request.headers.get("Range")
+    if not range_header:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_read_file_range(path, 0, size - 1), media_type="audio/mpeg", headers=headers)
+
+    start, end = _parse_range(range_header, size)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_read_file_range(path, start, end), status_code=206, media_type="audio/mpeg", headers=headers)
+
+@router.get("/podcast/{filename}/index")
+async def get_podcast_index(filename: str):
+    """Line -> byte/time offsets, for jumping straight to a dialogue line."""
+    return _load_segment_index(_podcast_path(filename))
+
+@router.get("/podcast/{filename}/playlist.m3u8")
+async def get_podcast_playlist(filename: str):
+    """HLS playlist addressing each dialogue line as a byte range of the single MP3."""
+    index = _load_segment_index(_podcast_path(filename))
+    segments = index.get("segments", [])
+    target = max([math.ceil(seg["duration"]) for seg in segments] or [1])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:4",
+        f"#EXT-X-TARGETDURATION:{max(target, 1)}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for seg in segments:
+        lines.append(f"#EXTINF:{seg['duration']:.3f},{seg.get('speaker', '')}")
+        lines.append(f"#EXT-X-BYTERANGE:{seg['byte_length']}@{seg['byte_offset']}")
+        lines.append(f"/editor/podcast/{filename}")
+    lines.append("#EXT-X-ENDLIST")
+    return Response(content="\n".join(lines) + "\n", media_type="application/vnd.apple.mpegurl")
+
+def _class_scope(user) -> str | None:
+    """Answer-cache scope: the class a student joined, or the class a professor runs."""
+    if not user:
+        return None
+    return user.joined_class_code or user.my_class_code
 
 @router.post("/chat-video")
-async def ask_video_question(request: ChatRequest):
+async def ask_video_question(request: ChatRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
     try:
-        answer = await chat_with_video(request.text, request.history, request.question)
+        answer = await chat_with_video(
+            request.text, request.history, request.question,
+            video_url=request.video_url, cache_scope=_class_scope(user)
+        )
         return {"answer": answer}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _generation_failed(e, 500)
+
+@router.post("/chat-sessions")
+async def create_chat_session(request: ChatSessionRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    """Starts a server-side chat; later turns only send the question."""
+    video_url = request.video_url
+    if request.deck_id is not None:
+        if not user:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        result = await db.execute(select(SlideDeck.video_url).where(SlideDeck.id == request.deck_id, SlideDeck.user_id == user.id))
+        row = result.first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Deck not found")
+        video_url = video_url or row.video_url
+    elif not video_url:
+        raise HTTPException(status_code=400, detail="deck_id or video_url is required")
+
+    session = ChatSession(id=uuid.uuid4().hex, user_id=user.id if user else None, deck_id=request.deck_id, video_url=video_url)
+    db.add(session)
+    await db.commit()
+    return {"session_id": session.id}
+
+async def _get_chat_session(db, session_id: str, user) -> ChatSession:
+    session = await db.get(ChatSession, session_id)
+    if not session or (session.user_id is not None and (not user or user.id != session.user_id)):
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return session
+
+@router.get("/chat-sessions/{session_id}")
+async def get_chat_session(session_id: str, user = Depends(get_replit_user), db = Depends(get_db)):
+    session = await _get_chat_session(db, session_id, user)
+    return {
+        "session_id": session.id,
+        "deck_id": session.deck_id,
+        "video_url": session.video_url,
+        "summary": session.summary,
+        "history": get_history(session),
+        "turn_count": session.turn_count,
+    }
+
+@router.post("/chat-sessions/{session_id}/messages")
+async def post_chat_message(session_id: str, request: ChatMessageRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    session = await _get_chat_session(db, session_id, user)
+
+    # Resolve the transcript server-side: the YouTube transcript when the deck
+    # came from a video, otherwise the deck's own text.
+    video_url, text = None, ""
+    try:
+        extract_video_id(session.video_url or "")
+        video_url = session.video_url
+    except ValueError:
+        if session.deck_id is not None:
+            result = await db.execute(select(SlideDeck.summary_content).where(SlideDeck.id == session.deck_id))
+            text = strip_html(result.scalar() or "")
+
+    try:
+        answer = await chat_with_video(
+            text, get_history(session), request.question,
+            video_url=video_url, summary=session.summary, cache_scope=_class_scope(user)
+        )
+    except Exception as e:
+        raise _generation_failed(e, 500)
+    await record_exchange(session, request.question, answer)
+    await db.commit()
+    return {"answer": answer}
 
 @router.post("/generate-blog")
-async def create_blog(request: StudyRequest):
+async def create_blog(request: StudyRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
+    deck_version = await _owned_deck_version(db, user, request.deck_id)
+    key = _artifact_key("blog", request.text, request.language)
+    if deck_version is not None:
+        cached = await load_artifact(db, request.deck_id, "blog", key, deck_version)
+        if cached is not None:
+            return {"blog": cached}
     try:
-        blog_text = await generate_blog_from_text(request.text, language=request.language)
-        return {"blog": blog_text}
+        blog_text = await generation_flight.do(make_key("blog", request.text, request.language), generate_blog_from_text, request.text, language=request.language)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _generation_failed(e, 500)
+    await _save_deck_artifact(db, user, request.deck_id, deck_version, "blog", key, blog_text)
+    return {"blog": blog_text}
 
 @router.post("/generate-carousel")
-async def create_carousel(request: StudyRequest):
+async def create_carousel(request: StudyRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    await _resolve_content(db, request)
+    deck_version = await _owned_deck_version(db, user, request.deck_id)
+    key = _artifact_key("carousel", request.text, request.language)
+    if deck_version is not None:
+        cached = await load_artifact(db, request.deck_id, "carousel", key, deck_version)
+        if cached is not None:
+            return {"carousel": cached}
     try:
-        carousel_text = await generate_carousel_from_text(request.text, language=request.language)
-        return {"carousel": carousel_text}
+        carousel_text = await generation_flight.do(make_key("carousel", request.text, request.language), generate_carousel_from_text, request.text, language=request.language)
+    except Exception as e:
+        raise _generation_failed(e, 500)
+    await _save_deck_artifact(db, user, request.deck_id, deck_version, "carousel", key, carousel_text)
+    return {"carousel": carousel_text}
+
+STUDY_PACK_CONCURRENCY = 3
+
+def _study_pack_job(kind: str, request: StudyPackRequest):
+    """Returns (coalescing key, generator, args, kwargs, output is JSON) for one artifact."""
+    text, language = request.text, request.language
+    if kind == "slides":
+        return (make_key("slides", text, request.slide_count, request.writing_style, None, language),
+                convert_text_to_slides_json, (text,),
+                {"count": request.slide_count, "tone": request.writing_style, "language": language}, True)
+    generators = {
+        "quiz": (generate_quiz_from_text, True),
+        "flashcards": (generate_flashcards_from_text, True),
+        "blog": (generate_blog_from_text, False),
+        "carousel": (generate_carousel_from_text, False),
+        "audio_script": (generate_audio_script, True),
+    }
+    fn, is_json = generators[kind]
+    # Same keys as the single-artifact endpoints, so concurrent requests coalesce
+    key_kind = "audio-script" if kind == "audio_script" else kind
+    return make_key(key_kind, text, language), fn, (text,), {"language": language}, is_json
+
+@router.post("/study-pack")
+async def create_study_pack(request: StudyPackRequest, user = Depends(get_replit_user), db = Depends(get_db)):
+    """
+    Generates several study artifacts from one text concurrently and streams
+    each one as an NDJSON line as soon as it is ready.
+    """
+    unknown = [a for a in request.artifacts if a not in STUDY_PACK_ARTIFACTS]
+    if unknown or not request.artifacts:
+        raise HTTPException(status_code=400, detail=f"Unknown artifacts: {unknown}" if unknown else "No artifacts requested")
+    await _resolve_content(db, request)
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="text or content_id is required")
+
+    deck_id = deck_version = None
+    if request.deck_id is not None:
+        if not user:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        deck_version = await _owned_deck_version(db, user, request.deck_id)
+        if deck_version is None:
+            raise HTTPException(status_code=404, detail="Deck not found")
+        deck_id = request.deck_id
+
+    semaphore = asyncio.Semaphore(STUDY_PACK_CONCURRENCY)
+    artifacts = list(dict.fromkeys(request.artifacts))
+
+    def _key(kind: str) -> str:
+        return _artifact_key(kind, request.text, request.language, request.slide_count, request.writing_style)
+
+    async def _generate(kind: str):
+        # The request's session is closed once streaming starts; use a fresh one
+        if deck_id is not None:
+            async with AsyncSessionLocal() as session:
+                cached = await load_artifact(session, deck_id, kind, _key(kind), deck_version)
+            if cached is not None:
+                return kind, cached, None, True
+        key, fn, args, kwargs, is_json = _study_pack_job(kind, request)
+        async with semaphore:
+            try:
+                output = await generation_flight.do(key, fn, *args, **kwargs)
+                return kind, (json.loads(output) if is_json else output), None, False
+            except Exception as e:
+                return kind, None, str(e), False
+
+    async def _stream():
+        tasks = [asyncio.create_task(_generate(kind)) for kind in artifacts]
+        completed = failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                kind, data, error, cached = await next_done
+                if error is not None:
+                    failed += 1
+                    line = {"artifact": kind, "status": "error", "error": error}
+                else:
+                    completed += 1
+                    line = {"artifact": kind, "status": "ok", "data": data, "cached": cached}
+                    if deck_id is not None and not cached:
+                        async with AsyncSessionLocal() as session:
+                            await _save_deck_artifact(session, user, deck_id, deck_version, kind, _key(kind), data)
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"status": "done", "completed": completed, "failed": failed}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+@router.get("/decks/{deck_id}/artifacts/{artifact_type}")
+async def get_deck_artifact(
+    deck_id: int,
+    artifact_type: str,
+    language: str = "English",
+    slide_count: int = 10,
+    writing_style: str = "neutral",
+    regenerate: bool = False,
+    user = Depends(get_replit_user),
+    db = Depends(get_db)
+):
+    """
+    A deck's study artifact generated from its saved content. Served from the
+    artifact store when it matches the deck's current version, generated and
+    stored on a miss (or when regenerate is set).
+    """
+    if artifact_type not in STUDY_PACK_ARTIFACTS:
+        raise HTTPException(status_code=404, detail="Unknown artifact type")
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    result = await db.execute(
+        select(SlideDeck.version, SlideDeck.summary_content).where(SlideDeck.id == deck_id, SlideDeck.user_id == user.id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Deck not found")
+
+    text = strip_html(row.summary_content or "")
+    key = _artifact_key(artifact_type, text, language, slide_count, writing_style)
+    if not regenerate:
+        cached = await load_artifact(db, deck_id, artifact_type, key, row.version)
+        if cached is not None:
+            return {"artifact_type": artifact_type, "data": cached, "cached": True}
+
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Deck has no content yet")
+    request = StudyPackRequest(text=text, language=language, slide_count=slide_count, writing_style=writing_style)
+    flight_key, fn, args, kwargs, is_json = _study_pack_job(artifact_type, request)
+    try:
+        if regenerate:
+            # A fresh answer: skip both the shared in-flight result and the response cache
+            with llm_cache.bypass():
+                output = await fn(*args, **kwargs)
+        else:
+            output = await generation_flight.do(flight_key, fn, *args, **kwargs)
+        data = json.loads(output) if is_json else output
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _generation_failed(e, 500)
+    await _save_deck_artifact(db, user, deck_id, row.version, artifact_type, key, data)
+    return {"artifact_type": artifact_type, "data": data, "cached": False}
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.routers import auth
+from app.services.search_index import search_documents
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 50
+
+@router.get("/search")
+async def search_library(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    user = Depends(auth.get_replit_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ranked full-text search over the user's decks and generated study material."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+
+    results = await search_documents(db, user.id, q, limit=limit, offset=offset)
+    return {
+        "query": q,
+        "results": results,
+        "next_offset": offset + limit if len(results) == limit else None
+    }
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+import hashlib
+import re
+import threading
+import time
+import numpy as np
+from app.services import metrics
+
+# Class-wide cache of chat answers. Students in one class asking near-identical
+# first questions about the same transcript get the stored answer. Questions are
+# normalized and compared by MinHash over word unigrams and bigrams, but only
+# against questions with exactly the same content words: MinHash alone scores
+# "mitosis vs meiosis in plants?" and "...in animals?" as near-duplicates.
+
+NUM_PERM = 64
+SIMILARITY_THRESHOLD = 0.6
+ANSWER_TTL_SECONDS = 24 * 3600
+MAX_ANSWERS_PER_VIDEO = 256
+MAX_BUCKETS = 1024
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1337)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+_CONTRACTIONS = {"what's": "what is", "who's": "who is", "how's": "how is", "where's": "where is",
+                 "it's": "it is", "that's": "that is", "isn't": "is not", "doesn't": "does not",
+                 "don't": "do not", "can't": "cannot", "he's": "he is", "she's": "she is"}
+_FILLER = frozenset("please pls can could you tell me explain again exactly the a an um so hey hi".split())
+# Function words that don't change what is being asked. Negations are left out on purpose.
+_STOPWORDS = frozenset("""what which who whom whose when where why how is are was were be been being do does did
+    of in on at to for from by with about into onto as and or vs versus than this that these those it its
+    there their they them he his she her we our i my your mean means""".split())
+_WORD_RE = re.compile(r"\w+(?:'\w+)*") # Any script; keeps contractions whole
+
+def normalize_question(question: str) -> list:
+    words = []
+    for word in _WORD_RE.findall(question.casefold().replace("’", "'")):
+        words.extend(_CONTRACTIONS.get(word, word).split())
+    return [w for w in words if w not in _FILLER]
+
+def content_words(words: list) -> frozenset:
+    return frozenset(w for w in words if w not in _STOPWORDS)
+
+def minhash(words: list) -> np.ndarray | None:
+    """None for an empty question: it has nothing to compare, and must not match other empty ones."""
+    shingles = set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+    if not shingles:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    # (a * x + b) mod p for every permutation at once; values stay below 2^63
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME).min(axis=0)
+
+class AnswerCache:
+    """
+    Buckets are keyed by (class_code, video_key) and pinned to one transcript
+    fingerprint; a different fingerprint means the transcript changed and the
+    bucket starts over.
+    """
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, fingerprint: str, create: bool):
+        bucket = self._buckets.get(key)
+        if bucket is not None and bucket["fingerprint"] != fingerprint:
+            del self._buckets[key]
+            bucket = None
+        if bucket is None and create:
+            bucket = {"fingerprint": fingerprint, "signatures": np.empty((0, NUM_PERM), dtype=np.uint64), "entries": []}
+            self._buckets[key] = bucket
+            while len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        if bucket is not None:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def get(self, scope: str, video_key: str, fingerprint: str, question: str) -> str | None:
+        words = normalize_question(question)
+        topic = content_words(words)
+        signature = minhash(words)
+        if signature is None or not topic:
+            metrics.incr("answer_cache_misses")
+            return None
+        now = time.time()
+        with self._lock:
+            bucket = self._bucket((scope, video_key), fingerprint, create=False)
+            if bucket is not None:
+                candidates = [i for i, entry in enumerate(bucket["entries"]) if entry[2] == topic]
+                if candidates:
+                    similarity = (bucket["signatures"][candidates] == signature).mean(axis=1)
+                    best = int(similarity.argmax())
+                    answer, created, _ = bucket["entries"][candidates[best]]
+                    if similarity[best] >= SIMILARITY_THRESHOLD and now - created < ANSWER_TTL_SECONDS:
+                        metrics.incr("answer_cache_hits")
+                        return answer
+        metrics.incr("answer_cache_misses")
+        return None
+
+    def put(self, scope: str, video_key: str, fingerprint: str, question: str, answer: str):
+        words = normalize_question(question)
+        topic = content_words(words)
+        signature = minhash(words)
+        if signature is None or not topic: # Only function words ("what is it?"): depends on context
+            return
+        with self._lock:
+            bucket = self._bucket((scope, video_key), fingerprint, create=True)
+            bucket["signatures"] = np.vstack([bucket["signatures"], signature])[-MAX_ANSWERS_PER_VIDEO:]
+            bucket["entries"] = (bucket["entries"] + [(answer, time.time(), topic)])[-MAX_ANSWERS_PER_VIDEO:]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+answer_cache = AnswerCache()
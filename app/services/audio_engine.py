@@ -1,47 +1,180 @@
 from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor, Future
+from app.config import settings
+from app.services import metrics
+from app.services.mp3_frames import SegmentIndex, index_path_for
+from app.services.disk_lru import DiskLRUCache
+import aiofiles
+import asyncio
+import hashlib
+import io
+import json
 import os
-import uuid
+import time
+
+# Shared across requests so concurrent podcasts can't multiply the number of
+# simultaneous TTS calls.
+TTS_MAX_WORKERS = 8
+TTS_RETRIES = 3
+TTS_RETRY_DELAY = 0.5
+
+_tts_pool = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+
+def _voice_for(speaker: str) -> str:
+    """Choose accent/TLD so the two hosts sound different"""
+    if speaker == "Sam" or "Expert" in speaker:
+        return 'co.uk'
+    return 'com'
+
+class ClipCache(DiskLRUCache):
+    """Disk cache of synthesized MP3 clips keyed by hash(text, lang, tld)."""
+    suffix = ".mp3"
+    name = "tts"
+
+    @staticmethod
+    def key(text: str, lang: str, tld: str) -> str:
+        return hashlib.sha256(json.dumps([text, lang, tld]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        data = self._read(key)
+        metrics.incr("tts_cache_hits" if data is not None else "tts_cache_misses")
+        return data
+
+    def put(self, key: str, data: bytes):
+        self._write(key, data)
+
+clip_cache = ClipCache(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_BYTES)
+
+def _render_line(text: str, lang: str, tld: str) -> bytes:
+    """Renders one dialogue line to MP3 bytes in memory, retrying transient failures."""
+    last_error = None
+    for attempt in range(TTS_RETRIES):
+        try:
+            buffer = io.BytesIO()
+            gTTS(text, lang=lang, tld=tld).write_to_fp(buffer)
+            return buffer.getvalue()
+        except Exception as e:
+            last_error = e
+            print(f"TTS attempt {attempt + 1} failed: {e}")
+            if attempt + 1 < TTS_RETRIES:
+                time.sleep(TTS_RETRY_DELAY * (2 ** attempt))
+    raise last_error
+
+def _render_and_cache(key: str, text: str, lang: str, tld: str) -> bytes:
+    data = _render_line(text, lang, tld)
+    clip_cache.put(key, data)
+    return data
+
+def submit_dialogue_line(line: dict, lang: str = 'en') -> Future | None:
+    """Starts rendering one script line. Returns a Future of its MP3 bytes, or None for empty lines."""
+    text = line.get("text", "")
+    if not text:
+        return None
+    tld = _voice_for(line.get("speaker", "Unknown"))
+    key = ClipCache.key(text, lang, tld)
+    cached = clip_cache.get(key)
+    if cached is not None:
+        future = Future()
+        future.set_result(cached)
+        return future
+    return _tts_pool.submit(_render_and_cache, key, text, lang, tld)
+
+def render_dialogue_clips(script_json: list, lang: str = 'en') -> list:
+    """
+    Renders every non-empty line of a dialogue script concurrently.
+    Cached clips are reused and repeated lines are synthesized once.
+    Returns the MP3 clips in script order.
+    """
+    keys = []
+    pending = {}
+    for line in script_json:
+        text = line.get("text", "")
+        if not text: continue
+        key = ClipCache.key(text, lang, _voice_for(line.get("speaker", "Unknown")))
+        keys.append(key)
+        if key not in pending:
+            pending[key] = submit_dialogue_line(line, lang)
+
+    try:
+        resolved = {key: future.result() for key, future in pending.items()}
+    except Exception:
+        for future in pending.values():
+            future.cancel()
+        raise
+    return [resolved[key] for key in keys]
+
+def _write_segment_index(output_filename: str, index: SegmentIndex):
+    """Stores the line -> byte/time offset map next to the audio file."""
+    index_path = index_path_for(output_filename)
+    with open(f"{index_path}.part", 'w') as f:
+        json.dump(index.to_dict(), f)
+    os.replace(f"{index_path}.part", index_path)
+
+async def stream_podcast_audio(turns, output_filename: str, lang: str = 'en'):
+    """
+    Consumes dialogue turns from an async iterator, starts synthesizing each one
+    as soon as it arrives and yields the frame-aligned MP3 audio in script order.
+    The full audio and its segment index are persisted when the stream completes.
+    """
+    queue = asyncio.Queue()
+
+    async def _produce():
+        try:
+            line_no = 0
+            async for turn in turns:
+                future = submit_dialogue_line(turn, lang)
+                if future is not None:
+                    await queue.put((line_no, turn, future))
+                line_no += 1
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(_produce())
+    partial_filename = f"{output_filename}.part"
+    index = SegmentIndex()
+    try:
+        async with aiofiles.open(partial_filename, 'wb') as outfile:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                line_no, turn, future = item
+                clip = await asyncio.wrap_future(future)
+                audio = index.append(clip, line_no, turn.get("speaker", ""), turn.get("text", ""))
+                await outfile.write(audio)
+                yield audio
+        await producer # Surface errors from the script stream
+        _write_segment_index(output_filename, index)
+        os.replace(partial_filename, output_filename)
+    finally:
+        if not producer.done():
+            producer.cancel()
+        if os.path.exists(partial_filename):
+            try: os.remove(partial_filename)
+            except: pass
 
 def synthesize_podcast_audio(script_json: list, output_filename: str = "podcast.mp3") -> str:
     """
     Converts a dialogue script into a single audio file using gTTS.
-    Uses unique temp files to prevent clashes during concurrent requests.
+    Lines are synthesized in parallel into memory and joined on MP3 frame
+    boundaries; a segment index is written next to the audio for seeking.
     """
-    temp_files = []
-    
+    partial_filename = f"{output_filename}.part"
     try:
-        for i, line in enumerate(script_json):
-            speaker = line.get("speaker", "Unknown")
-            text = line.get("text", "")
-            
-            if not text: continue
-            
-            # Choose accent/TLD
-            tld = 'com'
-            if speaker == "Sam" or "Expert" in speaker:
-                tld = 'co.uk'
-            
-            # Generate unique clip
-            temp_name = f"temp_{uuid.uuid4().hex}.mp3"
-            tts = gTTS(text, lang='en', tld=tld)
-            tts.save(temp_name)
-            temp_files.append(temp_name)
-            
-        # Combine MP3s
-        with open(output_filename, 'wb') as outfile:
-            for fname in temp_files:
-                if os.path.exists(fname):
-                    with open(fname, 'rb') as infile:
-                        outfile.write(infile.read())
-                    os.remove(fname)
-                    
+        clips = render_dialogue_clips(script_json)
+        lines = [(i, line) for i, line in enumerate(script_json) if line.get("text", "")]
+
+        index = SegmentIndex()
+        with open(partial_filename, 'wb') as outfile:
+            for (line_no, line), clip in zip(lines, clips):
+                outfile.write(index.append(clip, line_no, line.get("speaker", ""), line.get("text", "")))
+        _write_segment_index(output_filename, index)
+        os.replace(partial_filename, output_filename)
     except Exception as e:
         print(f"Audio Synthesis Error: {e}")
-        # Cleanup any remaining temps
-        for fname in temp_files:
-            if os.path.exists(fname):
-                try: os.remove(fname)
-                except: pass
+        if os.path.exists(partial_filename):
+            try: os.remove(partial_filename)
+            except: pass
         raise e
-            
+
     return output_filename
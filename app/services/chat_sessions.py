@@ -0,0 +1,32 @@
+import json
+from app.models import ChatSession
+from app.services import gemini_engine
+
+# Once the kept history passes this many (estimated) tokens, everything but the
+# last CHAT_KEEP_TURNS turns is folded into the session's running summary.
+CHAT_HISTORY_TOKEN_LIMIT = 1200
+CHAT_KEEP_TURNS = 4
+CHAT_MAX_TURNS = 20 # Hard cap in case summarization keeps failing
+
+def estimate_tokens(turns: list) -> int:
+    # ~4 characters per token is close enough for a compaction trigger
+    return sum(len(t.get("text", "")) for t in turns) // 4
+
+def get_history(session: ChatSession) -> list:
+    return json.loads(session.history_json or "[]")
+
+async def record_exchange(session: ChatSession, question: str, answer: str):
+    """Appends one question/answer pair and compacts older turns if needed."""
+    history = get_history(session)
+    history.append({"role": "user", "text": question})
+    history.append({"role": "model", "text": answer})
+    session.turn_count = (session.turn_count or 0) + 2
+
+    if estimate_tokens(history) > CHAT_HISTORY_TOKEN_LIMIT and len(history) > CHAT_KEEP_TURNS:
+        older, history = history[:-CHAT_KEEP_TURNS], history[-CHAT_KEEP_TURNS:]
+        try:
+            session.summary = await gemini_engine.summarize_chat_history(session.summary or "", older)
+        except Exception as e:
+            print(f"Chat compaction failed for session {session.id}: {e}")
+            history = older[-(CHAT_MAX_TURNS - len(history)):] + history
+    session.history_json = json.dumps(history[-CHAT_MAX_TURNS:])
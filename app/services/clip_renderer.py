@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import bisect
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+
+# Cuts suggested viral segments out of an uploaded source video with ffmpeg.
+# Segments that start close to a keyframe are stream-copied (no decode at all);
+# the rest are re-encoded starting from an input-side seek, so ffmpeg only
+# decodes from the nearest preceding keyframe rather than the whole source.
+
+CLIP_MAX_WORKERS = min(4, os.cpu_count() or 1)
+CLIP_THREADS_PER_JOB = 2
+CLIP_CPU_SECONDS = 120 # Hard RLIMIT_CPU per ffmpeg job
+CLIP_TIMEOUT_SECONDS = 300
+KEYFRAME_TOLERANCE = 0.5 # Seconds of extra lead-in accepted to avoid a re-encode
+
+_pool = None
+
+def _ffmpeg_exe() -> str:
+    try:
+        import imageio_ffmpeg # Ships with moviepy
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        exe = shutil.which("ffmpeg")
+        if not exe:
+            raise RuntimeError("ffmpeg is not available")
+        return exe
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that holds event loop and DB threads is unsafe
+        _pool = ProcessPoolExecutor(max_workers=CLIP_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def probe_keyframes(source_path: str) -> list:
+    """Returns keyframe timestamps (seconds). Only keyframes are decoded."""
+    cmd = [
+        _ffmpeg_exe(), "-hide_banner", "-nostats",
+        "-skip_frame", "nokey", "-i", source_path,
+        "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=CLIP_TIMEOUT_SECONDS)
+    if result.returncode != 0:
+        raise RuntimeError(f"Keyframe probe failed: {result.stderr[-500:]}")
+    times = [float(t) for t in re.findall(r"pts_time:\s*([0-9.]+)", result.stderr)]
+    return sorted(set(times))
+
+def plan_cut(keyframes: list, start: float) -> tuple:
+    """Returns (mode, seek_time): stream copy from the preceding keyframe when it is close enough."""
+    i = bisect.bisect_right(keyframes, start + 1e-3) - 1
+    if i >= 0 and start - keyframes[i] <= KEYFRAME_TOLERANCE:
+        return "copy", keyframes[i]
+    return "reencode", start
+
+def _seconds(value) -> float | None:
+    """Clip boundary as seconds, or None when the model gave nothing usable."""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if math.isfinite(seconds) else None
+
+def _limit_cpu(seconds: int):
+    def _apply():
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 5))
+        except Exception:
+            pass # Not supported on this platform
+    return _apply
+
+def _render_job(job: dict) -> dict:
+    """Runs in a pool worker. Cuts one segment and reports how it was produced."""
+    mode, seek = plan_cut(job["keyframes"], job["start"])
+    duration = job["end"] - seek
+    cmd = [_ffmpeg_exe(), "-hide_banner", "-nostats", "-loglevel", "error", "-y",
+           "-ss", f"{seek:.3f}", "-i", job["source"], "-t", f"{duration:.3f}"]
+    if mode == "copy":
+        cmd += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+    else:
+        cmd += ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-c:a", "aac",
+                "-threads", str(job["threads"])]
+    cmd += ["-movflags", "+faststart", job["output"]]
+
+    try:
+        result = subprocess.run(
+            cmd, capture_output=True, text=True, timeout=CLIP_TIMEOUT_SECONDS,
+            preexec_fn=_limit_cpu(job["cpu_seconds"]) if os.name == "posix" else None
+        )
+    except subprocess.TimeoutExpired:
+        return {"index": job["index"], "error": "Render timed out"}
+    if result.returncode != 0 or not os.path.exists(job["output"]):
+        return {"index": job["index"], "error": result.stderr[-500:] or "Render failed"}
+    return {"index": job["index"], "output": job["output"], "mode": mode, "start_time": seek, "end_time": job["end"]}
+
+async def render_clips(source_path: str, clips: list, output_dir: str, prefix: str = "clip") -> list:
+    """
+    Renders every suggested clip concurrently in the worker pool.
+    Returns one result per clip, in order, with either "output" or "error".
+    Raises RuntimeError when the source can't be probed as a video.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    keyframes = await asyncio.to_thread(probe_keyframes, source_path)
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    futures = []
+    for i, clip in enumerate(clips):
+        if not isinstance(clip, dict):
+            clip = {}
+        start = _seconds(clip.get("start_time", 0))
+        end = _seconds(clip.get("end_time"))
+        if start is not None:
+            start = max(0.0, start)
+        if start is None or end is None or end <= start:
+            futures.append(asyncio.sleep(0, result={"index": i, "error": "Invalid time range"}))
+            continue
+        job = {
+            "index": i,
+            "source": source_path,
+            "start": start,
+            "end": end,
+            "keyframes": keyframes,
+            "output": os.path.join(output_dir, f"{prefix}_{i}.mp4"),
+            "threads": CLIP_THREADS_PER_JOB,
+            "cpu_seconds": CLIP_CPU_SECONDS,
+        }
+        futures.append(loop.run_in_executor(pool, _render_job, job))
+    return list(await asyncio.gather(*futures))
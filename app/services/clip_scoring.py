@@ -0,0 +1,155 @@
+import re
+import numpy as np
+
+# Cheap local pre-ranking of viral clip candidates. Every 30-90s window of the
+# transcript is scored from prefix sums of per-segment features, so the whole
+# video is covered and only the best few windows are sent to the LLM.
+
+WINDOW_LENGTHS = (30.0, 45.0, 60.0, 90.0)
+MIN_WINDOW = 30.0
+MAX_WINDOW = 90.0
+TOP_K = 8
+
+HOOK_PHRASES = (
+    "here's the thing", "the secret", "nobody tells you", "the truth is", "what if",
+    "you won't believe", "the biggest mistake", "this changed", "let me tell you",
+    "the reason", "stop", "never", "always", "most people", "imagine", "crazy",
+    "insane", "actually", "wrong", "the problem", "here's why", "i realized",
+)
+
+FEATURE_WEIGHTS = {
+    "speech_rate": 1.0,
+    "exclaim": 0.8,
+    "question": 0.6,
+    "hooks": 1.2,
+    "novelty": 1.0,
+}
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "the a an and or but of to in on at for with is are was were be been it this that "
+    "i you he she we they my your our so just like um uh yeah oh not do does did have has "
+    "had what there their from as if then than about can will would know really get got".split()
+)
+
+def _segment_fields(segment) -> tuple:
+    if isinstance(segment, dict):
+        return segment.get("text", ""), float(segment.get("start", 0)), float(segment.get("duration", 0))
+    return getattr(segment, "text", ""), float(getattr(segment, "start", 0)), float(getattr(segment, "duration", 0))
+
+def segment_features(segments: list) -> dict:
+    """Per-segment feature vectors plus start/end times."""
+    n = len(segments)
+    starts = np.zeros(n)
+    ends = np.zeros(n)
+    words = np.zeros(n)
+    exclaim = np.zeros(n)
+    question = np.zeros(n)
+    hooks = np.zeros(n)
+    tokens = []
+    for i, segment in enumerate(segments):
+        text, start, duration = _segment_fields(segment)
+        lowered = text.lower()
+        starts[i] = start
+        ends[i] = start + max(duration, 0.0)
+        seg_tokens = _WORD_RE.findall(lowered)
+        words[i] = len(seg_tokens)
+        exclaim[i] = text.count("!")
+        question[i] = text.count("?")
+        hooks[i] = sum(lowered.count(p) for p in HOOK_PHRASES)
+        tokens.append([t for t in seg_tokens if t not in _STOPWORDS and len(t) > 2])
+
+    # Keyword novelty: mean IDF of content words, with segments as documents
+    df = {}
+    for seg_tokens in tokens:
+        for t in set(seg_tokens):
+            df[t] = df.get(t, 0) + 1
+    novelty = np.zeros(n)
+    for i, seg_tokens in enumerate(tokens):
+        if seg_tokens:
+            novelty[i] = sum(np.log((n + 1) / (df[t] + 0.5)) for t in seg_tokens)
+
+    # Transcript segments often overlap; the next start is a better end bound
+    if n > 1:
+        ends[:-1] = np.maximum(np.minimum(ends[:-1], starts[1:]), starts[:-1])
+    return {"starts": starts, "ends": ends, "words": words, "exclaim": exclaim,
+            "question": question, "hooks": hooks, "novelty": novelty}
+
+def _zscore(values: np.ndarray) -> np.ndarray:
+    std = values.std()
+    if std == 0:
+        return np.zeros_like(values)
+    return (values - values.mean()) / std
+
+def score_windows(segments: list, lengths=WINDOW_LENGTHS) -> list:
+    """
+    Scores every window that starts on a segment boundary and lasts one of
+    `lengths` seconds (snapped to segment ends). Returns dicts sorted by score.
+    """
+    if not segments:
+        return []
+    f = segment_features(segments)
+    starts, ends = f["starts"], f["ends"]
+    n = len(starts)
+
+    # Prefix sums let each window sum be a single subtraction
+    prefix = {k: np.concatenate(([0.0], np.cumsum(f[k]))) for k in ("words", "exclaim", "question", "hooks", "novelty")}
+
+    first = np.repeat(np.arange(n), len(lengths))
+    target = starts[first] + np.tile(np.asarray(lengths), n)
+    last = np.clip(np.searchsorted(ends, target, side="left"), 0, n - 1)
+    window_start = starts[first]
+    window_end = ends[last]
+    duration = window_end - window_start
+
+    valid = (duration >= MIN_WINDOW) & (duration <= MAX_WINDOW * 1.1)
+    if not valid.any():
+        # Short video: the whole transcript is the only candidate
+        first, last = np.array([0]), np.array([n - 1])
+        window_start, window_end = starts[first], ends[last]
+        duration = np.maximum(window_end - window_start, 1.0)
+    else:
+        first, last = first[valid], last[valid]
+        window_start, window_end, duration = window_start[valid], window_end[valid], duration[valid]
+    # Duplicates appear when several target lengths snap to the same segment end
+    _, unique = np.unique(np.stack([first, last]), axis=1, return_index=True)
+    first, last = first[unique], last[unique]
+    window_start, window_end, duration = window_start[unique], window_end[unique], duration[unique]
+
+    def window_sum(key):
+        return prefix[key][last + 1] - prefix[key][first]
+
+    minutes = duration / 60.0
+    features = {
+        "speech_rate": window_sum("words") / minutes,
+        "exclaim": window_sum("exclaim") / minutes,
+        "question": window_sum("question") / minutes,
+        "hooks": window_sum("hooks") / minutes,
+        "novelty": window_sum("novelty") / np.maximum(window_sum("words"), 1.0),
+    }
+    score = sum(FEATURE_WEIGHTS[k] * _zscore(v) for k, v in features.items())
+
+    order = np.argsort(-score, kind="stable")
+    return [
+        {
+            "first": int(first[i]),
+            "last": int(last[i]),
+            "start": float(window_start[i]),
+            "end": float(window_end[i]),
+            "score": float(score[i]),
+        }
+        for i in order
+    ]
+
+def top_candidate_windows(segments: list, k: int = TOP_K) -> list:
+    """Best-scoring windows with overlapping ones suppressed, in time order."""
+    picked = []
+    for window in score_windows(segments):
+        if any(window["start"] < p["end"] and p["start"] < window["end"] for p in picked):
+            continue
+        picked.append(window)
+        if len(picked) == k:
+            break
+    for window in picked:
+        window["text"] = " ".join(_segment_fields(s)[0] for s in segments[window["first"]:window["last"] + 1])
+    return sorted(picked, key=lambda w: w["start"])
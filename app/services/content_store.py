@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+import hashlib
+import re
+import zlib
+from sqlalchemy import delete, select, update
+from app.models import ContentBlob
+
+# Deduplicated, compressed store for large editor inputs (transcripts, notes),
+# so clients upload the text once and pass its content_id to every endpoint.
+
+CONTENT_TTL = timedelta(days=7)
+TOUCH_INTERVAL = timedelta(days=1) # Reads extend the TTL at most this often
+MAX_CONTENT_BYTES = 5 * 1024 * 1024
+CONTENT_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def content_id_for(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _now():
+    return datetime.now(timezone.utc)
+
+async def store_content(db, text: str) -> ContentBlob:
+    """Stores text under its hash, or refreshes the TTL if it is already stored."""
+    raw = text.encode("utf-8")
+    if len(raw) > MAX_CONTENT_BYTES:
+        raise ValueError("Content is too large")
+    content_id = hashlib.sha256(raw).hexdigest()
+    expires_at = _now() + CONTENT_TTL
+
+    # Opportunistic cleanup keeps the table bounded without a scheduler
+    await db.execute(delete(ContentBlob).where(ContentBlob.expires_at < _now()))
+
+    blob = await db.get(ContentBlob, content_id)
+    if blob:
+        blob.expires_at = expires_at
+    else:
+        blob = ContentBlob(id=content_id, data=zlib.compress(raw, 6), size=len(raw), expires_at=expires_at)
+        db.add(blob)
+    await db.commit()
+    return blob
+
+async def content_info(db, content_id: str) -> dict | None:
+    if not CONTENT_ID_RE.match(content_id or ""):
+        return None
+    result = await db.execute(
+        select(ContentBlob.size, ContentBlob.expires_at).where(ContentBlob.id == content_id, ContentBlob.expires_at >= _now())
+    )
+    row = result.first()
+    if not row:
+        return None
+    return {"content_id": content_id, "size": row.size, "expires_at": row.expires_at}
+
+async def load_content(db, content_id: str) -> str | None:
+    """Returns the stored text, or None if the id is unknown or expired."""
+    if not CONTENT_ID_RE.match(content_id or ""):
+        return None
+    result = await db.execute(
+        select(ContentBlob.data, ContentBlob.expires_at).where(ContentBlob.id == content_id, ContentBlob.expires_at >= _now())
+    )
+    row = result.first()
+    if row is None:
+        return None
+    expires_at = row.expires_at if row.expires_at.tzinfo else row.expires_at.replace(tzinfo=timezone.utc)
+    # Most reads leave the row alone; the TTL is only pushed out once it has run down a little
+    if expires_at < _now() + CONTENT_TTL - TOUCH_INTERVAL:
+        await db.execute(update(ContentBlob).where(ContentBlob.id == content_id).values(expires_at=_now() + CONTENT_TTL))
+        await db.commit()
+    return zlib.decompress(row.data).decode("utf-8")
@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from google.genai import errors, types
+from app.services import metrics
+
+# Registers large shared content (the canonical block at the start of every
+# prompt, see prompts.py) with the provider's cached-content API once per model,
+# so follow-up generations on the same transcript send only their instructions.
+# Anything that goes wrong falls back to sending the full prompt.
+
+CONTEXT_CACHE_MIN_CHARS = 20000 # ~5k tokens; below this (and the provider minimum) caching costs more than it saves
+CONTEXT_CACHE_TTL_SECONDS = 3600
+REFRESH_MARGIN_SECONDS = 120 # Don't hand out a handle that may expire mid-request
+FAILURE_BACKOFF_SECONDS = 600 # After a failed create, send full prompts for a while
+MAX_HANDLES = 256
+
+# Provider errors meaning "this handle is unusable" rather than "the request failed"
+STALE_HANDLE_CODES = (400, 403, 404)
+
+class ContextCacheManager:
+    """
+    Handles are keyed by (model, hash of the content block) and expire
+    locally a little before the provider drops them.
+    """
+    def __init__(self, min_chars: int = CONTEXT_CACHE_MIN_CHARS, ttl: int = CONTEXT_CACHE_TTL_SECONDS):
+        self.min_chars = min_chars
+        self.ttl = ttl
+        self._handles = {} # key -> (name or None, expires_at)
+        self._lock = threading.Lock()
+        self._creating = {} # key -> lock, so concurrent generators create a handle once
+
+    @staticmethod
+    def _key(model: str, prefix: str) -> tuple:
+        return model, hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+    def handle_for(self, client, model: str, prefix: str, label: str = None) -> str | None:
+        """Name of a live cached-content handle holding prefix, creating one if needed; None to send inline."""
+        if len(prefix) < self.min_chars:
+            return None
+        key = self._key(model, prefix)
+        name = self._lookup(key)
+        if name is not False:
+            return name
+
+        with self._lock:
+            create_lock = self._creating.setdefault(key, threading.Lock())
+        with create_lock:
+            name = self._lookup(key) # Another thread may have just created it
+            if name is False:
+                name = self._create(client, model, prefix, key, label)
+        with self._lock:
+            self._creating.pop(key, None)
+        return name
+
+    def has_handle(self, model: str, prefix: str) -> bool:
+        """Whether a live handle for prefix already exists; never creates one."""
+        with self._lock:
+            entry = self._handles.get(self._key(model, prefix))
+            return entry is not None and entry[0] is not None and entry[1] > time.time()
+
+    def _create(self, client, model: str, prefix: str, key: tuple, label: str = None) -> str | None:
+        try:
+            cached = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=[prefix],
+                    ttl=f"{self.ttl}s",
+                    display_name=(label or key[1][:16])[:128],
+                ),
+            )
+            name = cached.name
+            if not isinstance(name, str):
+                raise ValueError("Provider returned no cache name")
+        except Exception as e:
+            print(f"Context cache create failed for {model}: {e}; sending full prompts")
+            metrics.incr("context_cache_create_failures")
+            self._remember(key, None, time.time() + FAILURE_BACKOFF_SECONDS)
+            return None
+        metrics.incr("context_cache_creates")
+        self._remember(key, name, time.time() + self.ttl - REFRESH_MARGIN_SECONDS)
+        return name
+
+    def _lookup(self, key):
+        """Live handle name, None while backing off after a failure, False if unknown or expired."""
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is None or entry[1] <= time.time():
+                return False
+            if entry[0] is not None:
+                metrics.incr("context_cache_hits")
+            return entry[0]
+
+    def _remember(self, key, name, expires_at: float):
+        with self._lock:
+            self._handles[key] = (name, expires_at)
+            if len(self._handles) > MAX_HANDLES:
+                now = time.time()
+                live = {k: v for k, v in self._handles.items() if v[1] > now}
+                # Still too many: keep the ones expiring last
+                self._handles = dict(sorted(live.items(), key=lambda kv: kv[1][1])[-MAX_HANDLES:])
+
+    def forget(self, model: str, prefix: str):
+        with self._lock:
+            self._handles.pop(self._key(model, prefix), None)
+
+    def clear(self):
+        with self._lock:
+            self._handles.clear()
+
+def is_stale_handle_error(error: Exception) -> bool:
+    return isinstance(error, errors.APIError) and error.code in STALE_HANDLE_CODES
+
+context_cache = ContextCacheManager()
@@ -0,0 +1,40 @@
+import hashlib
+import json
+import zlib
+from sqlalchemy import delete, select
+from app.models import DeckArtifact
+
+# Generated study artifacts persisted per deck, keyed by what they were made
+# from. Rows remember the deck version they were generated at; a content change
+# makes them stale (and write_deck_content deletes them).
+
+def params_hash(artifact_type: str, text: str, **options) -> str:
+    payload = json.dumps([artifact_type, hashlib.sha256(text.encode("utf-8")).hexdigest(), options], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def save_artifact(db, deck_id: int, artifact_type: str, key: str, data, deck_version: int = 0):
+    """Inserts or replaces one artifact. Caller commits."""
+    result = await db.execute(select(DeckArtifact).where(
+        DeckArtifact.deck_id == deck_id, DeckArtifact.artifact_type == artifact_type, DeckArtifact.params_hash == key
+    ))
+    artifact = result.scalars().first()
+    if artifact is None:
+        artifact = DeckArtifact(deck_id=deck_id, artifact_type=artifact_type, params_hash=key)
+        db.add(artifact)
+    artifact.deck_version = deck_version
+    artifact.payload = zlib.compress(json.dumps(data).encode("utf-8"), 6)
+    return artifact
+
+async def load_artifact(db, deck_id: int, artifact_type: str, key: str, deck_version: int | None = None):
+    """Returns the stored artifact, or None if missing or generated from an older deck version."""
+    query = select(DeckArtifact.payload).where(
+        DeckArtifact.deck_id == deck_id, DeckArtifact.artifact_type == artifact_type, DeckArtifact.params_hash == key
+    )
+    if deck_version is not None:
+        query = query.where(DeckArtifact.deck_version == deck_version)
+    payload = (await db.execute(query)).scalar()
+    return json.loads(zlib.decompress(payload)) if payload is not None else None
+
+async def invalidate_deck_artifacts(db, deck_id: int):
+    """Drops every artifact of a deck whose content just changed. Caller commits."""
+    await db.execute(delete(DeckArtifact).where(DeckArtifact.deck_id == deck_id))
@@ -0,0 +1,123 @@
+import json
+import zlib
+from sqlalchemy import select, func
+from app.models import DeckVersion
+
+# A full compressed snapshot is written at least every SNAPSHOT_INTERVAL versions,
+# so rebuilding any version replays a bounded number of deltas.
+SNAPSHOT_INTERVAL = 20
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+def decompress_text(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+def apply_ops(text: str, ops: list) -> str:
+    """
+    Applies text ops to a document. Ops are {"retain": n}, {"insert": "..."} or
+    {"delete": n}; whatever is left after the last op is kept unchanged.
+    """
+    pos = 0
+    parts = []
+    for op in ops:
+        if not isinstance(op, dict) or len(op) != 1:
+            raise ValueError(f"Invalid op: {op!r}")
+        if "retain" in op:
+            count = op["retain"]
+            if not isinstance(count, int) or count < 0 or pos + count > len(text):
+                raise ValueError("retain goes past the end of the document")
+            parts.append(text[pos:pos + count])
+            pos += count
+        elif "delete" in op:
+            count = op["delete"]
+            if not isinstance(count, int) or count < 0 or pos + count > len(text):
+                raise ValueError("delete goes past the end of the document")
+            pos += count
+        elif "insert" in op:
+            if not isinstance(op["insert"], str):
+                raise ValueError("insert must be a string")
+            parts.append(op["insert"])
+        else:
+            raise ValueError(f"Unknown op: {op!r}")
+    parts.append(text[pos:])
+    return "".join(parts)
+
+def diff_ops(old: str, new: str) -> list:
+    """Cheap single-hunk diff (common prefix / suffix) used for full-content saves."""
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+
+    ops = []
+    if prefix:
+        ops.append({"retain": prefix})
+    deleted = len(old) - prefix - suffix
+    if deleted:
+        ops.append({"delete": deleted})
+    inserted = new[prefix:len(new) - suffix]
+    if inserted:
+        ops.append({"insert": inserted})
+    return ops
+
+async def record_version(db, deck, old_content: str, new_content: str, ops: list | None = None) -> int:
+    """Bumps deck.version and stores either a delta or a compressed snapshot for it."""
+    new_version = (deck.version or 0) + 1
+    if ops is None:
+        ops = diff_ops(old_content or "", new_content)
+
+    last_snapshot = (await db.execute(
+        select(func.max(DeckVersion.version))
+        .where(DeckVersion.deck_id == deck.id, DeckVersion.kind == "snapshot")
+    )).scalar()
+    delta_payload = zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"), 6)
+
+    if last_snapshot is None and old_content:
+        # Decks saved before history existed: keep their current content as the
+        # baseline, so the first edit can be undone
+        db.add(DeckVersion(deck_id=deck.id, version=new_version - 1, kind="snapshot", payload=compress_text(old_content)))
+        last_snapshot = new_version - 1
+
+    if last_snapshot is None or new_version - last_snapshot >= SNAPSHOT_INTERVAL:
+        db.add(DeckVersion(deck_id=deck.id, version=new_version, kind="snapshot", payload=compress_text(new_content)))
+    else:
+        db.add(DeckVersion(deck_id=deck.id, version=new_version, kind="delta", payload=delta_payload))
+    deck.version = new_version
+    return new_version
+
+async def load_version(db, deck_id: int, version: int) -> str | None:
+    """Rebuilds a version from the closest snapshot at or before it plus the deltas after it."""
+    snapshot = (await db.execute(
+        select(DeckVersion)
+        .where(DeckVersion.deck_id == deck_id, DeckVersion.kind == "snapshot", DeckVersion.version <= version)
+        .order_by(DeckVersion.version.desc())
+        .limit(1)
+    )).scalars().first()
+    if not snapshot:
+        return None
+
+    deltas = (await db.execute(
+        select(DeckVersion.version, DeckVersion.payload)
+        .where(
+            DeckVersion.deck_id == deck_id,
+            DeckVersion.kind == "delta",
+            DeckVersion.version > snapshot.version,
+            DeckVersion.version <= version
+        )
+        .order_by(DeckVersion.version)
+    )).all()
+
+    expected = snapshot.version + 1
+    content = decompress_text(snapshot.payload)
+    for delta_version, payload in deltas:
+        if delta_version != expected:
+            break
+        content = apply_ops(content, json.loads(zlib.decompress(payload)))
+        expected += 1
+    if expected - 1 != version:
+        return None
+    return content
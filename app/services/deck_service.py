@@ -0,0 +1,67 @@
+import html
+import re
+
+DEFAULT_DECK_TITLE = "Video Summary"
+PREVIEW_LENGTH = 100
+TITLE_LENGTH = 120
+
+_HEADING_RE = re.compile(r"<h[1-3][^>]*>(.*?)</h[1-3]>", re.IGNORECASE | re.DOTALL)
+_BLOCK_RE = re.compile(r"<(?:br|/p|/li|/h[1-6]|/div|/tr)[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+def strip_html(content: str) -> str:
+    """Converts generated HTML into plain text, keeping line breaks between blocks."""
+    if not content:
+        return ""
+    text = _BLOCK_RE.sub("\n", content)
+    text = _TAG_RE.sub("", text)
+    text = html.unescape(text)
+    lines = [_SPACE_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return "\n".join(line for line in lines if line)
+
+def derive_title(content: str) -> str:
+    """First heading of the summary, otherwise its first line of text."""
+    if not content:
+        return DEFAULT_DECK_TITLE
+    match = _HEADING_RE.search(content)
+    title = strip_html(match.group(1)) if match else ""
+    if not title:
+        plain = strip_html(content)
+        title = plain.split("\n", 1)[0] if plain else ""
+    title = title.strip(" #*:-")
+    if not title:
+        return DEFAULT_DECK_TITLE
+    if len(title) > TITLE_LENGTH:
+        title = title[:TITLE_LENGTH].rstrip() + "..."
+    return title
+
+def derive_preview(content: str) -> str:
+    plain = strip_html(content).replace("\n", " ")
+    if len(plain) > PREVIEW_LENGTH:
+        return plain[:PREVIEW_LENGTH] + "..."
+    return plain
+
+def set_deck_content(deck, content: str):
+    """Writes the summary and refreshes the listing columns derived from it."""
+    deck.summary_content = content
+    deck.title = derive_title(content)
+    deck.preview = derive_preview(content)
+
+async def write_deck_content(db, deck, old_content: str, new_content: str, ops: list | None = None) -> int:
+    """
+    Updates the deck and appends the change to its version history. Returns the new version.
+    summary_content is always rewritten in full; only the history entry is sized to the edit.
+    """
+    from app.services.deck_history import record_version
+    from app.services.search_index import index_deck
+    from app.services.deck_artifacts import invalidate_deck_artifacts
+    old_title = deck.title
+    set_deck_content(deck, new_content)
+    version = await record_version(db, deck, old_content, new_content, ops)
+    # Markup-only edits leave the searchable text as it was
+    if not old_content or deck.title != old_title or strip_html(new_content) != strip_html(old_content):
+        await index_deck(db, deck)
+    if deck.id is not None:
+        await invalidate_deck_artifacts(db, deck.id)
+    return version
@@ -0,0 +1,86 @@
+from pathlib import Path
+import os
+import shutil
+import threading
+import uuid
+from app.services import metrics
+
+class DiskLRUCache:
+    """
+    Size-capped directory of files keyed by hex digests. Least-recently-used
+    files (by mtime, refreshed on every hit) are evicted once the directory
+    grows past max_bytes. Subclasses set suffix and the metric/log name.
+    """
+    suffix = ".bin"
+    name = "disk"
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None # Scanned lazily on first write
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def _read(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path) # Mark as recently used
+        except OSError:
+            return None
+        return data
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"{self.name} cache write failed: {e}")
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        return self.directory.glob(f"*/*{self.suffix}")
+
+    def _scan_size(self) -> int:
+        return sum(p.stat().st_size for p in self._files())
+
+    def _evict(self):
+        # Trim to 90% of the cap so we don't evict on every single write
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for p in self._files():
+            try:
+                stat = p.stat()
+                entries.append((stat.st_mtime, stat.st_size, p))
+            except OSError:
+                continue
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+                metrics.incr(f"{self.name}_cache_evictions")
+            except OSError:
+                continue
+        self._total_bytes = total
+
+    def clear(self):
+        """Deletes every cached file."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._total_bytes = 0
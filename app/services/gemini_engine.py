@@ -1,7 +1,19 @@
 from google import genai
 from google.genai import types
 import markdown
+import asyncio
+import hashlib
 from app.config import settings
+from app.services.json_stream import JsonArrayStreamParser, parse_json_list
+from app.services.response_schemas import json_config
+from app.services import prompts
+from app.services.clip_scoring import top_candidate_windows
+from app.services.transcript_index import TranscriptIndex, index_cache, text_to_spans
+from app.services.answer_cache import answer_cache
+from app.services import llm_cache, metrics
+from app.services.context_cache import context_cache, is_stale_handle_error
+from app.services.model_guard import call_with_fallback, model_chain, run_model_call
+from app.services.hedging import hedged, hedge_model
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
 
 client = genai.Client(api_key=settings.GEMINI_API_KEY)
@@ -157,33 +169,22 @@ from app.services.usage_logger import log_token_usage
 async def process_video_content(video_url: str, user_tier: str, user_id: int, slide_count: str = "6-10", language: str = "English"):
     transcript = get_transcript(video_url)
     
-    if user_tier == "student":
-        model_name = "gemini-2.5-flash"
-        prompt = f"Summarize the following video transcript into concise bullet points suitable for study notes. Target length: {slide_count} slides/sections. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
-    elif user_tier == "professor":
-        model_name = "gemini-2.5-flash" 
-        prompt = f"Create a detailed academic study guide with citations based on the following transcript. Structure the guide into {slide_count} distinct chapters or modules. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
-    elif user_tier == "podcaster":
-        model_name = "gemini-2.5-flash"
-        prompt = f"Generate slide descriptions and visual imagery ideas for a presentation based on this transcript. PRODUCE EXACTLY {slide_count} SLIDES. For each slide, provide the text content and a prompt for an image generator. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
-    else:
-        model_name = "gemini-2.5-flash"
-        prompt = f"Summarize this. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
+    model_name = model_chain("video_summary")[0]
+    template = f"video_summary_{user_tier}" if user_tier in ("student", "professor", "podcaster") else "video_summary_default"
+    prompt = prompts.render(template, transcript, slide_count=slide_count, language=language)
 
-    response = client.models.generate_content(
-        model=model_name,
-        contents=prompt
-    )
+    response = await _generate("video_summary", prompt)
     
-    # 🕵️ Log usage for budget tracking
+    # 🕵️ Log usage for budget tracking (a cached response cost nothing)
     try:
         usage = response.usage_metadata
-        await log_token_usage(
-            user_id=user_id,
-            plan_type=user_tier,
-            prompt_tokens=usage.prompt_token_count,
-            response_tokens=usage.candidates_token_count
-        )
+        if getattr(response, "cached", False) is not True:
+            await log_token_usage(
+                user_id=user_id,
+                plan_type=user_tier,
+                prompt_tokens=usage.prompt_token_count,
+                response_tokens=usage.candidates_token_count
+            )
     except Exception as e:
         print(f"Usage logging failed: {e}")
         
@@ -344,33 +345,22 @@ from app.services.usage_logger import log_token_usage
 async def process_video_content(video_url: str, user_tier: str, user_id: int, slide_count: str = "6-10", language: str = "English"):
     transcript = get_transcript(video_url)
     
-    if user_tier == "student":
-        model_name = "gemini-2.5-flash"
-        prompt = f"Summarize the following video transcript into concise bullet points suitable for study notes. Target length: {slide_count} slides/sections. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
-    elif user_tier == "professor":
-        model_name = "gemini-2.5-flash" 
-        prompt = f"Create a detailed academic study guide with citations based on the following transcript. Structure the guide into {slide_count} distinct chapters or modules. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
-    elif user_tier == "podcaster":
-        model_name = "gemini-2.5-flash"
-        prompt = f"Generate slide descriptions and visual imagery ideas for a presentation based on this transcript. PRODUCE EXACTLY {slide_count} SLIDES. For each slide, provide the text content and a prompt for an image generator. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
-    else:
-        model_name = "gemini-2.5-flash"
-        prompt = f"Summarize this. OUTPUT LANGUAGE: {language}.\\n\\n{transcript}"
+    model_name = model_chain("video_summary")[0]
+    template = f"video_summary_{user_tier}" if user_tier in ("student", "professor", "podcaster") else "video_summary_default"
+    prompt = prompts.render(template, transcript, slide_count=slide_count, language=language)
 
-    response = client.models.generate_content(
-        model=model_name,
-        contents=prompt
-    )
+    response = await _generate("video_summary", prompt)
     
-    # 🕵️ Log usage for budget tracking
+    # 🕵️ Log usage for budget tracking (a cached response cost nothing)
     try:
         usage = response.usage_metadata
-        await log_token_usage(
-            user_id=user_id,
-            plan_type=user_tier,
-            prompt_tokens=usage.prompt_token_count,
-            response_tokens=usage.candidates_token_count
-        )
+        if getattr(response, "cached", False) is not True:
+            await log_token_usage(
+                user_id=user_id,
+                plan_type=user_tier,
+                prompt_tokens=usage.prompt_token_count,
+                response_tokens=usage.candidates_token_count
+            )
     except Exception as e:
         print(f"Usage logging failed: {e}")
         
@@ -380,8 +370,110 @@ async def process_video_content(video_url: str, user_tier: str, user_id: int, sl
         "content": markdown.markdown(response.text)
     }
 
-async def convert_text_to_slides_json(text: str, count: int = 10, tone: str = "neutral", html_content: str = None, language: str = "English"):
-    
+# Call sites whose content block no later call sends: the summary's transcript
+# is followed up from the summary HTML or from retrieved passages instead
+SINGLE_USE_SITES = {"video_summary"}
+
+def _send(model: str, prompt: prompts.RenderedPrompt, config=None, stream: bool = False, reuse_expected: bool = True):
+    """
+    One provider call. When the prompt's content block is registered in the
+    context cache, only the instructions are sent; a handle the provider no
+    longer accepts falls back to the full prompt. Without reuse_expected the
+    block is sent inline and never registered.
+    """
+    call = client.models.generate_content_stream if stream else client.models.generate_content
+    handle = context_cache.handle_for(client, model, prompt.prefix) if reuse_expected else None
+    if handle is not None:
+        if config is not None:
+            cached_config = config.model_copy(update={"cached_content": handle})
+        else:
+            cached_config = types.GenerateContentConfig(cached_content=handle)
+        try:
+            return call(model=model, contents=prompt.instructions, config=cached_config)
+        except Exception as e:
+            if not is_stale_handle_error(e):
+                raise
+            print(f"Context cache handle {handle} rejected ({e}); sending the full prompt")
+            metrics.incr("context_cache_fallbacks")
+            context_cache.forget(model, prompt.prefix)
+
+    kwargs = {"model": model, "contents": prompt.text}
+    if config is not None:
+        kwargs["config"] = config
+    return call(**kwargs)
+
+async def _generate(site: str, prompt: prompts.RenderedPrompt, config_for=None, validate=None, hedge: bool = False):
+    """
+    Generation for a call site: response cache, then the site's model chain
+    (limits, retries, fallbacks), each model using the context cache.
+    config_for(model) gives the generation config for that model.
+    hedge=True (interactive routes) duplicates calls slower than the route's p90.
+    """
+    primary = model_chain(site)[0]
+    # Each attempt reports its model, so fallback and hedge answers aren't cached as the primary's
+    reuse_expected = site not in SINGLE_USE_SITES
+    attempt = lambda model: (_send(model, prompt, config_for(model) if config_for else None, reuse_expected=reuse_expected), model)
+    send = lambda: call_with_fallback(site, attempt)
+    if hedge:
+        alternate = hedge_model(site)
+        send = lambda: hedged(
+            (site, primary), lambda: call_with_fallback(site, attempt),
+            lambda: call_with_fallback(site, attempt, prefer=alternate), (site, alternate or primary)
+        )
+    # Off the event loop: the SDK call blocks, and so do slot waits and retry backoffs
+    return await run_model_call(
+        llm_cache.generate, client, primary, prompt.text, config_for(primary) if config_for else None,
+        validate=validate, send=send
+    )
+
+async def _generate_json_list(artifact_type: str, prompt: prompts.RenderedPrompt) -> list:
+    """
+    Schema-constrained generation, parsed and repaired locally so malformed
+    output never triggers a second call. Raises ValueError if nothing is usable.
+    """
+    response = await _generate(artifact_type, prompt, lambda model: json_config(artifact_type, model), validate=parse_json_list)
+    return parse_json_list(response.text)
+
+async def _stream_json_items(artifact_type: str, prompt: prompts.RenderedPrompt):
+    """Yields list elements as soon as each one is complete in the model's stream."""
+    primary = model_chain(artifact_type)[0]
+    cached = llm_cache.lookup(primary, prompt.text, json_config(artifact_type, primary))
+    if cached is not None:
+        for item in parse_json_list(cached):
+            yield item
+        return
+
+    # Limits, retries and fallbacks cover opening the stream
+    stream, answered_by = await run_model_call(
+        call_with_fallback, artifact_type, lambda model: (_send(model, prompt, json_config(artifact_type, model), True), model)
+    )
+    chunks = iter(stream)
+    parser = JsonArrayStreamParser()
+    received = []
+    count = 0
+    while not parser.finished:
+        # The SDK stream is blocking; pull each chunk off the event loop
+        chunk = await run_model_call(next, chunks, None)
+        if chunk is None:
+            break
+        received.append(chunk.text or "")
+        for item in parser.feed(chunk.text or ""):
+            count += 1
+            yield item
+    if not parser.finished or answered_by != primary:
+        return
+    # Only cache text that replays as the same items on a later lookup
+    text = "".join(received)
+    try:
+        replayable = len(parse_json_list(text)) == count
+    except ValueError:
+        replayable = False
+    if replayable:
+        llm_cache.store(primary, prompt.text, json_config(artifact_type, primary), text)
+    else:
+        print(f"Not caching streamed {artifact_type}: the full text doesn't parse to the streamed items")
+
+def _slides_prompt(text: str, count: int, tone: str, html_content: str | None, language: str) -> prompts.RenderedPrompt:
     # Use HTML content if valid, otherwise fallback to text
     content_to_process = html_content if html_content and len(html_content) > 50 else text
 
@@ -394,85 +486,125 @@ async def convert_text_to_slides_json(text: str, count: int = 10, tone: str = "n
     
     specific_instruction = style_instructions.get(tone.lower(), style_instructions["neutral"])
 
-    prompt = f"""
-    Convert the following content into a JSON structure for a PowerPoint presentation.
-    Create exactly {count} slides.
-    
-    STYLE INSTRUCTION: {specific_instruction}
-    Tone: {tone}
-    OUTPUT LANGUAGE: {language}
-    
-    IMPORTANT: The content may contain HTML <img> tags. If you find an image that is relevant to a specific slide's topic, extract its 'src' attribute and include it in the "image_url" field for that slide.
-    
-    Output must be a plain JSON list of objects. Each object must have:
-    - "title": string (translated to {language})
-    - "points": list of strings (translated to {language})
-    - "notes": string (translated to {language})
-    - "image_url": string (optional, the src URL of the image if one belongs on this slide)
-    
-    Ensure the JSON is valid and properly formatted. Do not include markdown code blocks.
-    
-    Content:
-    {content_to_process}
-    """
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
+    return prompts.render(
+        "slides", content_to_process,
+        count=count, style_instruction=specific_instruction, tone=tone, language=language
     )
-    
-    # Clean markdown if present
-    cleaned_text = response.text.replace("```json", "").replace("```", "").strip()
-    return cleaned_text
+
+async def convert_text_to_slides_json(text: str, count: int = 10, tone: str = "neutral", html_content: str = None, language: str = "English"):
+    prompt = _slides_prompt(text, count, tone, html_content, language)
+    return json.dumps(await _generate_json_list("slides", prompt))
+
+def _quiz_prompt(text: str, language: str) -> prompts.RenderedPrompt:
+    return prompts.render("quiz", text, language=language)
 
 async def generate_quiz_from_text(text: str, language: str = "English"):
-    prompt = f"""
-    Create a multiple-choice quiz based on the following text.
-    Generate 5 to 10 questions.
-    OUTPUT LANGUAGE: {language}
-    
-    Output strictly as a JSON list of objects:
-    [
-      {{
-        "question": "Question text?",
-        "options": ["Option A", "Option B", "Option C", "Option D"],
-        "answer": "Option B"
-      }}
-    ]
-    
-    Text:
-    {text}
-    """
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
-    )
-    cleaned = response.text.replace("```json", "").replace("```", "").strip()
-    return cleaned
+    return json.dumps(await _generate_json_list("quiz", _quiz_prompt(text, language)))
+
+def _flashcards_prompt(text: str, language: str) -> prompts.RenderedPrompt:
+    return prompts.render("flashcards", text, language=language)
 
 async def generate_flashcards_from_text(text: str, language: str = "English"):
-    prompt = f"""
-    Create a set of flashcards based on the key concepts in the following text.
-    Generate 5 to 15 cards.
-    OUTPUT LANGUAGE: {language}
-    
-    Output strictly as a JSON list of objects:
-    [
-      {{
-        "front": "Term or Concept",
-        "back": "Definition or Explanation"
-      }}
-    ]
-    
-    Text:
-    {text}
+    return json.dumps(await _generate_json_list("flashcards", _flashcards_prompt(text, language)))
+
+async def stream_study_items(artifact_type: str, text: str, language: str = "English", count: int = 10, tone: str = "neutral", html_content: str = None):
+    """Slides, quiz questions or flashcards, yielded one by one as the model writes them."""
+    if artifact_type == "slides":
+        prompt = _slides_prompt(text, count, tone, html_content, language)
+    elif artifact_type == "quiz":
+        prompt = _quiz_prompt(text, language)
+    elif artifact_type == "flashcards":
+        prompt = _flashcards_prompt(text, language)
+    else:
+        raise ValueError(f"Cannot stream {artifact_type}")
+    async for item in _stream_json_items(artifact_type, prompt):
+        if isinstance(item, dict):
+            yield item
+
+SPAN_MAX_SECONDS = 20.0 # Auto-captions rarely have punctuation; cap span length instead
+_SENTENCE_END = (".", "!", "?", "…")
+
+def format_clock(seconds: float) -> str:
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+def parse_clock(value) -> float | None:
+    """Parses "[mm:ss]", "h:mm:ss" or plain seconds. Returns None if unparseable."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().strip("[]").strip()
+    try:
+        if ":" not in text:
+            return float(text)
+        seconds = 0.0
+        for part in text.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+def merge_transcript_segments(segments: list, max_seconds: float = SPAN_MAX_SECONDS) -> list:
     """
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
-    )
-    cleaned = response.text.replace("```json", "").replace("```", "").strip()
-    # Remove accidental double cleaning
-    return cleaned
+    Merges caption micro-segments into sentence-level spans of
+    {"text", "start", "end"}. Every span starts on a distinct clock second so
+    its [mm:ss] label maps back to exactly one span.
+    """
+    spans = []
+    current = None
+    for segment in segments:
+        if isinstance(segment, dict):
+            text, start, duration = segment.get("text", ""), segment.get("start", 0), segment.get("duration", 0)
+        else:
+            text, start, duration = getattr(segment, "text", ""), getattr(segment, "start", 0), getattr(segment, "duration", 0)
+        text = " ".join(str(text).split())
+        if not text:
+            continue
+        start, end = float(start), float(start) + float(duration)
+        if current is not None:
+            closed = current["text"].endswith(_SENTENCE_END) or end - current["start"] > max_seconds
+            if not closed or int(start) == int(current["start"]):
+                current["text"] += " " + text
+                current["end"] = max(current["end"], end)
+                continue
+            current["end"] = min(current["end"], start)
+            spans.append(current)
+        current = {"text": text, "start": start, "end": end}
+    if current is not None:
+        spans.append(current)
+    return spans
+
+def encode_transcript(segments: list) -> tuple:
+    """
+    Compact prompt encoding of a timestamped transcript: one "[mm:ss] text"
+    line per span. Returns (encoded_text, spans) where spans maps each label
+    back to its exact (start, end) seconds; see resolve_timestamp.
+    """
+    spans = {}
+    lines = []
+    for span in merge_transcript_segments(segments):
+        label = format_clock(span["start"])
+        spans[label] = (span["start"], span["end"])
+        lines.append(f"[{label}] {span['text']}")
+    return "\n".join(lines), spans
+
+def resolve_timestamp(value, spans: dict, edge: str = "start") -> float | None:
+    """
+    Maps a timestamp from a model answer back to exact seconds. A label of an
+    encoded line resolves to that span's start (or end, with edge="end");
+    other values resolve to the span containing them.
+    """
+    label = str(value).strip().strip("[]").strip() if not isinstance(value, (int, float)) else None
+    if label in spans:
+        return spans[label][0 if edge == "start" else 1]
+    seconds = parse_clock(value)
+    if seconds is None:
+        return None
+    for start, end in spans.values():
+        if start <= seconds < end:
+            return start if edge == "start" else end
+    return seconds
 
 async def identify_viral_clips(video_url: str):
     # 1. Fetch transcript with timestamps
@@ -491,142 +623,144 @@ async def identify_viral_clips(video_url: str):
                 "duration": getattr(item, 'duration', 0)
             })
 
-    # Limit transcript size for prompt context window if needed, but for now send all
-    # To save tokens, we might format it compactly
-    transcript_str = str(cleaned_transcript[:1000]) # send first 1000 chunks ~ maybe 10-15 mins?
-    if len(cleaned_transcript) > 1000:
-        transcript_str += "... (continues)"
-
-    prompt = f"""
-    Analyze the following transcript data (list of {{text, start, duration}}).
-    Identify 3-5 distinct segments (30-90 seconds long) that are most likely to go viral on TikTok/Shorts.
-    Look for: High energy, strong hooks, controversial statements, or "aha" moments.
-
-    Output strictly as a JSON list of objects:
-    [
-      {{
-        "start_time": 120.5,
-        "end_time": 165.0,
-        "viral_score": 95,
-        "reason": "Strong emotional hook about failure.",
-        "suggested_caption": "Wait for the end... 🤯 #motivation"
-      }}
-    ]
-
-    Transcript Data:
-    {transcript_str}
-    """
-    
-    response = client.models.generate_content(
-        model="gemini-2.0-flash-thinking-exp-01-21",
-        contents=prompt
-    )
-    cleaned = response.text.replace("```json", "").replace("```", "").strip()
-    return cleaned
+    # Rank windows locally over the whole video; the model only sees the shortlist
+    candidates = top_candidate_windows(cleaned_transcript)
+    spans = {}
+    blocks = []
+    for i, c in enumerate(candidates):
+        encoded, candidate_spans = encode_transcript(cleaned_transcript[c["first"]:c["last"] + 1])
+        spans.update(candidate_spans)
+        blocks.append(f"Candidate {i + 1}:\n{encoded}")
+    candidates_str = "\n\n".join(blocks)
+
+    prompt = prompts.render("viral_clips", candidates_str)
+    
+    clips = await _generate_json_list("clips", prompt)
+
+    # Map line labels back to exact seconds
+    for clip in clips:
+        if not isinstance(clip, dict):
+            continue
+        if "start" in clip and "start_time" not in clip:
+            clip["start_time"] = resolve_timestamp(clip.pop("start"), spans, "start")
+        if "end" in clip and "end_time" not in clip:
+            clip["end_time"] = resolve_timestamp(clip.pop("end"), spans, "end")
+    return json.dumps(clips)
+
+def _audio_script_prompt(transcript_text: str, language: str) -> prompts.RenderedPrompt:
+    # Long transcripts are cut for the script, unless other generators have already
+    # registered the whole transcript with the context cache
+    primary = model_chain("audio_script")[0]
+    full_content = context_cache.has_handle(primary, prompts.content_prefix(transcript_text))
+    return prompts.render("audio_script", transcript_text, full_content=full_content, language=language)
 
 async def generate_audio_script(transcript_text: str, language: str = "English"):
-    prompt = f"""
-    Convert the following transcript into a natural, engaging podcast dialogue between two hosts:
-    
-    1. **Alex (The Host)**: Curious, enthusiastic, asks clarifying questions, uses analogies.
-    2. **Sam (The Expert)**: Knowledgeable, calm, explains concepts clearly but not dryly.
-    
-    The dialogue should be about 3-5 minutes of reading time (approx 600-800 words).
-    Focus on the core insights. Use "Um", "Exactly", "Right?" to make it sound natural.
-    OUTPUT LANGUAGE: {language}
-    
-    Output strictly as a JSON list of objects:
-    [
-      {{ "speaker": "Alex", "text": "Welcome back! Today we're diving into..." }},
-      {{ "speaker": "Sam", "text": "It's a fascinating topic, Alex. Essentially..." }}
-    ]
-    
-    Transcript:
-    {transcript_text[:15000]} 
-    """
-    
-    response = client.models.generate_content(
-        model="gemini-2.0-flash-thinking-exp-01-21",
-        contents=prompt
-    )
-    cleaned = response.text.replace("```json", "").replace("```", "").strip()
-    return cleaned
-
-async def chat_with_video(transcript_text: str, history: list, question: str):
+    prompt = _audio_script_prompt(transcript_text, language)
+    return json.dumps(await _generate_json_list("audio_script", prompt))
+
+async def stream_audio_script(transcript_text: str, language: str = "English"):
+    """Yields dialogue turns ({speaker, text}) as soon as each one is complete in the model's stream."""
+    prompt = _audio_script_prompt(transcript_text, language)
+    async for turn in _stream_json_items("audio_script", prompt):
+        if isinstance(turn, dict) and turn.get("text"):
+            yield turn
+
+CHAT_RETRIEVAL_MIN_CHARS = 8000 # Below this the whole transcript is cheaper than retrieval
+
+def _build_transcript_index(transcript_text: str, video_url: str | None) -> TranscriptIndex:
+    """Builds (or reuses) the retrieval index for a video or a pasted transcript."""
+    if video_url:
+        key = f"video:{extract_video_id(video_url)}"
+    else:
+        key = "text:" + hashlib.sha256(transcript_text.encode("utf-8")).hexdigest()
+    index = index_cache.get(key)
+    if index is not None:
+        return index
+
+    if video_url:
+        segments = get_transcript(video_url, return_timestamps=True)
+        # The metadata fallback comes back as plain text without timestamps
+        spans = text_to_spans(segments) if isinstance(segments, str) else merge_transcript_segments(segments)
+    else:
+        spans = text_to_spans(transcript_text)
+    index = TranscriptIndex(spans)
+    index_cache.put(key, index)
+    return index
+
+def _format_passages(passages: list) -> str:
+    blocks = []
+    for spans in passages:
+        blocks.append("\n".join(
+            f"[{format_clock(s['start'])}] {s['text']}" if s["start"] is not None else s["text"]
+            for s in spans
+        ))
+    return "\n...\n".join(blocks)
+
+async def chat_with_video(transcript_text: str, history: list, question: str, video_url: str = None, summary: str = "", cache_scope: str = None):
     """
     Answers a question based strictly on the transcript context.
     History is a list of {"role": "user"|"model", "text": "..."}
+    Long transcripts (or a video_url) are served from a cached BM25 index, and
+    only the passages relevant to this turn are sent. `summary` stands in for
+    older turns that have been compacted out of `history`.
+    With a cache_scope (class code), opening questions are answered from the
+    class-wide answer cache when a near-duplicate was already asked.
     """
     
     # Format history for prompt
-    formatted_history = ""
+    formatted_history = f"(Earlier in this conversation: {summary})\n" if summary else ""
     for turn in history:
         role = "Student" if turn.get("role") == "user" else "Assistant"
         formatted_history += f"{role}: {turn.get('text', '')}\n"
-    
-    prompt = f"""
-    You are a helpful teaching assistant for this video course. 
-    Answer the student's question based strictly on the provided transcript below.
-    If the answer is not in the transcript, say "I don't see that covered in the video, but generally..." and give a brief general answer if you know it, but be clear it's not in the video.
-    Keep answers concise (2-3 sentences max usually) and conversational.
-    
-    Transcript:
-    {transcript_text}
-    
-    Chat History:
-    {formatted_history}
-    
-    Student Question: {question}
-    """
-    
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
+
+    context_label = "the video transcript"
+    context = transcript_text
+    index = None
+    if video_url or len(transcript_text) >= CHAT_RETRIEVAL_MIN_CHARS:
+        index = await asyncio.to_thread(_build_transcript_index, transcript_text, video_url)
+        # Follow-ups like "what about the second one?" need the previous question's terms
+        last_user = next((t.get("text", "") for t in reversed(history) if t.get("role") == "user"), "")
+        passages = index.passages(f"{question} {last_user}")
+        context_label = "the transcript excerpts relevant to the question ([mm:ss] is when each line starts)"
+        context = _format_passages(passages) or "(No passage matched the question.)"
+
+    # Only context-free questions are shareable between students
+    cache_args = None
+    if cache_scope and not history and not summary:
+        fingerprint = index.fingerprint if index else hashlib.sha256(transcript_text.encode("utf-8")).hexdigest()
+        video_key = extract_video_id(video_url) if video_url else fingerprint
+        cache_args = (cache_scope, video_key, fingerprint)
+        cached = answer_cache.get(*cache_args, question)
+        if cached is not None:
+            return cached
+    
+    prompt = prompts.render(
+        "chat", context, context_label=context_label, history=formatted_history, question=question
     )
+    
+    response = await _generate("chat", prompt, hedge=True)
+    if cache_args:
+        answer_cache.put(*cache_args, question, response.text)
     return response.text
 
+async def summarize_chat_history(summary: str, turns: list) -> str:
+    """Folds older chat turns into the running conversation summary."""
+    formatted = "\n".join(
+        f"{'Student' if t.get('role') == 'user' else 'Assistant'}: {t.get('text', '')}" for t in turns
+    )
+    content = f"Current summary:\n{summary or '(none)'}\n\nNew turns to fold in:\n{formatted}"
+    prompt = prompts.render("chat_summary", content)
+    response = await _generate("chat_summary", prompt)
+    return response.text.strip()
+
 async def generate_blog_from_text(text: str, language: str = "English"):
     """Generates a structured, SEO-optimized blog post from video/transcript text."""
-    prompt = f"""
-    Transform the following transcript/content into a professional, engaging, and SEO-optimized blog post.
-    Include:
-    - A catchy headline (H1)
-    - An introduction that hooks the reader
-    - Several subheadings (H2, H3)
-    - Bullet points for readability
-    - A 'Key Takeaways' section
-    - A conclusion with a call to action
-    
-    OUTPUT LANGUAGE: {language}
-    Tone: Engaging and Informative.
-    
-    Content:
-    {text}
-    """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt
-    )
+    prompt = prompts.render("blog", text, language=language)
+    response = await _generate("blog", prompt)
     return response.text
 
 async def generate_carousel_from_text(text: str, language: str = "English"):
     """Generates a slide-by-slide guide for highly engaging social media carousels (LinkedIn/Insta)."""
-    prompt = f"""
-    Create a 7-10 slide social media carousel script (for LinkedIn or Instagram) based on the following text.
-    For each slide, provide:
-    - Slide Number
-    - 'Hook' or Headline
-    - Main body text (concise, punchy)
-    - Visual description/idea for the designer
-    
-    OUTPUT LANGUAGE: {language}
-    Format the output as a clear reading guide (not JSON).
-    
-    Content:
-    {text}
-    """
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt
-    )
+    prompt = prompts.render("carousel", text, language=language)
+    response = await _generate("carousel", prompt)
     return response.text
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.config import settings
+from app.services import metrics
+
+# Request hedging for interactive call sites: when a call has taken longer than
+# the rolling p90 latency for its route and model, a duplicate is sent (to a
+# faster model where one is configured) and whichever answers first wins.
+# Hedges are paid for out of a global budget earned by ordinary calls, so they
+# can never exceed LLM_HEDGE_BUDGET extra calls. Off unless that is set.
+
+HEDGE_MODELS = {
+    "chat": "gemini-2.0-flash", # Faster than the primary gemini-2.5-flash
+    "rewrite": "gemini-2.0-flash", # Not the gemini-1.5-flash call that is already slow
+}
+
+LATENCY_WINDOW = 200 # Most recent latencies kept per (site, model)
+MIN_SAMPLES = 20 # Don't hedge before the p90 means something
+HEDGE_PERCENTILE = 0.9
+BUDGET_BURST = 10 # Most hedges that can be saved up for a burst of slow calls
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+class LatencyTracker:
+    """Rolling window of successful call latencies (seconds) per key."""
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: tuple, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: tuple, q: float = HEDGE_PERCENTILE) -> float | None:
+        """None until MIN_SAMPLES calls have been seen."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+class HedgeBudget:
+    """Every hedgeable call earns `ratio` of a hedge; a hedge spends a whole one."""
+    def __init__(self, burst: float = BUDGET_BURST):
+        self.burst = burst
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self, ratio: float):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            # Tolerance for the float sum of ratios (20 x 0.05 is not exactly 1)
+            if self.tokens < 1 - 1e-9:
+                return False
+            self.tokens = max(0.0, self.tokens - 1)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self.tokens = 0.0
+
+latency = LatencyTracker()
+budget = HedgeBudget()
+
+def hedge_model(site: str) -> str | None:
+    """Model to send hedges to; None means the site's usual chain."""
+    return HEDGE_MODELS.get(site)
+
+def _timed(key: tuple, call):
+    started = time.monotonic()
+    result = call()
+    latency.record(key, time.monotonic() - started)
+    return result
+
+def hedged(key: tuple, primary, hedge, hedge_key: tuple = None):
+    """
+    Runs primary(); if it is still running after the p90 for key and the budget
+    allows, also runs hedge() and returns whichever succeeds first. key is
+    (site, model). Blocking; run it off the event loop.
+
+    The SDK calls are synchronous, so a losing call can't be aborted: it is
+    cancelled if it hasn't started, and otherwise left to finish unobserved.
+    """
+    budget.earn(settings.LLM_HEDGE_BUDGET)
+    delay = latency.percentile(key)
+    first = _executor.submit(_timed, key, primary)
+    if delay is None or settings.LLM_HEDGE_BUDGET <= 0:
+        return first.result()
+
+    done, _ = wait([first], timeout=delay)
+    if done or not budget.spend():
+        return first.result()
+
+    metrics.incr("llm_hedges")
+    second = _executor.submit(_timed, hedge_key or key, hedge)
+    pending = {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                if future is second:
+                    metrics.incr("llm_hedge_wins")
+                return future.result()
+    # Both failed: report the original call's error
+    return first.result()
+
+def reset():
+    latency.clear()
+    budget.clear()
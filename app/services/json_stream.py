@@ -0,0 +1,177 @@
+import json
+import re
+
+# Local repair of the usual defects in model-written JSON (markdown fences,
+# prose before or after the value, trailing commas, smart quotes, output cut
+# off mid-element), so a sloppy answer never costs a second generation.
+
+_TRAILING_COMMA_RE = re.compile(r",(\s*[\]}])")
+MAX_START_ATTEMPTS = 5
+_SMART_QUOTES = {"\u201c": '"', "\u201d": '"'}
+
+def _strip_fences(text: str) -> str:
+    return text.replace("```json", "").replace("```", "").strip()
+
+def _escape_control_chars(text: str) -> str:
+    # Raw newlines/tabs inside strings are invalid JSON but common in model output
+    out = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char in "\n\r\t":
+                char = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}[char]
+        elif char == '"':
+            in_string = True
+        out.append(char)
+    return "".join(out)
+
+def _decode_from(text: str) -> tuple:
+    """(value, characters consumed) for the JSON value text starts with."""
+    decoder = json.JSONDecoder()
+    fixed = _TRAILING_COMMA_RE.sub(r"\1", _escape_control_chars(text))
+    if '"' not in fixed:
+        for smart, plain in _SMART_QUOTES.items():
+            fixed = fixed.replace(smart, plain)
+    for candidate in (text, fixed):
+        try:
+            # raw_decode stops at the end of the value and ignores trailing prose
+            return decoder.raw_decode(candidate)
+        except ValueError:
+            continue
+    if fixed.startswith("["):
+        # Truncated or partly broken array: keep every element that is complete
+        items = JsonArrayStreamParser().feed(fixed)
+        if items:
+            return items, len(fixed)
+    raise ValueError("Model output is not valid JSON")
+
+def repair_json(text: str):
+    """
+    Parses the main JSON array or object in text, repairing what it can.
+    Raises ValueError if nothing usable is found.
+    """
+    text = _strip_fences(text or "")
+    # Prose around the value may itself contain brackets ("the [5] questions"),
+    # so try a few openings and keep the longest value
+    best = None
+    for match in list(re.finditer(r"[\[{]", text))[:MAX_START_ATTEMPTS]:
+        try:
+            value, length = _decode_from(text[match.start():])
+        except ValueError:
+            continue
+        if best is None or length > best[1]:
+            best = (value, length)
+    if best is None:
+        raise ValueError("Model output is not valid JSON")
+    return best[0]
+
+def parse_json_list(text: str) -> list:
+    """repair_json for outputs that must be a list; a lone object becomes a one-item list."""
+    value = repair_json(text)
+    if isinstance(value, dict):
+        # Some models wrap the list: {"slides": [...]}
+        lists = [v for v in value.values() if isinstance(v, list)]
+        return lists[0] if len(lists) == 1 else [value]
+    if not isinstance(value, list):
+        raise ValueError("Model output is not a JSON list")
+    return value
+
+class JsonArrayStreamParser:
+    """
+    Incrementally parses a streamed top-level JSON array (optionally wrapped in
+    markdown fences or prose) and returns each element as soon as it is complete.
+    """
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        self._buffer += chunk
+        while self._pos < len(self._buffer) and not self._finished:
+            char = self._buffer[self._pos]
+            if not self._started:
+                if char == "[":
+                    # Prose may contain brackets too ("our [2] hosts"): only an
+                    # opening followed by an element or the closing bracket counts
+                    following = self._buffer[self._pos + 1:].lstrip()
+                    if not following:
+                        break # Wait for the next chunk to decide
+                    if following[0] in '{"[]':
+                        self._started = True
+                        self._depth = 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._item_start is None:
+                    self._item_start = self._pos
+            elif char in "[{":
+                if self._depth == 1 and self._item_start is None:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 1 and self._item_start is not None:
+                    items.extend(self._emit(self._buffer[self._item_start:self._pos + 1]))
+                    self._item_start = None
+                elif self._depth == 0:
+                    items.extend(self._pending_scalar())
+                    self._finished = True
+            elif char == "," and self._depth == 1:
+                items.extend(self._pending_scalar(end=self._pos))
+            elif self._depth == 1 and self._item_start is None and not char.isspace():
+                self._item_start = self._pos
+            self._pos += 1
+        self._compact()
+        return items
+
+    def _emit(self, raw: str) -> list:
+        try:
+            return [json.loads(raw)]
+        except json.JSONDecodeError:
+            pass
+        try:
+            return [json.loads(_TRAILING_COMMA_RE.sub(r"\1", _escape_control_chars(raw)))]
+        except json.JSONDecodeError as e:
+            print(f"Skipping malformed streamed JSON item: {e}")
+            return []
+
+    def _pending_scalar(self, end: int = None) -> list:
+        # Bare values (strings, numbers) between commas at the top level
+        if self._item_start is None:
+            return []
+        end = end if end is not None else self._pos
+        raw = self._buffer[self._item_start:end].strip()
+        self._item_start = None
+        return self._emit(raw) if raw else []
+
+    def _compact(self):
+        # Drop text we will never look at again so memory stays bounded
+        keep_from = self._item_start if self._item_start is not None else self._pos
+        if keep_from > 4096:
+            self._buffer = self._buffer[keep_from:]
+            self._pos -= keep_from
+            if self._item_start is not None:
+                self._item_start -= keep_from
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
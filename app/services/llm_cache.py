@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+import hashlib
+import json
+import time
+import zlib
+from app.config import settings
+from app.services import metrics
+from app.services.disk_lru import DiskLRUCache
+
+# Memoizes model calls by (model, rendered prompt, generation config). A small
+# in-memory LRU sits in front of a size-capped disk tier shared by workers, so
+# re-quizzing the same text or re-running a generator costs a lookup instead of
+# a model call. Only successful text responses are stored.
+
+MEMORY_ENTRIES = 256
+
+_bypass = ContextVar("llm_cache_bypass", default=False)
+
+@contextmanager
+def bypass():
+    """Skips cache reads (but still stores fresh results) for calls made inside the block."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def _config_repr(config):
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        return config.model_dump(exclude_none=True, mode="json")
+    return config
+
+def cache_key(model: str, contents, config=None) -> str:
+    payload = json.dumps([model, contents, _config_repr(config)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CachedResponse(SimpleNamespace):
+    """Stands in for an SDK response served from the cache; it used no tokens."""
+    def __init__(self, text: str):
+        super().__init__(
+            text=text,
+            usage_metadata=SimpleNamespace(prompt_token_count=0, candidates_token_count=0, total_token_count=0),
+            cached=True,
+        )
+
+class ResponseCache(DiskLRUCache):
+    """
+    An in-memory LRU in front of the disk tier. Entries older than ttl are ignored.
+    """
+    suffix = ".json.z"
+    name = "llm"
+
+    def __init__(self, directory, max_bytes: int, ttl: float, memory_entries: int = MEMORY_ENTRIES):
+        super().__init__(directory, max_bytes)
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry["created"] < self.ttl:
+                self._memory.move_to_end(key)
+                return entry
+        data = self._read(key)
+        if data is None:
+            return None
+        try:
+            entry = json.loads(zlib.decompress(data))
+        except (ValueError, zlib.error):
+            return None
+        if now - entry["created"] >= self.ttl:
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: dict):
+        self._remember(key, entry)
+        self._write(key, zlib.compress(json.dumps(entry).encode("utf-8")))
+
+    def _remember(self, key: str, entry: dict):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def clear_memory(self):
+        """Drops the in-memory tier only, as a fresh worker process would start."""
+        with self._lock:
+            self._memory.clear()
+
+    def clear(self):
+        self.clear_memory()
+        super().clear()
+
+response_cache = ResponseCache(settings.LLM_CACHE_DIR, settings.LLM_CACHE_MAX_BYTES, settings.LLM_CACHE_TTL_SECONDS)
+
+def lookup(model: str, contents, config=None, bypass_cache: bool = False) -> str | None:
+    """Cached response text for this call, counting the hit or miss."""
+    if not (bypass_cache or _bypass.get()):
+        entry = response_cache.get(cache_key(model, contents, config))
+        if entry is not None:
+            metrics.incr("llm_cache_hits")
+            metrics.incr("llm_cache_tokens_saved", entry.get("tokens", 0))
+            return entry["text"]
+    metrics.incr("llm_cache_misses")
+    return None
+
+def store(model: str, contents, config, text: str, usage=None):
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    response_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    tokens = prompt_tokens + response_tokens if isinstance(prompt_tokens, int) and isinstance(response_tokens, int) else 0
+    response_cache.put(cache_key(model, contents, config), {"text": text, "tokens": tokens, "created": time.time()})
+
+def generate(client, model: str, contents, config=None, bypass_cache: bool = False, validate=None, send=None):
+    """
+    client.models.generate_content through the cache. A hit returns a
+    CachedResponse; a miss returns the SDK response and stores its text.
+    bypass_cache (or a surrounding bypass() block) forces a fresh call.
+    validate(text), if given, must not raise for the text to be stored.
+    send(), if given, makes the provider call in place of the plain one and
+    returns (response, model that answered). Answers from another model (a
+    fallback or a hedge) are returned but not stored under this model's key.
+    """
+    text = lookup(model, contents, config, bypass_cache)
+    if text is not None:
+        return CachedResponse(text)
+
+    answered_by = model
+    if send is not None:
+        response, answered_by = send()
+    else:
+        kwargs = {"model": model, "contents": contents}
+        if config is not None:
+            kwargs["config"] = config
+        response = client.models.generate_content(**kwargs)
+    # Prompt tokens the provider served from its own prefix cache (see prompts.py)
+    cached_tokens = getattr(getattr(response, "usage_metadata", None), "cached_content_token_count", None)
+    if isinstance(cached_tokens, int):
+        metrics.incr("llm_prompt_cached_tokens", cached_tokens)
+
+    text = getattr(response, "text", None)
+    if isinstance(text, str) and text:
+        if validate is not None:
+            validate(text)
+        if answered_by != model:
+            metrics.incr("llm_cache_skipped_fallbacks")
+            return response
+        store(model, contents, config, text, getattr(response, "usage_metadata", None))
+    return response
@@ -0,0 +1,28 @@
+import threading
+from collections import defaultdict
+
+# Process-local counters (cache hits, tokens saved, ...). Exposed at /metrics.
+_counters = defaultdict(float)
+_lock = threading.Lock()
+
+def incr(name: str, amount: float = 1):
+    with _lock:
+        _counters[name] += amount
+
+def get(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+def ratio(hits: str, misses: str) -> float:
+    """Hit ratio of two counters, 0.0 when nothing has been counted yet."""
+    with _lock:
+        total = _counters.get(hits, 0) + _counters.get(misses, 0)
+        return round(_counters.get(hits, 0) / total, 4) if total else 0.0
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(_counters)
+
+def reset():
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import functools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from google.genai import errors
+from app.config import settings
+from app.services import metrics
+
+# Protection around every model call:
+# - a per-model AIMD concurrency limit that halves on 429s and creeps back up on
+#   successes, so throughput tracks the quota we actually have;
+# - jittered exponential retries for throttling and transient server errors;
+# - a per-model circuit breaker, so a model that keeps failing is skipped;
+# - a fallback chain of models per call site (overridable via MODEL_FALLBACKS).
+
+MODEL_CHAINS = {
+    "video_summary": ["gemini-2.5-flash", "gemini-2.0-flash"],
+    "slides": ["gemini-2.5-flash", "gemini-2.0-flash"],
+    "quiz": ["gemini-2.5-flash", "gemini-2.0-flash"],
+    "flashcards": ["gemini-2.5-flash", "gemini-2.0-flash"],
+    "chat": ["gemini-2.5-flash", "gemini-2.0-flash"],
+    "chat_summary": ["gemini-2.5-flash", "gemini-2.0-flash"],
+    "blog": ["gemini-2.0-flash", "gemini-2.5-flash"],
+    "carousel": ["gemini-2.0-flash", "gemini-2.5-flash"],
+    # Experimental models can be withdrawn without notice
+    "clips": ["gemini-2.0-flash-thinking-exp-01-21", "gemini-2.5-flash", "gemini-2.0-flash"],
+    "audio_script": ["gemini-2.0-flash-thinking-exp-01-21", "gemini-2.5-flash"],
+    "rewrite": ["gemini-1.5-flash", "gemini-2.0-flash"],
+}
+
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 32
+DECREASE_FACTOR = 0.5
+ACQUIRE_TIMEOUT_SECONDS = 30
+
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+
+# Guarded calls hold their thread while they wait for a slot (up to
+# ACQUIRE_TIMEOUT_SECONDS) or back off, so they run on their own pool rather
+# than asyncio's small default executor, where they would starve other work.
+# One thread per slot every model's limiter can hand out.
+MODEL_CALL_WORKERS = MAX_LIMIT * len({model for chain in MODEL_CHAINS.values() for model in chain})
+
+_executor = ThreadPoolExecutor(max_workers=MODEL_CALL_WORKERS, thread_name_prefix="llm-call")
+
+class ModelUnavailableError(Exception):
+    """Every model for a call site is throttled, failing or open-circuited."""
+    def __init__(self, message: str, retry_after: int = BREAKER_RESET_SECONDS):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Busy(Exception):
+    """No concurrency slot became free in time."""
+
+async def run_model_call(func, *args, **kwargs):
+    """Awaits a blocking model call (or anything that makes one) on the model-call pool."""
+    loop = asyncio.get_running_loop()
+    # Like asyncio.to_thread, carry context variables (e.g. llm_cache.bypass) into the thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def model_chain(site: str) -> list:
+    return list(settings.MODEL_FALLBACKS.get(site) or MODEL_CHAINS[site])
+
+def classify(error: Exception) -> str:
+    """'throttled', 'unavailable', 'gone' (model missing) or 'fatal' (the request itself is bad)."""
+    if isinstance(error, _Busy):
+        return "throttled"
+    if isinstance(error, errors.APIError):
+        if error.code == 429:
+            return "throttled"
+        if error.code in (500, 502, 503, 504):
+            return "unavailable"
+        if error.code == 404:
+            return "gone"
+        return "fatal"
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, ConnectionError, TimeoutError)):
+        return "unavailable"
+    return "fatal"
+
+class AIMDLimiter:
+    """Concurrency limit: +1/limit per success (about +1 per round of calls), halved on throttling."""
+    def __init__(self, initial: int = INITIAL_LIMIT, minimum: int = MIN_LIMIT, maximum: int = MAX_LIMIT):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+
+    def acquire(self, timeout: float = ACQUIRE_TIMEOUT_SECONDS) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, started: float, throttled: bool = False, succeeded: bool = True):
+        """started is the monotonic time the call began; 429s from calls already in flight at the last decrease are one signal."""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+                    self._last_decrease = time.monotonic()
+                    metrics.incr("model_limit_decreases")
+            elif succeeded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+class CircuitBreaker:
+    """Opens after BREAKER_THRESHOLD consecutive failures; after a cool-off one trial call is let through."""
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_after: float = BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None and not self._trial_in_flight
+
+    def end_trial(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # A failed trial re-opens at once
+            if self._trial_in_flight or self.failures >= self.threshold:
+                if self.opened_at is None or self._trial_in_flight:
+                    metrics.incr("model_circuit_opened")
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+_limiters = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+def _guards(model: str) -> tuple:
+    with _registry_lock:
+        if model not in _limiters:
+            _limiters[model] = AIMDLimiter()
+            _breakers[model] = CircuitBreaker()
+        return _limiters[model], _breakers[model]
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: spreads retries from concurrent callers instead of synchronizing them."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def _call_with_retries(model: str, call):
+    limiter, breaker = _guards(model)
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            if not limiter.acquire():
+                raise _Busy(f"{model} has no free concurrency slot")
+            started = time.monotonic()
+            try:
+                result = call(model)
+            except Exception as e:
+                kind = classify(e)
+                limiter.release(started, throttled=(kind == "throttled"), succeeded=False)
+                if kind in ("unavailable", "gone"):
+                    breaker.record_failure()
+                else:
+                    # A 429 or a rejected request still means the model is up; the limiter handles quota
+                    breaker.record_success()
+                if kind == "fatal":
+                    raise
+                if kind == "gone" or attempt == MAX_RETRIES or breaker.is_open:
+                    raise
+                metrics.incr("model_retries")
+                time.sleep(backoff_delay(attempt))
+                continue
+            limiter.release(started)
+            breaker.record_success()
+            return result
+    finally:
+        # A trial that ended without an outcome (no free slot, or an unexpected error) must not stay in flight
+        breaker.end_trial()
+
+def call_with_fallback(site: str, call, prefer: str = None):
+    """
+    Runs call(model) for the first usable model of the site's chain (prefer, if
+    given, is tried first). Blocking; run it off the event loop. Raises
+    ModelUnavailableError when every model is throttled or down, and re-raises
+    errors caused by the request itself.
+    """
+    chain = model_chain(site)
+    if prefer:
+        chain = [prefer] + [m for m in chain if m != prefer]
+    last_error = None
+    for index, model in enumerate(chain):
+        _, breaker = _guards(model)
+        if not breaker.allow():
+            last_error = f"{model} circuit open"
+            continue
+        try:
+            return _call_with_retries(model, call)
+        except Exception as e:
+            if classify(e) == "fatal":
+                raise
+            last_error = f"{model}: {e}"
+            if index + 1 < len(chain):
+                metrics.incr("model_fallbacks")
+                print(f"Model {model} unavailable for {site} ({e}); falling back to {chain[index + 1]}")
+    raise ModelUnavailableError(f"The AI service is busy, please retry shortly ({last_error})")
+
+def snapshot() -> dict:
+    """Current concurrency limit and breaker state per model, for /metrics."""
+    with _registry_lock:
+        return {
+            model: {"limit": round(_limiters[model].limit, 2), "in_flight": _limiters[model].in_flight,
+                    "circuit_open": _breakers[model].opened_at is not None}
+            for model in _limiters
+        }
+
+def reset():
+    with _registry_lock:
+        _limiters.clear()
+        _breakers.clear()
@@ -0,0 +1,123 @@
+# Minimal MPEG audio frame walker: joins TTS clips on frame boundaries and
+# builds the per-line segment index that makes podcasts seekable.
+
+# Bitrates in kbps, indexed by [table][bitrate_index]
+_BITRATES = {
+    "V1L1": [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    "V1L2": [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    "V1L3": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "V2L1": [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    "V2L23": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000], # MPEG1
+    2: [22050, 24000, 16000], # MPEG2
+    0: [11025, 12000, 8000],  # MPEG2.5
+}
+
+def _parse_header(data: bytes, pos: int):
+    """Returns (frame_length, samples, sample_rate) for a valid header at pos, else None."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = (data[pos + 2] >> 4) & 0x0F
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    padding = (data[pos + 2] >> 1) & 0x01
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        table = {3: "V1L1", 2: "V1L2", 1: "V1L3"}[layer]
+    else:
+        table = "V2L1" if layer == 3 else "V2L23"
+    bitrate = _BITRATES[table][bitrate_index] * 1000
+
+    if layer == 3: # Layer I
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 2: # Layer II
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    # Layer III
+    if version == 3:
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+def _skip_id3v2(data: bytes) -> int:
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+def _is_vbr_header(frame: bytes) -> bool:
+    # Xing/Info/VBRI frames carry no audio and describe only the original clip
+    return any(tag in frame[:64] for tag in (b"Xing", b"Info", b"VBRI"))
+
+def clean_clip(data: bytes):
+    """
+    Strips ID3 tags, VBR header frames and any partial frames from one clip.
+    Returns (audio_bytes, duration_seconds, sample_rate). Data without any
+    recognizable MPEG frames is passed through unchanged.
+    """
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+    pos = _skip_id3v2(data)
+    frames = []
+    samples_total = 0
+    sample_rate = None
+    first = True
+    while pos < end:
+        header = _parse_header(data, pos)
+        if header is None:
+            pos += 1 # Resync on garbage
+            continue
+        length, samples, rate = header
+        if pos + length > end:
+            break
+        frame = data[pos:pos + length]
+        if not (first and _is_vbr_header(frame)):
+            frames.append(frame)
+            samples_total += samples
+            sample_rate = sample_rate or rate
+        first = False
+        pos += length
+    if not frames:
+        return data, 0.0, None
+    return b"".join(frames), samples_total / sample_rate, sample_rate
+
+class SegmentIndex:
+    """Tracks byte and time offsets of each dialogue line as clips are appended."""
+    def __init__(self):
+        self.segments = []
+        self.byte_offset = 0
+        self.time_offset = 0.0
+        self.sample_rate = None
+
+    def append(self, clip: bytes, line: int, speaker: str = "", text: str = "") -> bytes:
+        audio, duration, sample_rate = clean_clip(clip)
+        if audio:
+            self.segments.append({
+                "line": line,
+                "speaker": speaker,
+                "text": text,
+                "byte_offset": self.byte_offset,
+                "byte_length": len(audio),
+                "start_time": round(self.time_offset, 3),
+                "duration": round(duration, 3),
+            })
+            self.byte_offset += len(audio)
+            self.time_offset += duration
+            self.sample_rate = self.sample_rate or sample_rate
+        return audio
+
+    def to_dict(self) -> dict:
+        return {
+            "duration": round(self.time_offset, 3),
+            "total_bytes": self.byte_offset,
+            "sample_rate": self.sample_rate,
+            "segments": self.segments,
+        }
+
+def index_path_for(audio_path: str) -> str:
+    base = audio_path[:-4] if audio_path.endswith(".mp3") else audio_path
+    return f"{base}.index.json"
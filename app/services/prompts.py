@@ -0,0 +1,168 @@
+from typing import NamedTuple
+
+# Central registry of generation prompts. Every prompt starts with the large
+# shared content (transcript or notes) in one canonical block, followed by the
+# task instructions. Quiz, flashcards, slides, blog and chat on the same content
+# therefore send byte-identical prefixes, which the provider's implicit prompt
+# caching can reuse across follow-up generations.
+
+CONTENT_HEADER = "SOURCE CONTENT (everything between <<< and >>>):\n<<<\n"
+CONTENT_FOOTER = "\n>>>\n\nTASK:\n"
+
+class RenderedPrompt(NamedTuple):
+    prefix: str # Depends only on the content, never on the task
+    instructions: str
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.instructions
+
+def canonical_content(content: str) -> str:
+    """Whitespace-normalized content, so trivially different copies share a prefix."""
+    lines = (content or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+def content_prefix(content: str) -> str:
+    return CONTENT_HEADER + canonical_content(content) + CONTENT_FOOTER
+
+TEMPLATES = {
+    "video_summary_student": """Summarize the video transcript above into concise bullet points suitable for study notes. Target length: {slide_count} slides/sections. OUTPUT LANGUAGE: {language}.""",
+
+    "video_summary_professor": """Create a detailed academic study guide with citations based on the transcript above. Structure the guide into {slide_count} distinct chapters or modules. OUTPUT LANGUAGE: {language}.""",
+
+    "video_summary_podcaster": """Generate slide descriptions and visual imagery ideas for a presentation based on the transcript above. PRODUCE EXACTLY {slide_count} SLIDES. For each slide, provide the text content and a prompt for an image generator. OUTPUT LANGUAGE: {language}.""",
+
+    "video_summary_default": """Summarize this. OUTPUT LANGUAGE: {language}.""",
+
+    "slides": """Convert the content above into a JSON structure for a PowerPoint presentation.
+Create exactly {count} slides.
+
+STYLE INSTRUCTION: {style_instruction}
+Tone: {tone}
+OUTPUT LANGUAGE: {language}
+
+IMPORTANT: The content may contain HTML <img> tags. If you find an image that is relevant to a specific slide's topic, extract its 'src' attribute and include it in the "image_url" field for that slide.
+
+Output must be a plain JSON list of objects. Each object must have:
+- "title": string (translated to {language})
+- "points": list of strings (translated to {language})
+- "notes": string (translated to {language})
+- "image_url": string (optional, the src URL of the image if one belongs on this slide)
+
+Ensure the JSON is valid and properly formatted. Do not include markdown code blocks.""",
+
+    "quiz": """Create a multiple-choice quiz based on the content above.
+Generate 5 to 10 questions.
+OUTPUT LANGUAGE: {language}
+
+Output strictly as a JSON list of objects:
+[
+  {{
+    "question": "Question text?",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "answer": "Option B"
+  }}
+]""",
+
+    "flashcards": """Create a set of flashcards based on the key concepts in the content above.
+Generate 5 to 15 cards.
+OUTPUT LANGUAGE: {language}
+
+Output strictly as a JSON list of objects:
+[
+  {{
+    "front": "Term or Concept",
+    "back": "Definition or Explanation"
+  }}
+]""",
+
+    "blog": """Transform the content above into a professional, engaging, and SEO-optimized blog post.
+Include:
+- A catchy headline (H1)
+- An introduction that hooks the reader
+- Several subheadings (H2, H3)
+- Bullet points for readability
+- A 'Key Takeaways' section
+- A conclusion with a call to action
+
+OUTPUT LANGUAGE: {language}
+Tone: Engaging and Informative.""",
+
+    "carousel": """Create a 7-10 slide social media carousel script (for LinkedIn or Instagram) based on the content above.
+For each slide, provide:
+- Slide Number
+- 'Hook' or Headline
+- Main body text (concise, punchy)
+- Visual description/idea for the designer
+
+OUTPUT LANGUAGE: {language}
+Format the output as a clear reading guide (not JSON).""",
+
+    "audio_script": """Convert the transcript above into a natural, engaging podcast dialogue between two hosts:
+
+1. **Alex (The Host)**: Curious, enthusiastic, asks clarifying questions, uses analogies.
+2. **Sam (The Expert)**: Knowledgeable, calm, explains concepts clearly but not dryly.
+
+The dialogue should be about 3-5 minutes of reading time (approx 600-800 words).
+Focus on the core insights. Use "Um", "Exactly", "Right?" to make it sound natural.
+OUTPUT LANGUAGE: {language}
+
+Output strictly as a JSON list of objects:
+[
+  {{ "speaker": "Alex", "text": "Welcome back! Today we're diving into..." }},
+  {{ "speaker": "Sam", "text": "It's a fascinating topic, Alex. Essentially..." }}
+]""",
+
+    "viral_clips": """Above are candidate segments from a video transcript, pre-selected for energy, hooks and novelty.
+Each line is "[mm:ss] text", where mm:ss is when that line starts.
+Pick the 3-5 segments (30-90 seconds long) that are most likely to go viral on TikTok/Shorts.
+Look for: High energy, strong hooks, controversial statements, or "aha" moments.
+A segment must stay within one candidate.
+
+Output strictly as a JSON list of objects, where "start" is the [mm:ss] label of the
+segment's first line and "end" is the [mm:ss] label of its last line:
+[
+  {{
+    "start": "02:00",
+    "end": "02:41",
+    "viral_score": 95,
+    "reason": "Strong emotional hook about failure.",
+    "suggested_caption": "Wait for the end... 🤯 #motivation"
+  }}
+]""",
+
+    "chat": """You are a helpful teaching assistant for this video course.
+The content above is {context_label}.
+Answer the student's question based strictly on it.
+If the answer is not in the transcript, say "I don't see that covered in the video, but generally..." and give a brief general answer if you know it, but be clear it's not in the video.
+Keep answers concise (2-3 sentences max usually) and conversational.
+
+Chat History:
+{history}
+
+Student Question: {question}""",
+
+    "chat_summary": """The content above is a running summary of a tutoring conversation about a video, followed by new turns.
+Update the summary to fold in the new turns.
+Keep what the student asked, what was answered, and anything they said they struggle with.
+Write at most 120 words of plain prose.""",
+}
+
+# Templates that should only draw on the start of long content. The content is
+# cut there, unless the caller already has the full block registered in the
+# context cache: then the block stays whole (cutting it would miss the cache)
+# and the cut-off is stated in the instructions instead.
+MAX_CONTENT_CHARS = {"audio_script": 15000}
+SCOPE_ANCHOR_CHARS = 80
+
+def render(name: str, content: str, full_content: bool = False, **params) -> RenderedPrompt:
+    """The named prompt for `content`: canonical content block first, then the instructions."""
+    instructions = TEMPLATES[name].format(**params)
+    limit = MAX_CONTENT_CHARS.get(name)
+    canonical = canonical_content(content)
+    if limit is not None and len(canonical) > limit:
+        if not full_content:
+            return RenderedPrompt(content_prefix(canonical[:limit]), instructions)
+        anchor = " ".join(canonical[limit:limit + SCOPE_ANCHOR_CHARS].split())
+        instructions += f'\n\nThe source content is long: use only the part before the passage starting "{anchor}".'
+    return RenderedPrompt(content_prefix(content), instructions)
@@ -0,0 +1,71 @@
+from google.genai import types
+
+# JSON schemas for the structured artifacts, passed to the model as
+# response_json_schema so it emits the exact shape instead of "strictly JSON"
+# prose. Parsing still goes through json_stream.repair_json as a safety net.
+
+def _list_of(properties: dict, required: list) -> dict:
+    return {
+        "type": "array",
+        "items": {"type": "object", "properties": properties, "required": required},
+    }
+
+SLIDES = _list_of(
+    {
+        "title": {"type": "string"},
+        "points": {"type": "array", "items": {"type": "string"}},
+        "notes": {"type": "string"},
+        "image_url": {"type": "string"},
+    },
+    ["title", "points"],
+)
+
+QUIZ = _list_of(
+    {
+        "question": {"type": "string"},
+        "options": {"type": "array", "items": {"type": "string"}},
+        "answer": {"type": "string"},
+    },
+    ["question", "options", "answer"],
+)
+
+FLASHCARDS = _list_of(
+    {"front": {"type": "string"}, "back": {"type": "string"}},
+    ["front", "back"],
+)
+
+CLIPS = _list_of(
+    {
+        "start": {"type": "string"},
+        "end": {"type": "string"},
+        "viral_score": {"type": "integer"},
+        "reason": {"type": "string"},
+        "suggested_caption": {"type": "string"},
+    },
+    ["start", "end", "viral_score"],
+)
+
+AUDIO_SCRIPT = _list_of(
+    {"speaker": {"type": "string"}, "text": {"type": "string"}},
+    ["speaker", "text"],
+)
+
+SCHEMAS = {
+    "slides": SLIDES,
+    "quiz": QUIZ,
+    "flashcards": FLASHCARDS,
+    "clips": CLIPS,
+    "audio_script": AUDIO_SCRIPT,
+}
+
+# Experimental thinking models reject JSON mode; they rely on the repairing parser alone
+NO_JSON_MODE_MARKERS = ("thinking-exp",)
+
+def json_config(artifact_type: str, model: str) -> types.GenerateContentConfig | None:
+    """Generation config constraining the response to the artifact's schema, if the model supports it."""
+    if any(marker in model for marker in NO_JSON_MODE_MARKERS):
+        return None
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_json_schema=SCHEMAS[artifact_type],
+    )
@@ -0,0 +1,107 @@
+import html
+import re
+from sqlalchemy import select, text
+from app.models import SearchDocument
+from app.services.deck_service import strip_html, DEFAULT_DECK_TITLE
+
+# Highlight sentinels: the snippet is HTML-escaped first, then these become <mark> tags
+_MARK_START = "⦃"
+_MARK_END = "⦄"
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+SQLITE_SEARCH_SQL = text(f"""
+    SELECT d.deck_id, d.kind, d.title,
+           snippet(search_documents_fts, 1, '{_MARK_START}', '{_MARK_END}', '...', 24) AS snippet,
+           bm25(search_documents_fts, 5.0, 1.0) AS score
+    FROM search_documents_fts
+    JOIN search_documents d ON d.id = search_documents_fts.rowid
+    WHERE search_documents_fts MATCH :query AND d.user_id = :user_id
+    ORDER BY score
+    LIMIT :limit OFFSET :offset
+""")
+
+POSTGRES_SEARCH_SQL = text(f"""
+    SELECT hits.deck_id, hits.kind, hits.title,
+           ts_headline('english', d.body, websearch_to_tsquery('english', :query),
+                       'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=24, MinWords=8, MaxFragments=2') AS snippet,
+           hits.score
+    FROM (
+        SELECT id, deck_id, kind, title, ts_rank_cd(search_vector, websearch_to_tsquery('english', :query)) AS score
+        FROM search_documents
+        WHERE user_id = :user_id AND search_vector @@ websearch_to_tsquery('english', :query)
+        ORDER BY score DESC
+        LIMIT :limit OFFSET :offset
+    ) hits
+    JOIN search_documents d ON d.id = hits.id
+    ORDER BY hits.score DESC
+""")
+
+def _fts5_query(query: str) -> str:
+    """Quotes every token so user input can't inject FTS5 syntax; the last one is a prefix match."""
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return ""
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def _highlight(snippet: str) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+async def index_document(db, user_id: int, deck_id: int, kind: str, title: str, body: str):
+    """Inserts or refreshes the searchable text for one deck artifact. Caller commits."""
+    result = await db.execute(
+        select(SearchDocument).where(SearchDocument.deck_id == deck_id, SearchDocument.kind == kind)
+    )
+    document = result.scalars().first()
+    if document is None:
+        document = SearchDocument(user_id=user_id, deck_id=deck_id, kind=kind)
+    document.title = title
+    document.body = body
+    db.add(document)
+
+async def index_deck(db, deck):
+    await index_document(db, deck.user_id, deck.id, "deck", deck.title or DEFAULT_DECK_TITLE, strip_html(deck.summary_content or ""))
+
+def artifact_to_text(kind: str, data) -> str:
+    """Flattens generated quizzes / flashcards (parsed JSON) into searchable text."""
+    if isinstance(data, str):
+        return strip_html(data)
+    lines = []
+    for item in data or []:
+        if not isinstance(item, dict):
+            lines.append(str(item))
+        elif kind == "quiz":
+            lines.append(" ".join([str(item.get("question", ""))] + [str(o) for o in item.get("options", [])]))
+        elif kind == "flashcards":
+            lines.append(f"{item.get('front', '')}: {item.get('back', '')}")
+        else:
+            lines.append(" ".join(str(v) for v in item.values()))
+    return "\n".join(lines)
+
+async def search_documents(db, user_id: int, query: str, limit: int = 20, offset: int = 0) -> list:
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return []
+        result = await db.execute(SQLITE_SEARCH_SQL, {"query": match, "user_id": user_id, "limit": limit, "offset": offset})
+        # bm25() is lower-is-better; flip it so every backend returns higher-is-better
+        rows = [(r.deck_id, r.kind, r.title, r.snippet, -r.score) for r in result.all()]
+    else:
+        if not query.strip():
+            return []
+        result = await db.execute(POSTGRES_SEARCH_SQL, {"query": query, "user_id": user_id, "limit": limit, "offset": offset})
+        rows = [(r.deck_id, r.kind, r.title, r.snippet, r.score) for r in result.all()]
+
+    return [
+        {
+            "deck_id": deck_id,
+            "kind": kind,
+            "title": title,
+            "snippet": _highlight(snippet),
+            "score": round(float(score or 0), 4)
+        }
+        for deck_id, kind, title, snippet, score in rows
+    ]
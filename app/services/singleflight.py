@@ -0,0 +1,171 @@
+import asyncio
+import copy
+import hashlib
+import json
+import time
+import uuid
+from app.config import settings
+
+# Request coalescing. While a computation for a key is in flight, identical
+# requests await the same result instead of starting their own, and the result
+# is kept for a short TTL afterwards. With REDIS_URL set, the leader election
+# and the hand-off of results also work across worker processes.
+
+RESULT_TTL_SECONDS = 60
+LOCK_TTL_SECONDS = 300 # Upper bound on how long a leader may hold a key
+POLL_INTERVAL = 0.25
+MAX_CACHED_RESULTS = 1024
+
+def make_key(*parts) -> str:
+    """Stable hash of normalized inputs: strings are trimmed, case is kept."""
+    normalized = [p.strip() if isinstance(p, str) else p for p in parts]
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class RedisLockStore:
+    """Shared lock and result slots so only one worker runs a given key."""
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url)
+
+    async def acquire(self, key: str, token: str, ttl: int) -> bool:
+        return bool(await self.redis.set(f"sf:lock:{key}", token, nx=True, ex=ttl))
+
+    async def release(self, key: str, token: str):
+        # Only the holder may release; a lock that expired may belong to someone else now
+        if (await self.redis.get(f"sf:lock:{key}")) == token.encode():
+            await self.redis.delete(f"sf:lock:{key}")
+
+    async def holder(self, key: str) -> str | None:
+        """Token of the worker currently leading key, if any."""
+        value = await self.redis.get(f"sf:lock:{key}")
+        return value.decode() if value is not None else None
+
+    async def publish(self, key: str, payload: str, ttl: int):
+        await self.redis.set(f"sf:result:{key}", payload, ex=ttl)
+
+    async def fetch(self, key: str) -> str | None:
+        value = await self.redis.get(f"sf:result:{key}")
+        return value.decode() if value is not None else None
+
+class _StoreError(Exception):
+    """The shared store failed while we were waiting on it; the caller runs the work locally."""
+
+class SingleFlight:
+    def __init__(self, name: str, ttl: float = RESULT_TTL_SECONDS, store=None):
+        self.name = name
+        self.ttl = ttl
+        self.store = store
+        self._inflight = {}
+        self._results = {}
+
+    async def do(self, key: str, fn, *args, **kwargs):
+        """
+        Returns fn(*args, **kwargs), sharing one execution between all callers
+        with the same key. Errors are raised to every waiting caller and are
+        not cached. Each caller gets its own copy of the result.
+        """
+        key = f"{self.name}:{key}"
+        cached = self._results.get(key)
+        if cached and cached[0] > time.monotonic():
+            return copy.deepcopy(cached[1])
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, fn, args, kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None) if self._inflight.get(key) is t else None)
+        # shield: a caller disconnecting must not cancel the shared work
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _run(self, key: str, fn, args, kwargs):
+        result = await self._lead(key, fn, args, kwargs)
+        now = time.monotonic()
+        if len(self._results) >= MAX_CACHED_RESULTS:
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+        self._results[key] = (now + self.ttl, result)
+        return result
+
+    async def _lead(self, key: str, fn, args, kwargs):
+        if self.store is None:
+            return await fn(*args, **kwargs)
+
+        token = uuid.uuid4().hex
+        try:
+            payload = await self._wait_for_lock(key, token)
+        except _StoreError as e:
+            print(f"Single-flight lock store error: {e.__cause__}; running locally")
+            return await fn(*args, **kwargs)
+        if payload is not None:
+            return self._unpack(payload)
+
+        # We lead. From here store errors only cost coalescing, never the result
+        try:
+            payload = await self._quietly(self.store.fetch, key)
+            if payload is not None and "result" in json.loads(payload):
+                return self._unpack(payload) # Finished elsewhere just before we got the lock
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                # Followers of this leader fail fast with the same message
+                await self._quietly(self.store.publish, key, json.dumps({"error": str(e), "leader": token}), 5)
+                raise
+            await self._quietly(self.store.publish, key, json.dumps({"result": result}), int(self.ttl))
+            return result
+        finally:
+            await self._quietly(self.store.release, key, token)
+
+    async def _wait_for_lock(self, key: str, token: str) -> str | None:
+        """None once we hold the lock, else the payload published by the leader we waited on."""
+        leader = None
+        while True:
+            if await self._store_call(self.store.acquire, key, token, LOCK_TTL_SECONDS):
+                return None
+            # Another worker is leading: wait for its published result
+            leader = await self._store_call(self.store.holder, key) or leader
+            payload = await self._store_call(self.store.fetch, key)
+            if payload is not None:
+                data = json.loads(payload)
+                # An error is only ours if the leader we waited on produced it
+                if "result" in data or (leader is not None and data.get("leader") == leader):
+                    return payload
+            if await self._store_call(self.store.holder, key) is None:
+                continue # Leader finished without publishing; try to take over
+            await asyncio.sleep(POLL_INTERVAL)
+
+    @staticmethod
+    async def _store_call(method, *args):
+        try:
+            return await method(*args)
+        except Exception as e:
+            raise _StoreError() from e
+
+    @staticmethod
+    async def _quietly(method, *args):
+        try:
+            return await method(*args)
+        except Exception as e:
+            print(f"Single-flight lock store error: {e}")
+            return None
+
+    @staticmethod
+    def _unpack(payload: str):
+        data = json.loads(payload)
+        if "error" in data:
+            raise ValueError(data["error"])
+        return data["result"]
+
+    def clear(self):
+        self._results.clear()
+
+def _default_store():
+    if not settings.REDIS_URL:
+        return None
+    try:
+        return RedisLockStore(settings.REDIS_URL)
+    except Exception as e:
+        print(f"Single-flight: shared lock store unavailable ({e}); coalescing per worker only")
+        return None
+
+_store = _default_store()
+video_flight = SingleFlight("video", store=_store)
+generation_flight = SingleFlight("generate", store=_store)
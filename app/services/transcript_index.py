@@ -0,0 +1,132 @@
+from collections import OrderedDict
+import bisect
+import hashlib
+import math
+import re
+import threading
+import numpy as np
+
+# Per-video BM25 index over overlapping transcript chunks, so a chat turn only
+# has to send the passages relevant to the question instead of the whole video.
+
+CHUNK_WORDS = 120
+OVERLAP_WORDS = 40
+TOP_K = 4
+BM25_K1 = 1.5
+BM25_B = 0.75
+INDEX_CACHE_SIZE = 32
+
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "the a an and or but of to in on at for with is are was were be been it this that "
+    "i you he she we they my your our so just like um uh what did does do about said say".split()
+)
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+def text_to_spans(text: str) -> list:
+    """Sentence spans without timestamps, for transcripts we only have as plain text."""
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return [{"text": s, "start": None, "end": None} for s in sentences if s]
+
+class TranscriptIndex:
+    """
+    Chunks are runs of consecutive spans of ~CHUNK_WORDS words that overlap
+    by ~OVERLAP_WORDS, so an answer that straddles a boundary is still found.
+    """
+    def __init__(self, spans: list, chunk_words: int = CHUNK_WORDS, overlap_words: int = OVERLAP_WORDS):
+        self.spans = spans
+        self.chunks = self._chunk(chunk_words, overlap_words)
+        # Identifies this exact transcript, so caches built on it notice edits
+        self.fingerprint = hashlib.sha256(
+            "\n".join(f"{s['start']}|{s['text']}" for s in spans).encode("utf-8")
+        ).hexdigest()
+
+        docs = [tokenize(" ".join(s["text"] for s in spans[a:b + 1])) for a, b in self.chunks]
+        self.doc_len = np.array([len(d) for d in docs], dtype=float)
+        self.avgdl = self.doc_len.mean() if len(docs) else 0.0
+        postings = {}
+        for doc_id, doc in enumerate(docs):
+            counts = {}
+            for t in doc:
+                counts[t] = counts.get(t, 0) + 1
+            for t, tf in counts.items():
+                postings.setdefault(t, []).append((doc_id, tf))
+        n = len(docs)
+        self.postings = {
+            t: (np.array([d for d, _ in p]), np.array([tf for _, tf in p], dtype=float),
+                math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)))
+            for t, p in postings.items()
+        }
+
+    def _chunk(self, chunk_words: int, overlap_words: int) -> list:
+        counts = [len(s["text"].split()) for s in self.spans]
+        cumulative = np.concatenate(([0], np.cumsum(counts))) if counts else np.array([0])
+        chunks = []
+        first = 0
+        while first < len(self.spans):
+            last = bisect.bisect_left(cumulative, cumulative[first] + chunk_words) - 1
+            last = min(max(last, first), len(self.spans) - 1)
+            chunks.append((first, last))
+            if last == len(self.spans) - 1:
+                break
+            # Step forward so consecutive chunks share ~overlap_words words
+            next_first = bisect.bisect_left(cumulative, cumulative[last + 1] - overlap_words)
+            first = max(next_first, first + 1)
+        return chunks
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.chunks))
+        if not self.chunks:
+            return scores
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / max(self.avgdl, 1e-9))
+        for t in set(tokenize(query)):
+            if t not in self.postings:
+                continue
+            docs, tf, idf = self.postings[t]
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+        return scores
+
+    def passages(self, query: str, k: int = TOP_K) -> list:
+        """
+        Spans of the top-k chunks, with overlapping chunks merged, in transcript
+        order. Returns a list of passages, each a list of spans.
+        """
+        scores = self.scores(query)
+        ranked = [i for i in np.argsort(-scores, kind="stable")[:k] if scores[i] > 0]
+        ranges = sorted(self.chunks[i] for i in ranked)
+        merged = []
+        for a, b in ranges:
+            if merged and a <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        return [self.spans[a:b + 1] for a, b in merged]
+
+class IndexCache:
+    """Small thread-safe LRU of built indexes keyed by video id or transcript hash."""
+    def __init__(self, max_entries: int = INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+index_cache = IndexCache()
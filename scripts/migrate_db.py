@@ -65,6 +65,102 @@ async def run_migration():
             else:
                 print(f"⚠️ Error adding 'joined_class_code': {e}")
 
+    async with engine.begin() as conn:
+        print("Checking for missing columns in 'slide_decks' table...")
+
+        # 3. Add title / preview listing columns
+        for column in ("title", "preview"):
+            try:
+                await conn.execute(text(f"ALTER TABLE slide_decks ADD COLUMN {column} VARCHAR"))
+                print(f"✅ Added '{column}' column.")
+            except Exception as e:
+                if "duplicate column" in str(e) or "already exists" in str(e) or "no such table" in str(e):
+                    print(f"ℹ️  Result for '{column}': {e}")
+                else:
+                    print(f"⚠️ Error adding '{column}': {e}")
+
+    async with engine.begin() as conn:
+        # 3b. Content version counter used by deck history
+        try:
+            await conn.execute(text("ALTER TABLE slide_decks ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+            print("✅ Added 'version' column.")
+        except Exception as e:
+            if "duplicate column" in str(e) or "already exists" in str(e) or "no such table" in str(e):
+                print(f"ℹ️  Result for 'version': {e}")
+            else:
+                print(f"⚠️ Error adding 'version': {e}")
+
+    async with engine.begin() as conn:
+        # 4. Composite index for newest-first library listings
+        try:
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_slide_decks_user_id_created_at ON slide_decks (user_id, created_at DESC)"
+            ))
+            print("✅ Ensured 'ix_slide_decks_user_id_created_at' index.")
+        except Exception as e:
+            print(f"⚠️ Error creating deck listing index: {e}")
+
+    # 5. Backfill title / preview for existing decks, in small batches
+    from app.services.deck_service import derive_title, derive_preview
+    backfilled = 0
+    while True:
+        async with engine.begin() as conn:
+            try:
+                rows = (await conn.execute(text(
+                    "SELECT id, summary_content FROM slide_decks WHERE title IS NULL LIMIT 200"
+                ))).all()
+            except Exception as e:
+                print(f"⚠️ Error reading decks for backfill: {e}")
+                break
+            for deck_id, content in rows:
+                await conn.execute(
+                    text("UPDATE slide_decks SET title = :title, preview = :preview WHERE id = :id"),
+                    {"title": derive_title(content or ""), "preview": derive_preview(content or ""), "id": deck_id}
+                )
+            backfilled += len(rows)
+        if len(rows) < 200:
+            break
+    print(f"✅ Backfilled title/preview for {backfilled} decks.")
+
+    # 6. Full-text search documents for decks created before search existed
+    from app.database import Base
+    from app.models import SearchDocument
+    from app.services.deck_service import strip_html
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[SearchDocument.__table__])
+
+    indexed = 0
+    while True:
+        async with engine.begin() as conn:
+            rows = (await conn.execute(text(
+                "SELECT d.id, d.user_id, d.title, d.summary_content FROM slide_decks d "
+                "WHERE d.user_id IS NOT NULL AND NOT EXISTS ("
+                "SELECT 1 FROM search_documents s WHERE s.deck_id = d.id AND s.kind = 'deck') LIMIT 200"
+            ))).all()
+            for deck_id, user_id, title, content in rows:
+                await conn.execute(
+                    text("INSERT INTO search_documents (user_id, deck_id, kind, title, body) VALUES (:user_id, :deck_id, 'deck', :title, :body)"),
+                    {"user_id": user_id, "deck_id": deck_id, "title": title, "body": strip_html(content or "")}
+                )
+            indexed += len(rows)
+        if len(rows) < 200:
+            break
+    print(f"✅ Indexed {indexed} decks for search.")
+
+    # 7. Deck artifacts moved to versioned, compressed payloads. They are
+    # regenerable, so an old-layout table is simply rebuilt.
+    from app.models import DeckArtifact
+    async with engine.begin() as conn:
+        try:
+            await conn.execute(text("SELECT data FROM deck_artifacts LIMIT 1"))
+            await conn.execute(text("DROP TABLE deck_artifacts"))
+            print("✅ Dropped old-layout deck_artifacts.")
+        except Exception:
+            pass
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[DeckArtifact.__table__])
+    print("✅ deck_artifacts is ready.")
+
     await engine.dispose()
     print("Migration Check Complete.")
 
@@ -16,3 +16,19 @@ async def init_db():
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+
+@pytest.fixture(autouse=True)
+def isolate_caches(tmp_path, monkeypatch):
+    """Point on-disk caches at a per-test directory and reset in-process counters."""
+    from app.services import audio_engine, metrics, transcript_index, answer_cache, singleflight, llm_cache, context_cache, model_guard, hedging
+    monkeypatch.setattr(audio_engine, "clip_cache", audio_engine.ClipCache(tmp_path / "tts_cache", audio_engine.clip_cache.max_bytes))
+    monkeypatch.setattr(llm_cache, "response_cache", llm_cache.ResponseCache(tmp_path / "llm_cache", llm_cache.response_cache.max_bytes, llm_cache.response_cache.ttl))
+    transcript_index.index_cache.clear()
+    context_cache.context_cache.clear()
+    model_guard.reset()
+    hedging.reset()
+    answer_cache.answer_cache.clear()
+    singleflight.video_flight.clear()
+    singleflight.generation_flight.clear()
+    metrics.reset()
+    yield
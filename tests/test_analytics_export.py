@@ -0,0 +1,62 @@
+import pytest
+import csv
+import gzip
+import io
+import json
+from app.main import app
+from httpx import AsyncClient, ASGITransport
+from app.database import AsyncSessionLocal
+from app.models import User, AnalyticsEvent
+
+PROFESSOR_HEADERS = {"X-Replit-User-Id": "prof-1", "X-Replit-User-Name": "prof"}
+
+async def seed_class():
+    async with AsyncSessionLocal() as db:
+        professor = User(email="prof@replit.user", replit_id="prof-1", username="prof", tier="professor", my_class_code="CLASS-ABC123")
+        student = User(email="student@example.com", tier="student", joined_class_code="CLASS-ABC123")
+        outsider = User(email="outsider@example.com", tier="student")
+        db.add_all([professor, student, outsider])
+        await db.commit()
+        for i in range(7):
+            db.add(AnalyticsEvent(user_id=student.id, event_type="VIEW_VIDEO", resource_id=f"video-{i}"))
+        db.add(AnalyticsEvent(user_id=outsider.id, event_type="VIEW_VIDEO", resource_id="private"))
+        await db.commit()
+
+@pytest.mark.asyncio
+async def test_export_csv_streams_only_class_events(monkeypatch):
+    await seed_class()
+    # Force several keyset batches
+    monkeypatch.setattr("app.routers.analytics.EXPORT_BATCH_SIZE", 3)
+    monkeypatch.setattr("app.routers.analytics.EXPORT_PARTITION_SIZE", 2)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        res = await ac.get("/api/analytics/export", headers=PROFESSOR_HEADERS)
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(res.text)))
+    assert rows[0] == ["id", "timestamp", "user_id", "user_email", "event_type", "resource_id", "metadata"]
+    assert len(rows) == 8
+    assert {r[5] for r in rows[1:]} == {f"video-{i}" for i in range(7)}
+    assert all(r[3] == "student@example.com" for r in rows[1:])
+
+@pytest.mark.asyncio
+async def test_export_ndjson_gzip():
+    await seed_class()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        res = await ac.get("/api/analytics/export", params={"format": "ndjson", "gzip": "true"}, headers=PROFESSOR_HEADERS)
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/gzip"
+    lines = gzip.decompress(res.content).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 7
+    assert records[0]["event_type"] == "VIEW_VIDEO"
+
+@pytest.mark.asyncio
+async def test_export_requires_professor():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        anon = await ac.get("/api/analytics/export")
+        student = await ac.get("/api/analytics/export", headers={"X-Replit-User-Id": "stu-9", "X-Replit-User-Name": "stu"})
+    assert anon.status_code == 401
+    assert student.status_code == 403
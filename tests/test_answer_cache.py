@@ -0,0 +1,98 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import User
+from app.services import metrics
+from app.services.answer_cache import AnswerCache
+from app.services.transcript_index import index_cache
+
+VIDEO = "https://youtube.com/watch?v=dQw4w9WgXcQ"
+TRANSCRIPT = [{"text": "The main theorem says every bounded sequence has a convergent subsequence.", "start": 5.0, "duration": 4.0}]
+
+def test_near_duplicate_questions_match():
+    cache = AnswerCache()
+    cache.put("BIO101", "vid", "fp1", "What is the main theorem?", "Bolzano-Weierstrass.")
+    assert cache.get("BIO101", "vid", "fp1", "what's the main theorem") == "Bolzano-Weierstrass."
+    assert cache.get("BIO101", "vid", "fp1", "Can you please explain what the main theorem is?") == "Bolzano-Weierstrass."
+    assert cache.get("BIO101", "vid", "fp1", "What is the proof of lemma 2?") is None
+    # Other classes and other transcript versions never see the answer
+    assert cache.get("CHEM200", "vid", "fp1", "What is the main theorem?") is None
+    assert cache.get("BIO101", "vid", "fp2", "What is the main theorem?") is None
+    assert cache.get("BIO101", "vid", "fp1", "What is the main theorem?") is None
+
+def test_near_misses_about_something_else_do_not_match():
+    cache = AnswerCache()
+    cache.put("BIO101", "vid", "fp1", "Mitosis vs meiosis in plants?", "In plants...")
+    assert cache.get("BIO101", "vid", "fp1", "mitosis vs meiosis in plants") == "In plants..."
+    assert cache.get("BIO101", "vid", "fp1", "Mitosis vs meiosis in animals?") is None
+    assert cache.get("BIO101", "vid", "fp1", "Mitosis vs meiosis?") is None
+    cache.put("BIO101", "vid", "fp1", "Does light increase photosynthesis?", "Yes.")
+    assert cache.get("BIO101", "vid", "fp1", "Does light not increase photosynthesis?") is None
+    assert cache.get("BIO101", "vid", "fp1", "Does heat increase photosynthesis?") is None
+    cache.put("BIO101", "vid", "fp1", "What is the first law?", "Energy is conserved.")
+    assert cache.get("BIO101", "vid", "fp1", "What is the second law?") is None
+
+def test_non_latin_questions_only_match_their_own_wording():
+    cache = AnswerCache()
+    cache.put("PHY101", "vid", "fp1", "Что такое энтропия?", "Мера беспорядка.")
+    assert cache.get("PHY101", "vid", "fp1", "что такое энтропия") == "Мера беспорядка."
+    assert cache.get("PHY101", "vid", "fp1", "Кто доказал главную теорему?") is None
+    assert cache.get("PHY101", "vid", "fp1", "量子力学是什么？") is None
+    # Accented words stay whole
+    cache.put("PHY101", "vid", "fp1", "¿Qué es la entropía?", "Desorden.")
+    assert cache.get("PHY101", "vid", "fp1", "Qué es la entropía") == "Desorden."
+    assert cache.get("PHY101", "vid", "fp1", "¿Qué es la entrop a?") is None
+
+def test_questions_empty_after_normalization_are_never_cached():
+    cache = AnswerCache()
+    cache.put("BIO101", "vid", "fp1", "Can you please explain?", "Sure.")
+    cache.put("BIO101", "vid", "fp1", "???", "Huh.")
+    cache.put("BIO101", "vid", "fp1", "What is it?", "Depends on what came before.")
+    assert cache.get("BIO101", "vid", "fp1", "What is it?") is None
+    assert cache.get("BIO101", "vid", "fp1", "Please explain again?") is None
+    assert cache.get("BIO101", "vid", "fp1", "!!") is None
+
+async def seed_students():
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            User(email="s1@replit.user", replit_id="s1", username="s1", joined_class_code="BIO101"),
+            User(email="s2@replit.user", replit_id="s2", username="s2", joined_class_code="BIO101"),
+            User(email="s3@replit.user", replit_id="s3", username="s3", joined_class_code="CHEM200"),
+        ])
+        await db.commit()
+
+@pytest.mark.asyncio
+async def test_class_mates_share_answers_until_transcript_changes():
+    await seed_students()
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text="Every bounded sequence converges along a subsequence.")
+
+    async def ask(ac, student, question, history=None):
+        res = await ac.post("/editor/chat-video", json={"video_url": VIDEO, "question": question, "history": history or []},
+                            headers={"X-Replit-User-Id": student, "X-Replit-User-Name": student})
+        return res.json()["answer"]
+
+    with patch("app.services.gemini_engine.get_transcript", return_value=TRANSCRIPT) as mock_transcript, \
+         patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            await ask(ac, "s1", "What is the main theorem?")
+            assert await ask(ac, "s2", "what's the main theorem??") == "Every bounded sequence converges along a subsequence."
+            assert mock_client.models.generate_content.call_count == 1
+
+            # Different class; worded differently so the exact-prompt response cache can't answer it
+            await ask(ac, "s3", "What's the main theorem?")
+            await ask(ac, "s2", "What is the main theorem?", history=[{"role": "user", "text": "Hi"}]) # Has context
+            assert mock_client.models.generate_content.call_count == 3
+
+            # Transcript re-fetched with new content: old answers no longer apply
+            mock_transcript.return_value = [{"text": "Revised: the main theorem is about compactness.", "start": 5.0, "duration": 4.0}]
+            index_cache.clear()
+            await ask(ac, "s1", "What is the main theorem?")
+            assert mock_client.models.generate_content.call_count == 4
+
+            res = await ac.get("/metrics", headers={"x-n8n-auth": settings.AUTH_SECRET_TOKEN})
+    assert metrics.get("answer_cache_hits") == 1
+    assert res.json()["answer_cache_hit_ratio"] == round(1 / 4, 4)
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from unittest.mock import patch
+from app.services import audio_engine
+
+class FakeTTS:
+    """Stands in for gTTS: writes the text as bytes after a short delay."""
+    calls = 0
+    failures = {}
+    lock = threading.Lock()
+
+    def __init__(self, text, lang="en", tld="com"):
+        self.text = text
+        self.tld = tld
+
+    def write_to_fp(self, fp):
+        with FakeTTS.lock:
+            FakeTTS.calls += 1
+            remaining = FakeTTS.failures.get(self.text, 0)
+            if remaining:
+                FakeTTS.failures[self.text] = remaining - 1
+        if remaining:
+            raise ConnectionError("flaky TTS")
+        time.sleep(0.2)
+        fp.write(f"[{self.tld}:{self.text}]".encode())
+
+def test_synthesis_is_parallel_ordered_and_in_memory(tmp_path, monkeypatch):
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    FakeTTS.calls, FakeTTS.failures = 0, {}
+    script = [{"speaker": "Alex" if i % 2 == 0 else "Sam", "text": f"line {i}"} for i in range(8)]
+    script.append({"speaker": "Alex", "text": ""})
+
+    out = workdir / "podcast.mp3"
+    with patch("app.services.audio_engine.gTTS", FakeTTS):
+        started = time.monotonic()
+        audio_engine.synthesize_podcast_audio(script, output_filename=str(out))
+        elapsed = time.monotonic() - started
+
+    expected = b"".join(f"[{'com' if i % 2 == 0 else 'co.uk'}:line {i}]".encode() for i in range(8))
+    assert out.read_bytes() == expected
+    # 8 lines x 0.2s would take 1.6s serially
+    assert elapsed < 1.0
+    # No temp clips left behind in the working directory
+    assert sorted(os.listdir(workdir)) == ["podcast.index.json", "podcast.mp3"]
+
+def test_failed_lines_are_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.audio_engine.TTS_RETRY_DELAY", 0)
+    FakeTTS.calls, FakeTTS.failures = 0, {"flaky": 2}
+    with patch("app.services.audio_engine.gTTS", FakeTTS):
+        clips = audio_engine.render_dialogue_clips([{"speaker": "Alex", "text": "flaky"}])
+    assert clips == [b"[com:flaky]"]
+    assert FakeTTS.calls == 3
+
+def test_clip_cache_skips_known_lines(tmp_path):
+    from app.services import metrics
+    FakeTTS.calls, FakeTTS.failures = 0, {}
+    script = [
+        {"speaker": "Alex", "text": "Welcome back!"},
+        {"speaker": "Sam", "text": "Exactly!"},
+        {"speaker": "Alex", "text": "Exactly!"},
+        {"speaker": "Sam", "text": "Exactly!"},
+    ]
+    with patch("app.services.audio_engine.gTTS", FakeTTS):
+        first = audio_engine.render_dialogue_clips(script)
+        # Sam's repeated line is only synthesized once
+        assert FakeTTS.calls == 3
+        edited = script + [{"speaker": "Alex", "text": "A new line"}]
+        second = audio_engine.render_dialogue_clips(edited)
+
+    assert second[:4] == first
+    assert FakeTTS.calls == 4
+    assert metrics.get("tts_cache_hits") == 3
+    assert metrics.get("tts_cache_misses") == 4
+
+def test_clip_cache_evicts_least_recently_used(tmp_path):
+    cache = audio_engine.ClipCache(tmp_path / "lru", max_bytes=350)
+    for i, name in enumerate(["a", "b", "c"]):
+        cache.put(name * 64, bytes(100))
+        path = cache._path(name * 64)
+        os.utime(path, (1000 + i, 1000 + i))
+    # "a" is the oldest but gets touched by a hit, so "b" goes first
+    assert cache.get("a" * 64) is not None
+    cache.put("d" * 64, bytes(100))
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None
+    assert cache.get("d" * 64) is not None
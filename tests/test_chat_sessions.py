@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.database import AsyncSessionLocal
+from app.models import User, SlideDeck
+from app.services.deck_service import write_deck_content
+from app.services import chat_sessions
+
+HEADERS = {"X-Replit-User-Id": "chat-1", "X-Replit-User-Name": "learner"}
+
+async def seed_deck(video_url: str) -> int:
+    async with AsyncSessionLocal() as db:
+        user = User(email="learner@replit.user", replit_id="chat-1", username="learner")
+        db.add(user)
+        await db.commit()
+        deck = SlideDeck(user_id=user.id, video_url=video_url)
+        db.add(deck)
+        await db.flush()
+        await write_deck_content(db, deck, "", "<h1>Osmosis</h1><p>Water moves across a semipermeable membrane.</p>")
+        await db.commit()
+        return deck.id
+
+def fake_generate(model, contents):
+    if "running summary" in contents:
+        return MagicMock(text="Student asked several questions about osmosis.")
+    return MagicMock(text="Answer " + "x" * 1000)
+
+@pytest.mark.asyncio
+async def test_session_resolves_deck_text_and_compacts_history():
+    deck_id = await seed_deck("uploaded-file.pdf")
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = fake_generate
+    with patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            session_id = (await ac.post("/editor/chat-sessions", json={"deck_id": deck_id}, headers=HEADERS)).json()["session_id"]
+            for i in range(6):
+                res = await ac.post(f"/editor/chat-sessions/{session_id}/messages", json={"question": f"Question {i} about membranes?"}, headers=HEADERS)
+                assert res.status_code == 200
+            state = (await ac.get(f"/editor/chat-sessions/{session_id}", headers=HEADERS)).json()
+            stranger = await ac.get(f"/editor/chat-sessions/{session_id}", headers={"X-Replit-User-Id": "chat-2", "X-Replit-User-Name": "other"})
+
+    assert state["turn_count"] == 12
+    assert len(state["history"]) <= chat_sessions.CHAT_KEEP_TURNS + 2
+    assert state["history"][-2] == {"role": "user", "text": "Question 5 about membranes?"}
+    assert state["summary"] == "Student asked several questions about osmosis."
+    assert stranger.status_code == 404
+
+    # Transcript came from the deck, and the summary replaced the older turns
+    prompt = mock_client.models.generate_content.call_args.kwargs["contents"]
+    assert "semipermeable membrane" in prompt
+    assert "Earlier in this conversation: Student asked several questions" in prompt
+    assert "Question 0 about" not in prompt
+
+@pytest.mark.asyncio
+async def test_session_for_video_deck_uses_transcript_index():
+    deck_id = await seed_deck("https://youtube.com/watch?v=dQw4w9WgXcQ")
+    transcript = [{"text": "Osmosis needs a concentration gradient.", "start": 12.0, "duration": 3.0}]
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text="A gradient.")
+    with patch("app.services.gemini_engine.get_transcript", return_value=transcript), \
+         patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            session_id = (await ac.post("/editor/chat-sessions", json={"deck_id": deck_id}, headers=HEADERS)).json()["session_id"]
+            res = await ac.post(f"/editor/chat-sessions/{session_id}/messages", json={"question": "What does osmosis need?"}, headers=HEADERS)
+    assert res.json() == {"answer": "A gradient."}
+    prompt = mock_client.models.generate_content.call_args.kwargs["contents"]
+    assert "[00:12] Osmosis needs a concentration gradient." in prompt
+
+@pytest.mark.asyncio
+async def test_session_requires_deck_or_video():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        res = await ac.post("/editor/chat-sessions", json={})
+    assert res.status_code == 400
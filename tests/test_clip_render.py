@@ -0,0 +1,139 @@
+import pytest
+import os
+import subprocess
+import uuid
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import MagicMock, patch
+from app.main import app
+from app.services.clip_renderer import _ffmpeg_exe, probe_keyframes, plan_cut
+
+def make_source_video(path: str):
+    # 12s test pattern with a keyframe every 2s (GOP of 50 frames at 25 fps)
+    subprocess.run([
+        _ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", "testsrc=size=160x120:rate=25:duration=12",
+        "-f", "lavfi", "-i", "sine=frequency=440:duration=12",
+        "-c:v", "libx264", "-g", "50", "-keyint_min", "50", "-sc_threshold", "0",
+        "-c:a", "aac", "-shortest", path
+    ], check=True)
+
+def test_plan_cut_prefers_nearby_keyframes():
+    keyframes = [0.0, 2.0, 4.0]
+    assert plan_cut(keyframes, 2.3) == ("copy", 2.0)
+    assert plan_cut(keyframes, 3.0) == ("reencode", 3.0)
+
+@pytest.mark.asyncio
+async def test_generate_clips_renders_batch_from_upload():
+    user_dir = os.path.join("user_uploads", "1")
+    os.makedirs(user_dir, exist_ok=True)
+    name = f"source_{uuid.uuid4().hex}.mp4"
+    source = os.path.join(user_dir, name)
+    make_source_video(source)
+    assert probe_keyframes(source) == [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+
+    suggestions = '''[
+        {"start_time": 0.0, "end_time": 2.0},
+        {"start_time": 2.1, "end_time": 5.0},
+        {"start_time": 3.0, "end_time": 5.5},
+        {"start_time": 6.0, "end_time": 9.0},
+        {"start_time": 9.0, "end_time": 8.0}
+    ]'''
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text=suggestions)
+    outputs = []
+    try:
+        with patch("app.services.gemini_engine.get_transcript", return_value=[{"text": "hi", "start": 0.0, "duration": 12.0}]), \
+             patch("app.services.gemini_engine.client", mock_client), \
+             patch("app.routers.editor.remove_file_after_delay") as mock_sweeper:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+                res = await ac.post("/editor/generate-clips", json={
+                    "video_url": "https://youtube.com/watch?v=123",
+                    "render": True,
+                    "source_path": f"/uploads/1/{name}"
+                })
+        assert res.status_code == 200
+        clips = res.json()["clips"]
+        assert [c.get("render_mode") for c in clips] == ["copy", "copy", "reencode", "copy", None]
+        assert "render_error" in clips[4]
+        for clip in clips[:4]:
+            path = clip["clip_url"].replace("/uploads/", "user_uploads/")
+            outputs.append(path)
+            assert os.path.getsize(path) > 0
+        # Every rendered clip is scheduled for TTL cleanup
+        assert mock_sweeper.call_count == 4
+    finally:
+        os.remove(source)
+        for path in outputs:
+            os.remove(path)
+
+@pytest.mark.asyncio
+async def test_render_rejects_paths_outside_user_folder():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        res = await ac.post("/editor/generate-clips", json={
+            "video_url": "https://youtube.com/watch?v=123",
+            "render": True,
+            "source_path": "../../app/main.py"
+        })
+    assert res.status_code == 404
+
+@pytest.mark.asyncio
+async def test_unusable_clip_times_are_reported_per_clip():
+    user_dir = os.path.join("user_uploads", "1")
+    os.makedirs(user_dir, exist_ok=True)
+    name = f"source_{uuid.uuid4().hex}.mp4"
+    source = os.path.join(user_dir, name)
+    make_source_video(source)
+
+    # Labels that match no transcript line resolve to None
+    suggestions = '''[
+        {"start": "sometime", "end": "later"},
+        {"start_time": null, "end_time": 3.0},
+        {"start_time": "soon", "end_time": 3.0},
+        {"start_time": 0.0, "end_time": 2.0}
+    ]'''
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text=suggestions)
+    output = None
+    try:
+        with patch("app.services.gemini_engine.get_transcript", return_value=[{"text": "hi", "start": 0.0, "duration": 12.0}]), \
+             patch("app.services.gemini_engine.client", mock_client), \
+             patch("app.routers.editor.remove_file_after_delay"):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+                res = await ac.post("/editor/generate-clips", json={
+                    "video_url": "https://youtube.com/watch?v=unusable",
+                    "render": True,
+                    "source_path": f"/uploads/1/{name}"
+                })
+        assert res.status_code == 200
+        clips = res.json()["clips"]
+        assert [c.get("render_error") for c in clips[:3]] == ["Invalid time range"] * 3
+        assert clips[3]["render_mode"] == "copy"
+        output = clips[3]["clip_url"].replace("/uploads/", "user_uploads/")
+    finally:
+        os.remove(source)
+        if output:
+            os.remove(output)
+
+@pytest.mark.asyncio
+async def test_render_of_a_non_video_upload_is_a_client_error():
+    user_dir = os.path.join("user_uploads", "1")
+    os.makedirs(user_dir, exist_ok=True)
+    name = f"notes_{uuid.uuid4().hex}.mp4"
+    source = os.path.join(user_dir, name)
+    with open(source, "w") as f:
+        f.write("Not a video at all.")
+
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text='[{"start_time": 0.0, "end_time": 2.0}]')
+    try:
+        with patch("app.services.gemini_engine.get_transcript", return_value=[{"text": "hi", "start": 0.0, "duration": 12.0}]), \
+             patch("app.services.gemini_engine.client", mock_client):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+                res = await ac.post("/editor/generate-clips", json={
+                    "video_url": "https://youtube.com/watch?v=notes",
+                    "render": True,
+                    "source_path": f"/uploads/1/{name}"
+                })
+        assert res.status_code == 422
+    finally:
+        os.remove(source)
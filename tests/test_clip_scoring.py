@@ -0,0 +1,45 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.clip_scoring import score_windows, top_candidate_windows
+from app.services.gemini_engine import identify_viral_clips
+
+def long_transcript():
+    # 50 minutes of 2s segments; the only lively stretch is 45 minutes in
+    segments = []
+    for i in range(1500):
+        start = i * 2.0
+        if 1350 <= i < 1370:
+            text = "Nobody tells you this! The secret to compound interest is insane, right?"
+        else:
+            text = f"and then we move on to item number {i % 7} in the usual list of things"
+        segments.append({"text": text, "start": start, "duration": 2.0})
+    return segments
+
+def test_windows_cover_whole_video_and_stay_in_bounds():
+    windows = score_windows(long_transcript())
+    assert all(30.0 <= w["end"] - w["start"] <= 99.0 for w in windows)
+    assert max(w["end"] for w in windows) == 3000.0
+
+    top = top_candidate_windows(long_transcript(), k=5)
+    assert len(top) == 5
+    best = max(top, key=lambda w: w["score"])
+    assert best["start"] <= 2700.0 + 40 and best["end"] >= 2700.0
+    # Selected windows never overlap
+    for a, b in zip(top, top[1:]):
+        assert a["end"] <= b["start"]
+
+def test_short_video_falls_back_to_single_window():
+    top = top_candidate_windows([{"text": "Hi!", "start": 0.0, "duration": 3.0}, {"text": "Bye", "start": 3.0, "duration": 2.0}])
+    assert [(w["start"], w["end"], w["text"]) for w in top] == [(0.0, 5.0, "Hi! Bye")]
+
+@pytest.mark.asyncio
+async def test_prompt_only_contains_shortlisted_windows():
+    transcript = long_transcript()
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text="[]")
+    with patch("app.services.gemini_engine.get_transcript", return_value=transcript), \
+         patch("app.services.gemini_engine.client", mock_client):
+        await identify_viral_clips("https://youtube.com/watch?v=123")
+    prompt = mock_client.models.generate_content.call_args.kwargs["contents"]
+    assert "compound interest" in prompt
+    assert len(prompt) * 10 < len(str(transcript))
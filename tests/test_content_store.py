@@ -0,0 +1,70 @@
+import pytest
+import hashlib
+from unittest.mock import patch
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import select, func, update
+from app.main import app
+from app.database import AsyncSessionLocal
+from app.models import ContentBlob
+from app.services.content_store import load_content
+
+HEADERS = {"X-Replit-User-Id": "content-1", "X-Replit-User-Name": "writer"}
+TRANSCRIPT = "Photosynthesis converts light energy into chemical energy. " * 2000
+
+@pytest.mark.asyncio
+async def test_upload_once_and_reference_by_id():
+    with patch("app.routers.editor.generate_quiz_from_text") as mock_quiz, \
+         patch("app.routers.editor.generate_flashcards_from_text") as mock_cards:
+        mock_quiz.return_value = '[{"question": "Q?", "options": ["A"], "answer": "A"}]'
+        mock_cards.return_value = '[{"front": "F", "back": "B"}]'
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            first = (await ac.post("/editor/content", json={"text": TRANSCRIPT}, headers=HEADERS)).json()
+            again = (await ac.post("/editor/content", json={"text": TRANSCRIPT}, headers=HEADERS)).json()
+            content_id = first["content_id"]
+            assert content_id == hashlib.sha256(TRANSCRIPT.encode()).hexdigest() == again["content_id"]
+            assert (await ac.get(f"/editor/content/{content_id}")).json()["size"] == len(TRANSCRIPT)
+
+            quiz = await ac.post("/editor/generate-quiz", json={"content_id": content_id})
+            cards = await ac.post("/editor/generate-flashcards", json={"content_id": content_id, "language": "French"})
+
+    assert quiz.status_code == 200 and cards.status_code == 200
+    assert mock_quiz.call_args.args[0] == TRANSCRIPT
+    assert mock_cards.call_args.args[0] == TRANSCRIPT
+
+    # Deduplicated and compressed
+    async with AsyncSessionLocal() as db:
+        count = (await db.execute(select(func.count()).select_from(ContentBlob))).scalar()
+        stored = (await db.execute(select(func.length(ContentBlob.data)))).scalar()
+    assert count == 1
+    assert stored * 20 < len(TRANSCRIPT)
+
+@pytest.mark.asyncio
+async def test_unknown_or_expired_content_is_404():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        missing = await ac.post("/editor/generate-quiz", json={"content_id": "0" * 64})
+        content_id = (await ac.post("/editor/content", json={"text": "short note"}, headers=HEADERS)).json()["content_id"]
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(ContentBlob).values(expires_at=func.datetime("now", "-1 day")))
+            await db.commit()
+        expired = await ac.post("/editor/export-pdf", json={"content_id": content_id})
+        info = await ac.get(f"/editor/content/{content_id}")
+    assert missing.status_code == 404
+    assert expired.status_code == 404
+    assert info.status_code == 404
+
+@pytest.mark.asyncio
+async def test_upload_requires_a_user_and_reads_rarely_write():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        anonymous = await ac.post("/editor/content", json={"text": "short note"})
+        content_id = (await ac.post("/editor/content", json={"text": "short note"}, headers=HEADERS)).json()["content_id"]
+    assert anonymous.status_code == 401
+
+    async with AsyncSessionLocal() as db:
+        before = (await db.execute(select(ContentBlob.expires_at))).scalar()
+        assert await load_content(db, content_id) == "short note"
+        assert (await db.execute(select(ContentBlob.expires_at))).scalar() == before
+        # Near the end of its TTL a read extends it again
+        await db.execute(update(ContentBlob).values(expires_at=func.datetime("now", "+1 hour")))
+        await db.commit()
+        assert await load_content(db, content_id) == "short note"
+        assert (await db.execute(select(ContentBlob.expires_at))).scalar() > before
@@ -0,0 +1,116 @@
+import pytest
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+from google.genai import errors
+from app.services import metrics, prompts
+from app.services.context_cache import context_cache
+from app.services.gemini_engine import (
+    process_video_content,
+    generate_quiz_from_text,
+    generate_flashcards_from_text,
+    generate_blog_from_text,
+    generate_carousel_from_text,
+)
+
+TRANSCRIPT = " ".join(f"In part {i} the lecturer explains how enzymes lower activation energy." for i in range(400))
+
+class FakeGemini:
+    """Local stand-in for the provider: cached contents, expiry and input-token billing (~4 chars per token)."""
+    def __init__(self, fail_create: bool = False):
+        self.fail_create = fail_create
+        self.cached = {}
+        self.create_calls = 0
+        self.billed_input_tokens = 0
+        self.caches = SimpleNamespace(create=self._create)
+        self.models = SimpleNamespace(generate_content=self._generate)
+
+    def _create(self, model, config):
+        self.create_calls += 1
+        if self.fail_create:
+            raise errors.ClientError(400, {"error": {"code": 400, "message": "Cached content is too small", "status": "INVALID_ARGUMENT"}})
+        name = f"cachedContents/{self.create_calls}"
+        content = config.contents[0]
+        self.cached[name] = (model, content if isinstance(content, str) else content.parts[0].text)
+        return SimpleNamespace(name=name)
+
+    def _generate(self, model, contents, config=None):
+        handle = getattr(config, "cached_content", None)
+        cached_tokens = 0
+        if handle is not None:
+            if handle not in self.cached or self.cached[handle][0] != model:
+                raise errors.ClientError(404, {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}})
+            cached_tokens = len(self.cached[handle][1]) // 4
+        billed = len(contents) // 4
+        self.billed_input_tokens += billed
+        if "flashcards" in contents:
+            text = '[{"front": "Enzyme", "back": "Catalyst"}]'
+        elif "quiz" in contents:
+            text = '[{"question": "What do enzymes lower?", "options": ["Activation energy"], "answer": "Activation energy"}]'
+        else:
+            text = "Prose about enzymes."
+        usage = SimpleNamespace(prompt_token_count=billed + cached_tokens, candidates_token_count=20, cached_content_token_count=cached_tokens)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+async def run_follow_ups():
+    await generate_quiz_from_text(TRANSCRIPT)
+    await generate_flashcards_from_text(TRANSCRIPT)
+    await generate_blog_from_text(TRANSCRIPT)
+    await generate_carousel_from_text(TRANSCRIPT)
+
+@pytest.mark.asyncio
+async def test_follow_ups_reuse_one_cached_transcript_per_model():
+    fake = FakeGemini()
+    with patch("app.services.gemini_engine.client", fake):
+        await run_follow_ups()
+
+    # Quiz/flashcards share one gemini-2.5-flash cache, blog/carousel one gemini-2.0-flash cache
+    assert fake.create_calls == 2
+    full_prompt_tokens = 4 * (len(prompts.content_prefix(TRANSCRIPT)) // 4)
+    assert fake.billed_input_tokens < 0.1 * full_prompt_tokens
+    assert metrics.get("context_cache_hits") == 2
+    assert metrics.get("llm_prompt_cached_tokens") > 3 * full_prompt_tokens // 4
+
+@pytest.mark.asyncio
+async def test_rejected_or_expired_handles_fall_back_and_recreate():
+    fake = FakeGemini()
+    with patch("app.services.gemini_engine.client", fake):
+        await generate_quiz_from_text(TRANSCRIPT)
+        fake.cached.clear() # Provider dropped the cache early
+        flashcards = json.loads(await generate_flashcards_from_text(TRANSCRIPT))
+        assert flashcards == [{"front": "Enzyme", "back": "Catalyst"}]
+        assert metrics.get("context_cache_fallbacks") == 1
+
+        await generate_quiz_from_text(TRANSCRIPT, language="German")
+        assert fake.create_calls == 2 # Re-registered after the rejection
+
+        # Locally expired handles are recreated rather than reused
+        for key, (name, _) in list(context_cache._handles.items()):
+            context_cache._handles[key] = (name, 0)
+        await generate_quiz_from_text(TRANSCRIPT, language="French")
+    assert fake.create_calls == 3
+
+@pytest.mark.asyncio
+async def test_create_failure_sends_full_prompts_without_retrying():
+    fake = FakeGemini(fail_create=True)
+    with patch("app.services.gemini_engine.client", fake):
+        await generate_quiz_from_text(TRANSCRIPT)
+        await generate_flashcards_from_text(TRANSCRIPT)
+    assert fake.create_calls == 1
+    assert fake.billed_input_tokens > len(TRANSCRIPT) // 2
+
+@pytest.mark.asyncio
+async def test_short_content_is_sent_inline():
+    fake = FakeGemini()
+    with patch("app.services.gemini_engine.client", fake):
+        await generate_quiz_from_text("Enzymes are catalysts.")
+    assert fake.create_calls == 0
+
+@pytest.mark.asyncio
+async def test_video_summary_transcript_is_not_registered():
+    fake = FakeGemini()
+    with patch("app.services.gemini_engine.client", fake), \
+         patch("app.services.gemini_engine.get_transcript", return_value=TRANSCRIPT):
+        await process_video_content("https://youtube.com/watch?v=dQw4w9WgXcQ", "student", 1)
+    assert fake.create_calls == 0
+    assert fake.billed_input_tokens > len(TRANSCRIPT) // 8
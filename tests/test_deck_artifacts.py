@@ -0,0 +1,73 @@
+import pytest
+import json
+import zlib
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import select
+from app.main import app
+from app.database import AsyncSessionLocal
+from app.models import User, SlideDeck, DeckArtifact
+from app.services.singleflight import generation_flight
+
+HEADERS = {"X-Replit-User-Id": "art-1", "X-Replit-User-Name": "artist"}
+QUIZ = '[{"question": "What do mitochondria make?", "options": ["ATP", "DNA"], "answer": "ATP"}]'
+
+async def seed_deck(content: str) -> int:
+    async with AsyncSessionLocal() as db:
+        user = User(email="artist@replit.user", replit_id="art-1", username="artist")
+        db.add(user)
+        await db.commit()
+        deck = SlideDeck(user_id=user.id, video_url="https://youtube.com/watch?v=art", title="Cells", summary_content=content)
+        db.add(deck)
+        await db.commit()
+        return deck.id
+
+@pytest.mark.asyncio
+async def test_deck_artifact_is_generated_once_and_stored_compressed():
+    deck_id = await seed_deck("<p>Mitochondria produce ATP for the cell.</p>")
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text=QUIZ)
+    with patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            first = await ac.get(f"/editor/decks/{deck_id}/artifacts/quiz", headers=HEADERS)
+            second = await ac.get(f"/editor/decks/{deck_id}/artifacts/quiz", headers=HEADERS)
+            unknown = await ac.get(f"/editor/decks/{deck_id}/artifacts/poster", headers=HEADERS)
+
+    assert first.json()["cached"] is False
+    assert second.json() == {"artifact_type": "quiz", "data": json.loads(QUIZ), "cached": True}
+    assert mock_client.models.generate_content.call_count == 1
+    assert unknown.status_code == 404
+
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(select(DeckArtifact).where(DeckArtifact.deck_id == deck_id))).scalars().one()
+    assert json.loads(zlib.decompress(row.payload)) == json.loads(QUIZ)
+
+@pytest.mark.asyncio
+async def test_editing_deck_invalidates_its_artifacts():
+    deck_id = await seed_deck("<p>Mitochondria produce ATP.</p>")
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text=QUIZ)
+    with patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            await ac.get(f"/editor/decks/{deck_id}/artifacts/quiz", headers=HEADERS)
+            await ac.put(f"/api/api/deck/{deck_id}", json={"content": "<p>Ribosomes build proteins.</p>"}, headers=HEADERS)
+            async with AsyncSessionLocal() as db:
+                remaining = (await db.execute(select(DeckArtifact).where(DeckArtifact.deck_id == deck_id))).scalars().all()
+            after = await ac.get(f"/editor/decks/{deck_id}/artifacts/quiz", headers=HEADERS)
+
+    assert remaining == []
+    assert after.json()["cached"] is False
+    assert mock_client.models.generate_content.call_count == 2
+    assert "Ribosomes" in mock_client.models.generate_content.call_args.kwargs["contents"]
+
+@pytest.mark.asyncio
+async def test_generate_quiz_reuses_stored_artifact_for_deck():
+    deck_id = await seed_deck("<p>Cells</p>")
+    with patch("app.routers.editor.generate_quiz_from_text", return_value=QUIZ) as mock_quiz:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            for _ in range(2):
+                res = await ac.post("/editor/generate-quiz", json={"text": "Cells divide.", "deck_id": deck_id}, headers=HEADERS)
+                assert res.json()["questions"][0]["answer"] == "ATP"
+                # Results shared within the single-flight TTL would hide the store
+                generation_flight.clear()
+    assert mock_quiz.call_count == 1
@@ -0,0 +1,59 @@
+import pytest
+from app.main import app
+from httpx import AsyncClient, ASGITransport
+from app.database import AsyncSessionLocal
+from app.models import User, SlideDeck
+from app.services.deck_service import write_deck_content
+
+HEADERS = {"X-Replit-User-Id": "etag-1", "X-Replit-User-Name": "tabs"}
+
+async def seed_deck() -> int:
+    async with AsyncSessionLocal() as db:
+        user = User(email="tabs@replit.user", replit_id="etag-1", username="tabs")
+        db.add(user)
+        await db.commit()
+        deck = SlideDeck(user_id=user.id, video_url="https://youtube.com/watch?v=etag")
+        db.add(deck)
+        await db.flush()
+        await write_deck_content(db, deck, "", "<p>Original</p>")
+        await db.commit()
+        return deck.id
+
+@pytest.mark.asyncio
+async def test_if_none_match_returns_304():
+    deck_id = await seed_deck()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        first = await ac.get(f"/api/api/deck/{deck_id}", headers=HEADERS)
+        etag = first.headers["ETag"]
+        assert first.json()["content"] == "<p>Original</p>"
+
+        cached = await ac.get(f"/api/api/deck/{deck_id}", headers={**HEADERS, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+        await ac.put(f"/api/api/deck/{deck_id}", json={"content": "<p>Changed</p>"}, headers=HEADERS)
+        stale = await ac.get(f"/api/api/deck/{deck_id}", headers={**HEADERS, "If-None-Match": etag})
+        assert stale.status_code == 200
+        assert stale.json()["content"] == "<p>Changed</p>"
+        assert stale.headers["ETag"] != etag
+
+@pytest.mark.asyncio
+async def test_if_match_conflict_and_noop_write():
+    deck_id = await seed_deck()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        etag = (await ac.get(f"/api/api/deck/{deck_id}", headers=HEADERS)).headers["ETag"]
+
+        # Tab A saves first
+        saved = await ac.put(f"/api/api/deck/{deck_id}", json={"content": "<p>Tab A</p>"}, headers={**HEADERS, "If-Match": etag})
+        assert saved.status_code == 200
+        new_etag = saved.headers["ETag"]
+
+        # Tab B still holds the old ETag
+        conflict = await ac.put(f"/api/api/deck/{deck_id}", json={"content": "<p>Tab B</p>"}, headers={**HEADERS, "If-Match": etag})
+        assert conflict.status_code == 412
+        assert conflict.headers["ETag"] == new_etag
+
+        noop = await ac.put(f"/api/api/deck/{deck_id}", json={"content": "<p>Tab A</p>"}, headers={**HEADERS, "If-Match": new_etag})
+        assert noop.json() == {"status": "unchanged", "version": 2}
+        assert noop.headers["ETag"] == new_etag
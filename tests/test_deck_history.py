@@ -0,0 +1,87 @@
+import pytest
+from app.main import app
+from httpx import AsyncClient, ASGITransport
+from app.database import AsyncSessionLocal
+from app.models import User, SlideDeck, DeckVersion
+from app.services.deck_service import write_deck_content
+from app.services.deck_history import apply_ops, diff_ops
+from sqlalchemy import select
+
+HEADERS = {"X-Replit-User-Id": "hist-1", "X-Replit-User-Name": "editor"}
+
+async def seed_deck(content: str) -> int:
+    async with AsyncSessionLocal() as db:
+        user = User(email="editor@replit.user", replit_id="hist-1", username="editor")
+        db.add(user)
+        await db.commit()
+        deck = SlideDeck(user_id=user.id, video_url="https://youtube.com/watch?v=abc")
+        db.add(deck)
+        await db.flush()
+        await write_deck_content(db, deck, "", content)
+        await db.commit()
+        return deck.id
+
+def test_diff_and_apply_roundtrip():
+    old = "<p>Hello world 🎉</p>"
+    for new in ["<p>Hello brave world 🎉</p>", "", "<p>Hello</p>", old + "<p>more</p>"]:
+        assert apply_ops(old, diff_ops(old, new)) == new
+    with pytest.raises(ValueError):
+        apply_ops("abc", [{"retain": 10}])
+
+@pytest.mark.asyncio
+async def test_delta_save_and_version_history(monkeypatch):
+    monkeypatch.setattr("app.services.deck_history.SNAPSHOT_INTERVAL", 3)
+    deck_id = await seed_deck("<p>v1</p>")
+    contents = {1: "<p>v1</p>"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        current = contents[1]
+        for version in range(2, 8):
+            new = current.replace("</p>", f" edit{version}</p>")
+            res = await ac.put(f"/api/api/deck/{deck_id}", json={"base_version": version - 1, "ops": diff_ops(current, new)}, headers=HEADERS)
+            assert res.status_code == 200
+            assert res.json()["version"] == version
+            contents[version] = current = new
+
+        stale = await ac.put(f"/api/api/deck/{deck_id}", json={"base_version": 3, "ops": [{"insert": "x"}]}, headers=HEADERS)
+        assert stale.status_code == 409
+
+        latest = await ac.get(f"/api/api/deck/{deck_id}", headers=HEADERS)
+        assert latest.json()["content"] == contents[7]
+        assert latest.json()["version"] == 7
+
+        for version, expected in contents.items():
+            res = await ac.get(f"/api/api/deck/{deck_id}/versions/{version}", headers=HEADERS)
+            assert res.json()["content"] == expected
+
+        history = (await ac.get(f"/api/api/deck/{deck_id}/versions", headers=HEADERS)).json()
+        assert [h["version"] for h in history] == [7, 6, 5, 4, 3, 2, 1]
+
+        restored = await ac.post(f"/api/api/deck/{deck_id}/versions/2/restore", headers=HEADERS)
+        assert restored.json()["version"] == 8
+        assert restored.json()["content"] == contents[2]
+
+    async with AsyncSessionLocal() as db:
+        kinds = (await db.execute(select(DeckVersion.version, DeckVersion.kind).where(DeckVersion.deck_id == deck_id).order_by(DeckVersion.version))).all()
+    assert [v for v, k in kinds if k == "snapshot"] == [1, 4, 7]
+
+@pytest.mark.asyncio
+async def test_first_edit_of_a_deck_without_history_can_be_undone():
+    async with AsyncSessionLocal() as db:
+        user = User(email="editor@replit.user", replit_id="hist-1", username="editor")
+        db.add(user)
+        await db.commit()
+        # Saved before version history existed
+        deck = SlideDeck(user_id=user.id, video_url="https://youtube.com/watch?v=abc", summary_content="<p>legacy</p>")
+        db.add(deck)
+        await db.commit()
+        deck_id = deck.id
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        saved = await ac.put(f"/api/api/deck/{deck_id}", json={"content": "<p>edited</p>"}, headers=HEADERS)
+        assert saved.json()["version"] == 1
+        history = (await ac.get(f"/api/api/deck/{deck_id}/versions", headers=HEADERS)).json()
+        assert [(h["version"], h["kind"]) for h in history] == [(1, "delta"), (0, "snapshot")]
+
+        restored = await ac.post(f"/api/api/deck/{deck_id}/versions/0/restore", headers=HEADERS)
+    assert restored.json()["content"] == "<p>legacy</p>"
@@ -0,0 +1,57 @@
+import pytest
+import datetime
+from app.main import app
+from httpx import AsyncClient, ASGITransport
+from app.database import AsyncSessionLocal
+from app.models import User, SlideDeck
+from app.services.deck_service import set_deck_content, derive_title, derive_preview
+
+HEADERS = {"X-Replit-User-Id": "lib-1", "X-Replit-User-Name": "reader"}
+
+async def seed_decks(count: int):
+    async with AsyncSessionLocal() as db:
+        user = User(email="reader@replit.user", replit_id="lib-1", username="reader")
+        db.add(user)
+        await db.commit()
+        base = datetime.datetime(2026, 1, 1, 12, 0, 0)
+        for i in range(count):
+            deck = SlideDeck(user_id=user.id, video_url=f"https://youtube.com/watch?v={i}", created_at=base + datetime.timedelta(minutes=i))
+            set_deck_content(deck, f"<h2>Lecture {i}</h2><p>{'Body text. ' * 50}</p>")
+            db.add(deck)
+        await db.commit()
+
+def test_title_and_preview_derivation():
+    html = "<h1>Intro to &amp; Thermodynamics</h1><ul><li>Energy is conserved</li></ul>"
+    assert derive_title(html) == "Intro to & Thermodynamics"
+    assert derive_title("") == "Video Summary"
+    assert derive_preview(html) == "Intro to & Thermodynamics Energy is conserved"
+    assert derive_preview("<p>" + "x" * 300 + "</p>").endswith("...")
+
+@pytest.mark.asyncio
+async def test_decks_keyset_pagination():
+    await seed_decks(5)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        first = await ac.get("/api/api/decks", params={"limit": 2}, headers=HEADERS)
+        assert first.status_code == 200
+        assert [d["title"] for d in first.json()] == ["Lecture 4", "Lecture 3"]
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = await ac.get("/api/api/decks", params={"limit": 2, "cursor": cursor}, headers=HEADERS)
+        assert [d["title"] for d in second.json()] == ["Lecture 2", "Lecture 1"]
+
+        last = await ac.get("/api/api/decks", params={"limit": 2, "cursor": second.headers["X-Next-Cursor"]}, headers=HEADERS)
+        assert [d["title"] for d in last.json()] == ["Lecture 0"]
+        assert "X-Next-Cursor" not in last.headers
+
+        bad = await ac.get("/api/api/decks", params={"cursor": "not-a-cursor"}, headers=HEADERS)
+        assert bad.status_code == 400
+
+@pytest.mark.asyncio
+async def test_recent_activity_uses_stored_preview():
+    await seed_decks(1)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        res = await ac.get("/api/recent-activity", headers=HEADERS)
+    data = res.json()
+    assert data[0]["title"] == "Lecture 0"
+    assert data[0]["preview"].startswith("Lecture 0 Body text.")
+    assert data[0]["preview"].endswith("...")
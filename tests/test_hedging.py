@@ -0,0 +1,121 @@
+import pytest
+import random
+import time
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.config import settings
+from app.services import hedging, metrics
+from app.services.hedging import HedgeBudget, LatencyTracker, hedged
+from app.services.gemini_engine import chat_with_video
+
+TRANSCRIPT = "Enzymes lower the activation energy of reactions."
+
+@pytest.fixture(autouse=True)
+def hedging_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_BUDGET", 0.05)
+
+def test_p90_needs_enough_samples():
+    tracker = LatencyTracker()
+    for i in range(hedging.MIN_SAMPLES - 1):
+        tracker.record(("chat", "m"), i / 100)
+    assert tracker.percentile(("chat", "m")) is None
+    for i in range(100):
+        tracker.record(("chat", "m"), i / 100)
+    assert 0.85 <= tracker.percentile(("chat", "m")) <= 0.95
+
+def test_budget_caps_hedges_at_the_configured_fraction():
+    hedge_budget = HedgeBudget()
+    hedges = 0
+    for _ in range(1000):
+        hedge_budget.earn(0.05)
+        hedges += hedge_budget.spend()
+    assert hedges == 50
+
+def test_hedges_stay_within_budget_under_a_slow_tail():
+    calls = []
+    def call():
+        calls.append(1)
+        time.sleep(0.02 if random.random() < 0.08 else 0.001)
+        return "ok"
+    for _ in range(300):
+        assert hedged(("rewrite", "m"), call, call) == "ok"
+    extra = len(calls) - 300
+    assert extra == metrics.get("llm_hedges")
+    assert 0 < extra <= 0.05 * 300
+
+@pytest.mark.asyncio
+async def test_slow_rewrite_is_answered_by_the_hedge():
+    slow_once = {"pending": True}
+    models = []
+    def generate(model, contents, config=None):
+        models.append(model)
+        if "SLOW" in contents and slow_once["pending"]:
+            slow_once["pending"] = False
+            time.sleep(2)
+            return MagicMock(text="late")
+        time.sleep(0.005)
+        return MagicMock(text="rewritten")
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = generate
+
+    with patch("app.routers.editor.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            for i in range(60): # Warm up the p90 and the budget
+                await ac.post("/editor/rewrite", json={"text": f"Sentence {i}", "tone": "formal"})
+            started = time.monotonic()
+            res = await ac.post("/editor/rewrite", json={"text": "SLOW sentence", "tone": "formal"})
+            elapsed = time.monotonic() - started
+
+    assert res.json()["rewritten_text"] == "rewritten"
+    assert elapsed < 1
+    assert models[-2:] == ["gemini-1.5-flash", "gemini-2.0-flash"]
+    # Scheduling jitter may have hedged a warm-up call too
+    assert 1 <= metrics.get("llm_hedge_wins") <= metrics.get("llm_hedges") <= 3
+
+@pytest.mark.asyncio
+async def test_chat_hedges_to_the_faster_model():
+    models = []
+    def generate(model, contents, config=None):
+        models.append(model)
+        if "SLOW" in contents and model == "gemini-2.5-flash":
+            time.sleep(2)
+            return MagicMock(text="late answer")
+        time.sleep(0.005)
+        return MagicMock(text=f"answer from {model}")
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = generate
+
+    with patch("app.services.gemini_engine.client", mock_client):
+        for i in range(60):
+            await chat_with_video(TRANSCRIPT, [], f"Question {i}?")
+        started = time.monotonic()
+        answer = await chat_with_video(TRANSCRIPT, [], "SLOW question?")
+        elapsed = time.monotonic() - started
+
+    assert answer == "answer from gemini-2.0-flash"
+    assert elapsed < 1
+    assert models[-2:] == ["gemini-2.5-flash", "gemini-2.0-flash"]
+
+@pytest.mark.asyncio
+async def test_non_interactive_generation_is_not_hedged():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text="A blog post.")
+    from app.services.gemini_engine import generate_blog_from_text
+    with patch("app.services.gemini_engine.client", mock_client):
+        for i in range(40):
+            await generate_blog_from_text(f"Notes {i}")
+    assert hedging.latency.percentile(("blog", "gemini-2.0-flash")) is None
+
+def test_hedging_is_off_by_default(monkeypatch):
+    monkeypatch.undo()
+    assert settings.LLM_HEDGE_BUDGET == 0
+    calls = []
+    def call():
+        calls.append(1)
+        time.sleep(0.02 if len(calls) % 5 == 0 else 0.001)
+        return "ok"
+    for _ in range(100):
+        hedged(("rewrite", "m"), call, call)
+    assert len(calls) == 100
+    assert metrics.get("llm_hedges") == 0
@@ -0,0 +1,109 @@
+import pytest
+import os
+import time
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.config import settings
+from app.services import llm_cache, metrics
+from app.services.gemini_engine import generate_quiz_from_text, generate_blog_from_text
+from app.services.llm_cache import ResponseCache, cache_key
+
+def mock_client(text="[]", prompt_tokens=900, response_tokens=100):
+    client = MagicMock()
+    client.models.generate_content.return_value = MagicMock(
+        text=text, usage_metadata=MagicMock(prompt_token_count=prompt_tokens, candidates_token_count=response_tokens)
+    )
+    return client
+
+@pytest.mark.asyncio
+async def test_repeat_generation_is_served_from_cache():
+    client = mock_client('[{"question": "Q?", "options": ["A"], "answer": "A"}]')
+    with patch("app.services.gemini_engine.client", client):
+        first = await generate_quiz_from_text("Photosynthesis makes glucose.")
+        second = await generate_quiz_from_text("Photosynthesis makes glucose.")
+        other_language = await generate_quiz_from_text("Photosynthesis makes glucose.", language="French")
+        with llm_cache.bypass():
+            await generate_quiz_from_text("Photosynthesis makes glucose.")
+
+    assert first == second == other_language
+    # Second call hit the cache; French and the bypassed call went to the model
+    assert client.models.generate_content.call_count == 3
+    assert metrics.get("llm_cache_hits") == 1
+    assert metrics.get("llm_cache_tokens_saved") == 1000
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_memory_eviction_and_is_shared():
+    client = mock_client("A blog post.")
+    with patch("app.services.gemini_engine.client", client):
+        await generate_blog_from_text("Notes")
+        # A fresh process (empty memory tier) reading the same directory
+        llm_cache.response_cache.clear_memory()
+        assert await generate_blog_from_text("Notes") == "A blog post."
+    assert client.models.generate_content.call_count == 1
+
+def test_key_covers_model_prompt_and_config():
+    base = cache_key("gemini-2.5-flash", "prompt")
+    assert base == cache_key("gemini-2.5-flash", "prompt", None)
+    assert base != cache_key("gemini-2.0-flash", "prompt")
+    assert base != cache_key("gemini-2.5-flash", "prompt!")
+    assert base != cache_key("gemini-2.5-flash", "prompt", {"temperature": 0.2})
+
+def test_expired_entries_are_ignored(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=1 << 20, ttl=60)
+    cache.put("k1", {"text": "old", "tokens": 5, "created": time.time() - 120})
+    cache.put("k2", {"text": "new", "tokens": 5, "created": time.time()})
+    assert cache.get("k1") is None
+    assert cache.get("k2")["text"] == "new"
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=3000, ttl=60, memory_entries=1)
+    for i in range(6):
+        cache.put(f"{i:02d}key", {"text": os.urandom(400).hex(), "tokens": 0, "created": time.time()})
+    files = list(tmp_path.glob("*/*.json.z"))
+    assert sum(f.stat().st_size for f in files) <= 3000
+    assert cache.get("05key") is not None
+    assert cache.get("00key") is None
+
+def test_bypass_flag_forces_a_model_call():
+    client = mock_client("A blog post.")
+    llm_cache.generate(client, "gemini-2.0-flash", "same prompt")
+    fresh = llm_cache.generate(client, "gemini-2.0-flash", "same prompt", bypass_cache=True)
+    cached = llm_cache.generate(client, "gemini-2.0-flash", "same prompt")
+    assert client.models.generate_content.call_count == 2
+    assert getattr(fresh, "cached", False) is not True
+    assert cached.cached is True and cached.text == "A blog post."
+
+@pytest.mark.asyncio
+async def test_metrics_report_llm_cache_hit_ratio():
+    client = mock_client("Rewritten.")
+    with patch("app.routers.editor.client", client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            for _ in range(4):
+                await ac.post("/editor/rewrite", json={"text": "hello", "tone": "formal"})
+            res = await ac.get("/metrics", headers={"x-n8n-auth": settings.AUTH_SECRET_TOKEN})
+    assert client.models.generate_content.call_count == 1
+    assert res.json()["llm_cache_hit_ratio"] == 0.75
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=1 << 20, ttl=60)
+    cache.put("k1", {"text": "answer", "tokens": 5, "created": time.time()})
+    cache.clear()
+    assert cache.get("k1") is None
+    assert list(tmp_path.glob("*/*.json.z")) == []
+
+@pytest.mark.asyncio
+async def test_fallback_answers_are_not_cached_as_the_primary_model():
+    from google.genai import errors
+    def generate(model, contents, config=None):
+        if model == "gemini-2.0-flash" and not generate.recovered:
+            raise errors.ClientError(404, {"error": {"code": 404, "message": "gone", "status": "NOT_FOUND"}})
+        return MagicMock(text=f"Blog by {model}.")
+    generate.recovered = False
+    client = MagicMock()
+    client.models.generate_content.side_effect = generate
+    with patch("app.services.gemini_engine.client", client):
+        assert await generate_blog_from_text("Notes") == "Blog by gemini-2.5-flash."
+        generate.recovered = True
+        assert await generate_blog_from_text("Notes") == "Blog by gemini-2.0-flash."
+    assert metrics.get("llm_cache_skipped_fallbacks") == 1
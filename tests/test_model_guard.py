@@ -0,0 +1,182 @@
+import pytest
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from google.genai import errors
+from app.main import app
+from app.config import settings
+from app.services import model_guard, metrics
+from app.services.model_guard import AIMDLimiter, CircuitBreaker, call_with_fallback, ModelUnavailableError
+from app.services.gemini_engine import generate_quiz_from_text
+
+QUIZ = '[{"question": "Q?", "options": ["A"], "answer": "A"}]'
+
+def api_error(code: int, status: str):
+    cls = errors.ServerError if code >= 500 else errors.ClientError
+    return cls(code, {"error": {"code": code, "message": status, "status": status}})
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(model_guard, "BACKOFF_BASE_SECONDS", 0)
+
+def test_aimd_limit_halves_on_throttling_and_recovers_additively():
+    limiter = AIMDLimiter(initial=8)
+    for _ in range(4):
+        assert limiter.acquire()
+    started = time.monotonic()
+    limiter.release(started, throttled=True)
+    limiter.release(started, throttled=True) # Already in flight at the decrease: same signal
+    assert limiter.limit == 4
+    limiter.release(started)
+    assert limiter.limit == 4.25
+    limiter.release(time.monotonic(), throttled=True)
+    assert limiter.limit == 2.125
+
+def test_breaker_opens_then_lets_one_trial_through():
+    breaker = CircuitBreaker(threshold=2, reset_after=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow() # Only one trial at a time
+    breaker.record_success()
+    assert breaker.allow()
+
+@pytest.mark.parametrize("trial_error", [429, 400])
+def test_a_trial_answered_by_the_model_closes_the_breaker(trial_error):
+    _, breaker = model_guard._guards("gemini-2.5-flash")
+    breaker.reset_after = 0
+    for _ in range(model_guard.BREAKER_THRESHOLD):
+        breaker.record_failure()
+
+    def trial(model):
+        raise api_error(trial_error, "RESOURCE_EXHAUSTED" if trial_error == 429 else "INVALID_ARGUMENT")
+    try:
+        call_with_fallback("quiz", trial)
+    except errors.ClientError:
+        assert trial_error == 400 # Bad requests are raised, not rerouted
+    except ModelUnavailableError:
+        pass
+    assert not breaker.is_open and not breaker._trial_in_flight
+    # The model is used again
+    assert call_with_fallback("quiz", lambda model: model) == "gemini-2.5-flash"
+
+def test_a_trial_without_an_outcome_is_released(monkeypatch):
+    limiter, breaker = model_guard._guards("gemini-2.5-flash")
+    breaker.reset_after = 0
+    for _ in range(model_guard.BREAKER_THRESHOLD):
+        breaker.record_failure()
+    monkeypatch.setattr(limiter, "acquire", lambda timeout=None: False) # No free slot
+    assert call_with_fallback("quiz", lambda model: model) == "gemini-2.0-flash"
+    assert breaker.allow() # Another trial may go through
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = [
+        api_error(429, "RESOURCE_EXHAUSTED"), api_error(503, "UNAVAILABLE"), MagicMock(text=QUIZ)
+    ]
+    with patch("app.services.gemini_engine.client", mock_client):
+        assert "Q?" in await generate_quiz_from_text("Notes")
+    assert metrics.get("model_retries") == 2
+    assert {c.kwargs["model"] for c in mock_client.models.generate_content.call_args_list} == {"gemini-2.5-flash"}
+
+@pytest.mark.asyncio
+async def test_withdrawn_model_falls_back_along_the_chain(monkeypatch):
+    def generate(model, contents, config=None):
+        if model == "gemini-2.5-flash":
+            raise api_error(404, "NOT_FOUND")
+        return MagicMock(text=QUIZ)
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = generate
+    with patch("app.services.gemini_engine.client", mock_client):
+        await generate_quiz_from_text("Notes")
+        # Configured chains override the defaults
+        monkeypatch.setitem(settings.MODEL_FALLBACKS, "quiz", ["gemini-2.5-flash", "gemini-2.5-flash-lite"])
+        await generate_quiz_from_text("Other notes")
+    models = [c.kwargs["model"] for c in mock_client.models.generate_content.call_args_list]
+    assert models == ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-2.5-flash", "gemini-2.5-flash-lite"]
+    assert metrics.get("model_fallbacks") == 2
+
+@pytest.mark.asyncio
+async def test_exhausted_models_return_503_and_open_the_circuit():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = api_error(503, "UNAVAILABLE")
+    with patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            res = await ac.post("/editor/generate-quiz", json={"text": "Notes"})
+            again = await ac.post("/editor/generate-quiz", json={"text": "Other notes"})
+            calls = mock_client.models.generate_content.call_count
+            third = await ac.post("/editor/generate-quiz", json={"text": "More notes"})
+            stats = await ac.get("/metrics", headers={"x-n8n-auth": settings.AUTH_SECRET_TOKEN})
+
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == str(model_guard.BREAKER_RESET_SECONDS)
+    # The second request tripped both breakers, so the third didn't touch the provider
+    assert again.status_code == third.status_code == 503
+    assert mock_client.models.generate_content.call_count == calls
+    assert stats.json()["models"]["gemini-2.5-flash"]["circuit_open"] is True
+
+@pytest.mark.asyncio
+async def test_request_errors_are_not_retried_or_rerouted():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = api_error(400, "INVALID_ARGUMENT")
+    with patch("app.services.gemini_engine.client", mock_client):
+        with pytest.raises(errors.ClientError):
+            await generate_quiz_from_text("Notes")
+    assert mock_client.models.generate_content.call_count == 1
+
+@pytest.mark.asyncio
+async def test_calls_waiting_for_a_slot_leave_the_default_executor_free():
+    release = threading.Event()
+    threads = set()
+    def generate(model, contents, config=None):
+        threads.add(threading.current_thread().name)
+        release.wait(5)
+        return MagicMock(text=QUIZ)
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = generate
+    with patch("app.services.gemini_engine.client", mock_client):
+        # More callers than the default executor has threads; most wait for a slot
+        calls = [asyncio.create_task(generate_quiz_from_text(f"Notes {i}")) for i in range(40)]
+        await asyncio.sleep(0.2)
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: "free"), timeout=1) == "free"
+        release.set()
+        await asyncio.gather(*calls)
+    assert all(name.startswith("llm-call") for name in threads)
+
+def test_concurrency_converges_on_the_provider_quota(monkeypatch):
+    monkeypatch.setattr(model_guard, "BACKOFF_BASE_SECONDS", 0.01)
+    quota = 3
+    active = 0
+    peak_rejections = []
+    lock = threading.Lock()
+
+    def call(model):
+        nonlocal active
+        with lock:
+            if model != "gemini-2.5-flash":
+                return "fallback"
+            if active >= quota:
+                peak_rejections.append(1)
+                raise api_error(429, "RESOURCE_EXHAUSTED")
+            active += 1
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: call_with_fallback("quiz", call), range(200)))
+
+    # AIMD keeps probing above the quota, so the odd call may exhaust its retries and fall back
+    assert results.count("ok") >= 190
+    limit = model_guard.snapshot()["gemini-2.5-flash"]["limit"]
+    assert limit <= quota + 2
+    # Throttling stays a small fraction of the work once the limit has adapted
+    assert len(peak_rejections) < 40
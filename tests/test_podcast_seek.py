@@ -0,0 +1,73 @@
+import pytest
+import json
+import os
+import uuid
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.services.mp3_frames import clean_clip, SegmentIndex
+
+# MPEG2 Layer III, 32 kbps, 24 kHz: 96-byte frames of 576 samples (24 ms)
+FRAME_HEADER = bytes([0xFF, 0xF3, 0x44, 0xC4])
+FRAME_SIZE = 96
+
+def make_clip(frames: int, fill: int) -> bytes:
+    id3 = b"ID3" + bytes([3, 0, 0, 0, 0, 0, 10]) + bytes(10)
+    xing = FRAME_HEADER + b"\x00" * 32 + b"Xing" + bytes(FRAME_SIZE - 40)
+    audio = (FRAME_HEADER + bytes([fill]) * (FRAME_SIZE - 4)) * frames
+    return id3 + xing + audio + b"\xFF\xF3" # trailing partial frame
+
+def test_clean_clip_keeps_only_audio_frames():
+    audio, duration, rate = clean_clip(make_clip(10, 1))
+    assert len(audio) == 10 * FRAME_SIZE
+    assert audio.startswith(FRAME_HEADER)
+    assert rate == 24000
+    assert duration == pytest.approx(0.24)
+
+def write_podcast(clips):
+    index = SegmentIndex()
+    filename = f"podcast_{uuid.uuid4().hex}.mp3"
+    path = os.path.join("user_uploads", filename)
+    with open(path, "wb") as f:
+        for i, clip in enumerate(clips):
+            f.write(index.append(clip, i, "Alex" if i % 2 == 0 else "Sam", f"line {i}"))
+    with open(path.replace(".mp3", ".index.json"), "w") as f:
+        json.dump(index.to_dict(), f)
+    return filename, path
+
+@pytest.mark.asyncio
+async def test_range_requests_index_and_playlist():
+    filename, path = write_podcast([make_clip(50, 1), make_clip(100, 2), make_clip(25, 3)])
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            index = (await ac.get(f"/editor/podcast/{filename}/index")).json()
+            second = index["segments"][1]
+            assert second["byte_offset"] == 50 * FRAME_SIZE
+            assert second["start_time"] == pytest.approx(1.2)
+            assert index["total_bytes"] == 175 * FRAME_SIZE
+
+            # Jump straight to line 1
+            end = second["byte_offset"] + second["byte_length"] - 1
+            res = await ac.get(f"/editor/podcast/{filename}", headers={"Range": f"bytes={second['byte_offset']}-{end}"})
+            assert res.status_code == 206
+            assert res.headers["content-range"] == f"bytes {second['byte_offset']}-{end}/{175 * FRAME_SIZE}"
+            assert res.content == (FRAME_HEADER + bytes([2]) * (FRAME_SIZE - 4)) * 100
+
+            tail = await ac.get(f"/editor/podcast/{filename}", headers={"Range": "bytes=-96"})
+            assert tail.status_code == 206 and len(tail.content) == 96
+
+            full = await ac.get(f"/editor/podcast/{filename}")
+            assert full.status_code == 200 and full.headers["accept-ranges"] == "bytes"
+
+            bad = await ac.get(f"/editor/podcast/{filename}", headers={"Range": "bytes=999999-"})
+            assert bad.status_code == 416
+
+            playlist = (await ac.get(f"/editor/podcast/{filename}/playlist.m3u8")).text
+            assert f"#EXT-X-BYTERANGE:{100 * FRAME_SIZE}@{50 * FRAME_SIZE}" in playlist
+            assert "#EXTINF:2.400,Sam" in playlist
+            assert playlist.strip().endswith("#EXT-X-ENDLIST")
+
+            missing = await ac.get("/editor/podcast/..%2Fapp%2Fmain.py")
+            assert missing.status_code == 404
+    finally:
+        os.remove(path)
+        os.remove(path.replace(".mp3", ".index.json"))
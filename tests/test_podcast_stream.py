@@ -0,0 +1,66 @@
+import pytest
+import os
+import time
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.services.json_stream import JsonArrayStreamParser
+
+events = []
+
+class FakeTTS:
+    def __init__(self, text, lang="en", tld="com"):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        events.append(("tts", self.text))
+        fp.write(f"<{self.text}>".encode())
+
+def fake_stream(**kwargs):
+    script = '```json\n[{"speaker": "Alex", "text": "Welcome back!"}, {"speaker": "Sam", "text": "Thanks, Alex."}, {"speaker": "Alex", "text": "Bye!"}]\n```'
+    for i in range(0, len(script), 20):
+        time.sleep(0.05)
+        events.append(("chunk", i))
+        chunk = MagicMock()
+        chunk.text = script[i:i + 20]
+        yield chunk
+
+def test_stream_parser_yields_items_across_chunks():
+    parser = JsonArrayStreamParser()
+    assert parser.feed('Sure! ```json\n[{"a": "x, ]') == []
+    assert parser.feed('y"}, {"a": 2') == [{"a": "x, ]y"}]
+    assert parser.feed('}] trailing prose') == [{"a": 2}]
+    assert parser.finished
+
+def test_stream_parser_skips_brackets_in_leading_prose():
+    parser = JsonArrayStreamParser()
+    assert parser.feed('Sure! Our [2] hosts: [') == []
+    assert parser.feed(' {"speaker": "Alex", "text": "Hi [wave]"}]') == [{"speaker": "Alex", "text": "Hi [wave]"}]
+    assert parser.finished
+
+@pytest.mark.asyncio
+async def test_podcast_stream_pipelines_tts_with_generation():
+    events.clear()
+    mock_client = MagicMock()
+    mock_client.models.generate_content_stream.side_effect = fake_stream
+
+    with patch("app.services.gemini_engine.client", mock_client), patch("app.services.audio_engine.gTTS", FakeTTS):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            res = await ac.post("/editor/podcast-stream", json={"text": "Some transcript"})
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "audio/mpeg"
+    assert res.content == b"<Welcome back!><Thanks, Alex.><Bye!>"
+
+    # The first line was voiced before the model finished writing the script
+    first_tts = events.index(("tts", "Welcome back!"))
+    last_chunk = max(i for i, e in enumerate(events) if e[0] == "chunk")
+    assert first_tts < last_chunk
+
+    audio_path = res.headers["X-Audio-Url"].replace("/uploads/", "user_uploads/")
+    try:
+        with open(audio_path, "rb") as f:
+            assert f.read() == res.content
+    finally:
+        os.remove(audio_path)
+        os.remove(audio_path.replace(".mp3", ".index.json"))
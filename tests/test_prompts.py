@@ -0,0 +1,99 @@
+import pytest
+import os
+import time
+from unittest.mock import MagicMock, patch
+from app.services import prompts, metrics
+from app.services.context_cache import context_cache
+from app.services.model_guard import model_chain
+from app.services.gemini_engine import (
+    convert_text_to_slides_json,
+    generate_quiz_from_text,
+    generate_flashcards_from_text,
+    generate_blog_from_text,
+    generate_carousel_from_text,
+    generate_audio_script,
+    chat_with_video,
+)
+
+NOTES = "Photosynthesis converts light energy into chemical energy.\nChlorophyll absorbs mostly red and blue light.  \r\n"
+
+def test_every_template_renders_content_first():
+    params = {"slide_count": 5, "language": "English", "count": 5, "style_instruction": "Be clear.", "tone": "neutral",
+              "context_label": "the video transcript", "history": "", "question": "Why?"}
+    for name in prompts.TEMPLATES:
+        rendered = prompts.render(name, NOTES, **params)
+        assert rendered.text.startswith(rendered.prefix)
+        assert rendered.prefix == prompts.content_prefix(NOTES)
+        # Nothing task-specific may leak into the shared block
+        assert name not in rendered.prefix
+
+def test_canonical_content_ignores_incidental_whitespace():
+    assert prompts.content_prefix("a  \r\nb\n\n") == prompts.content_prefix("a\nb")
+    assert prompts.content_prefix("a\nb") != prompts.content_prefix("a\nc")
+
+def test_long_content_is_cut_unless_the_full_block_is_cached():
+    long_notes = " ".join(f"Fact {i}: chlorophyll absorbs light." for i in range(1000))
+    limit = prompts.MAX_CONTENT_CHARS["audio_script"]
+    assert len(long_notes) > limit
+    script = prompts.render("audio_script", long_notes, language="English")
+    assert script.prefix == prompts.content_prefix(long_notes[:limit])
+    assert "use only the part before" not in script.instructions
+
+    # With the whole block cached, keep it and move the cut-off into the instructions
+    full = prompts.render("audio_script", long_notes, full_content=True, language="English")
+    quiz = prompts.render("quiz", long_notes, language="English", count=5)
+    assert full.prefix == quiz.prefix == prompts.content_prefix(long_notes)
+    assert "use only the part before the passage" in full.instructions
+    assert "use only the part before" not in prompts.render("audio_script", NOTES, full_content=True, language="English").instructions
+
+@pytest.mark.asyncio
+async def test_audio_script_reuses_a_cached_long_transcript():
+    long_notes = " ".join(f"Fact {i}: chlorophyll absorbs light." for i in range(1000))
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text='[{"speaker": "Alex", "text": "Hi"}]')
+    with patch("app.services.gemini_engine.client", mock_client):
+        await generate_audio_script(long_notes)
+        assert mock_client.models.generate_content.call_args.kwargs["contents"].startswith(
+            prompts.content_prefix(long_notes[:prompts.MAX_CONTENT_CHARS["audio_script"]]))
+        context_cache._remember(context_cache._key(model_chain("audio_script")[0], prompts.content_prefix(long_notes)), "cachedContents/abc", time.time() + 600)
+        await generate_audio_script(long_notes, language="French")
+    # Only the instructions are sent against the existing handle
+    call = mock_client.models.generate_content.call_args.kwargs
+    assert call["config"].cached_content == "cachedContents/abc"
+    assert "use only the part before the passage" in call["contents"]
+
+@pytest.mark.asyncio
+async def test_generators_share_a_byte_identical_prefix():
+    sent = []
+    def record(model, contents, config=None):
+        sent.append(contents)
+        if "podcast dialogue" in contents:
+            return MagicMock(text='[{"speaker": "Alex", "text": "Hi"}]')
+        return MagicMock(text='[{"title": "t", "points": [], "question": "q", "options": [], "answer": "a", "front": "f", "back": "b"}]')
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = record
+
+    with patch("app.services.gemini_engine.client", mock_client):
+        await convert_text_to_slides_json(NOTES, count=5, tone="fun", language="French")
+        await generate_quiz_from_text(NOTES)
+        await generate_flashcards_from_text(NOTES, language="Spanish")
+        await generate_blog_from_text(NOTES)
+        await generate_carousel_from_text(NOTES)
+        await generate_audio_script(NOTES)
+        await chat_with_video(NOTES, [], "Which light does chlorophyll absorb?")
+
+    assert len(sent) == 7
+    prefix = prompts.content_prefix(NOTES)
+    for contents in sent:
+        assert contents.startswith(prefix)
+    assert os.path.commonprefix(sent) == prefix
+
+@pytest.mark.asyncio
+async def test_provider_prefix_cache_hits_are_counted():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(
+        text="A blog post.", usage_metadata=MagicMock(prompt_token_count=3000, candidates_token_count=500, cached_content_token_count=2048)
+    )
+    with patch("app.services.gemini_engine.client", mock_client):
+        await generate_blog_from_text(NOTES)
+    assert metrics.get("llm_prompt_cached_tokens") == 2048
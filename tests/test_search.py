@@ -0,0 +1,67 @@
+import pytest
+from app.main import app
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import patch
+from app.database import AsyncSessionLocal
+from app.models import User, SlideDeck
+from app.services.deck_service import write_deck_content
+
+HEADERS = {"X-Replit-User-Id": "search-1", "X-Replit-User-Name": "searcher"}
+
+async def seed_library():
+    async with AsyncSessionLocal() as db:
+        user = User(email="searcher@replit.user", replit_id="search-1", username="searcher")
+        other = User(email="other@example.com")
+        db.add_all([user, other])
+        await db.commit()
+        decks = {}
+        for owner, title, body in [
+            (user, "Thermodynamics", "<p>Entropy always increases in an isolated system &lt;script&gt;</p>"),
+            (user, "Cell Biology", "<p>The mitochondria is the powerhouse of the cell.</p>"),
+            (other, "Private Entropy Notes", "<p>Entropy for someone else.</p>"),
+        ]:
+            deck = SlideDeck(user_id=owner.id, video_url="https://youtube.com/watch?v=x")
+            db.add(deck)
+            await db.flush()
+            await write_deck_content(db, deck, "", f"<h1>{title}</h1>{body}")
+            decks[title] = deck.id
+        await db.commit()
+        return decks
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_highlights_own_decks():
+    decks = await seed_library()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        res = await ac.get("/api/search", params={"q": "entropy"}, headers=HEADERS)
+    assert res.status_code == 200
+    results = res.json()["results"]
+    assert [r["deck_id"] for r in results] == [decks["Thermodynamics"]]
+    assert "<mark>Entropy</mark>" in results[0]["snippet"]
+    # Body text is escaped before highlighting
+    assert "&lt;script&gt;" in results[0]["snippet"]
+
+@pytest.mark.asyncio
+async def test_search_updates_on_save_and_handles_syntax():
+    decks = await seed_library()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+        deck_id = decks["Cell Biology"]
+        await ac.put(f"/api/api/deck/{deck_id}", json={"content": "<h1>Cell Biology</h1><p>Ribosomes build proteins.</p>"}, headers=HEADERS)
+        gone = await ac.get("/api/search", params={"q": "mitochondria"}, headers=HEADERS)
+        found = await ac.get("/api/search", params={"q": "riboso"}, headers=HEADERS)
+        weird = await ac.get("/api/search", params={"q": 'cell" OR NEAR('}, headers=HEADERS)
+    assert gone.json()["results"] == []
+    assert found.json()["results"][0]["deck_id"] == deck_id
+    assert weird.status_code == 200
+
+@pytest.mark.asyncio
+async def test_generated_quiz_is_indexed_under_deck():
+    decks = await seed_library()
+    deck_id = decks["Cell Biology"]
+    with patch("app.routers.editor.generate_quiz_from_text") as mock_quiz:
+        mock_quiz.return_value = '[{"question": "Which organelle makes ATP?", "options": ["Golgi", "Mitochondrion"], "answer": "Mitochondrion"}]'
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            await ac.post("/editor/generate-quiz", json={"text": "cells", "deck_id": deck_id}, headers=HEADERS)
+            res = await ac.get("/api/search", params={"q": "organelle"}, headers=HEADERS)
+    results = res.json()["results"]
+    assert results[0]["deck_id"] == deck_id
+    assert results[0]["kind"] == "quiz"
@@ -0,0 +1,147 @@
+import pytest
+import asyncio
+import json
+from unittest.mock import patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.services.singleflight import SingleFlight, make_key
+
+class MemoryLockStore:
+    """Stands in for the shared Redis store between two simulated workers."""
+    def __init__(self):
+        self.locks = {}
+        self.results = {}
+
+    async def acquire(self, key, token, ttl):
+        if key in self.locks:
+            return False
+        self.locks[key] = token
+        return True
+
+    async def release(self, key, token):
+        if self.locks.get(key) == token:
+            del self.locks[key]
+
+    async def holder(self, key):
+        return self.locks.get(key)
+
+    async def publish(self, key, payload, ttl):
+        self.results[key] = payload
+
+    async def fetch(self, key):
+        return self.results.get(key)
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call_and_get_copies():
+    calls = []
+    async def generate(video):
+        calls.append(video)
+        await asyncio.sleep(0.05)
+        return {"content": f"notes for {video}"}
+
+    flight = SingleFlight("test")
+    results = await asyncio.gather(*[flight.do(make_key("abc", " English "), generate, "abc") for _ in range(30)])
+    assert calls == ["abc"]
+    assert all(r == {"content": "notes for abc"} for r in results)
+    results[0]["deck_id"] = 1 # Callers may annotate their own copy
+    assert "deck_id" not in results[1]
+
+    # Served from the short result cache afterwards
+    assert (await flight.do(make_key("abc", "English"), generate, "abc"))["content"] == "notes for abc"
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_follower_and_are_not_cached():
+    calls = 0
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        raise ValueError("Subtitles are disabled")
+
+    flight = SingleFlight("test")
+    results = await asyncio.gather(*[flight.do("k", failing) for _ in range(5)], return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    with pytest.raises(ValueError):
+        await flight.do("k", failing)
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_workers_coalesce_through_shared_store():
+    store = MemoryLockStore()
+    calls = 0
+    async def generate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.3)
+        return "shared result"
+
+    worker_a, worker_b = SingleFlight("video", store=store), SingleFlight("video", store=store)
+    results = await asyncio.gather(worker_a.do("k", generate), worker_b.do("k", generate))
+    assert results == ["shared result", "shared result"]
+    assert calls == 1
+    assert json.loads(store.results["video:k"]) == {"result": "shared result"}
+    assert store.locks == {}
+
+@pytest.mark.asyncio
+async def test_identical_quiz_requests_are_coalesced():
+    calls = 0
+    async def slow_quiz(text, language="English"):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return '[{"question": "Q?", "options": ["A"], "answer": "A"}]'
+
+    with patch("app.routers.editor.generate_quiz_from_text", slow_quiz):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            responses = await asyncio.gather(*[
+                ac.post("/editor/generate-quiz", json={"text": "Lecture on enzymes"}) for _ in range(10)
+            ])
+    assert calls == 1
+    assert all(r.status_code == 200 and r.json()["questions"][0]["answer"] == "A" for r in responses)
+
+class FlakyLockStore(MemoryLockStore):
+    def __init__(self, broken: set):
+        super().__init__()
+        self.broken = broken
+
+    async def fetch(self, key):
+        if "fetch" in self.broken:
+            raise ConnectionError("Redis went away")
+        return await super().fetch(key)
+
+    async def publish(self, key, payload, ttl):
+        if "publish" in self.broken:
+            raise ConnectionError("Redis went away")
+        await super().publish(key, payload, ttl)
+
+@pytest.mark.asyncio
+async def test_store_errors_fall_back_to_running_locally():
+    async def generate():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    for broken in ({"fetch"}, {"publish"}, {"fetch", "publish"}):
+        store = FlakyLockStore(broken)
+        worker_a, worker_b = SingleFlight("video", store=store), SingleFlight("video", store=store)
+        results = await asyncio.gather(worker_a.do("k", generate), worker_b.do("k", generate))
+        assert results == ["result", "result"]
+        assert store.locks == {}
+
+@pytest.mark.asyncio
+async def test_old_errors_do_not_fail_followers_of_a_new_leader():
+    store = MemoryLockStore()
+    await store.publish("video:k", json.dumps({"error": "Quota exceeded", "leader": "old-leader"}), 5)
+    store.locks["video:k"] = "new-leader"
+
+    async def finish_new_leader():
+        await asyncio.sleep(0.3)
+        await store.publish("video:k", json.dumps({"result": "fresh"}), 60)
+        del store.locks["video:k"]
+
+    async def never_called():
+        raise AssertionError("follower should not run the work")
+
+    asyncio.ensure_future(finish_new_leader())
+    assert await SingleFlight("video", store=store).do("k", never_called) == "fresh"
@@ -0,0 +1,82 @@
+import pytest
+import json
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.services.json_stream import repair_json, parse_json_list
+from app.services.gemini_engine import generate_quiz_from_text, convert_text_to_slides_json
+
+def test_repair_handles_common_model_defects():
+    assert repair_json('Sure! Here are [2] cards:\n```json\n[{"front": "a", "back": "b",},]\n```\nHope it helps!') == [{"front": "a", "back": "b"}]
+    assert repair_json('[{"question": "Line one\nline two?", "answer": "x"}]') == [{"question": "Line one\nline two?", "answer": "x"}]
+    # Cut off mid-element: keep what is complete
+    assert repair_json('[{"title": "One"}, {"title": "Two"}, {"title": "Thr') == [{"title": "One"}, {"title": "Two"}]
+    assert parse_json_list('{"slides": [{"title": "One"}]}') == [{"title": "One"}]
+    with pytest.raises(ValueError):
+        repair_json("I could not do that.")
+
+@pytest.mark.asyncio
+async def test_generators_request_schema_and_repair_without_regenerating():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(
+        text='Here is your quiz:\n[{"question": "2+2?", "options": ["4", "5"], "answer": "4"},]\nGood luck!'
+    )
+    with patch("app.services.gemini_engine.client", mock_client):
+        questions = json.loads(await generate_quiz_from_text("Arithmetic"))
+
+    assert questions == [{"question": "2+2?", "options": ["4", "5"], "answer": "4"}]
+    assert mock_client.models.generate_content.call_count == 1
+    config = mock_client.models.generate_content.call_args.kwargs["config"]
+    assert config.response_mime_type == "application/json"
+    assert config.response_json_schema["items"]["required"] == ["question", "options", "answer"]
+
+@pytest.mark.asyncio
+async def test_unusable_output_is_an_error_and_not_cached():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text="Sorry, I can't help with that.")
+    with patch("app.services.gemini_engine.client", mock_client):
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await convert_text_to_slides_json("Notes")
+    assert mock_client.models.generate_content.call_count == 2
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_yields_items_as_they_arrive():
+    script = '```json\n[{"question": "Q1?", "options": ["a"], "answer": "a"}, {"question": "Q2?", "options": ["b"], "answer": "b"}]```'
+    def fake_stream(**kwargs):
+        for i in range(0, len(script), 15):
+            yield MagicMock(text=script[i:i + 15])
+    mock_client = MagicMock()
+    mock_client.models.generate_content_stream.side_effect = fake_stream
+    with patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            res = await ac.post("/editor/stream/quiz", json={"text": "Notes"})
+            # The completed stream was cached: replaying it costs no model call
+            again = await ac.post("/editor/stream/quiz", json={"text": "Notes"})
+            unknown = await ac.post("/editor/stream/blog", json={"text": "Notes"})
+
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert [line["item"]["question"] for line in lines[:-1]] == ["Q1?", "Q2?"]
+    assert lines[-1] == {"status": "done", "count": 2}
+    assert again.text == res.text
+    assert mock_client.models.generate_content_stream.call_count == 1
+    assert unknown.status_code == 404
+
+@pytest.mark.asyncio
+async def test_stream_ignores_bracketed_prose_before_the_array():
+    script = 'Sure! Here are [2] questions: [{"question": "Q1?", "options": ["a"], "answer": "a"}, {"question": "Q2?", "options": ["b"], "answer": "b"}]'
+    def fake_stream(**kwargs):
+        for i in range(0, len(script), 7):
+            yield MagicMock(text=script[i:i + 7])
+    mock_client = MagicMock()
+    mock_client.models.generate_content_stream.side_effect = fake_stream
+    with patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            res = await ac.post("/editor/stream/quiz", json={"text": "Notes"})
+            again = await ac.post("/editor/stream/quiz", json={"text": "Notes"})
+
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert [line["item"]["question"] for line in lines[:-1]] == ["Q1?", "Q2?"]
+    # What was cached replays as the same questions, not as "[2]"
+    assert again.text == res.text
+    assert mock_client.models.generate_content_stream.call_count == 1
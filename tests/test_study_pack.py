@@ -0,0 +1,76 @@
+import pytest
+import json
+import time
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import select
+from app.main import app
+from app.database import AsyncSessionLocal
+from app.models import User, SlideDeck, DeckArtifact
+
+HEADERS = {"X-Replit-User-Id": "pack-1", "X-Replit-User-Name": "packer"}
+
+def slow_generate(model, contents, config=None):
+    time.sleep(0.3) # Blocking, like the real client
+    if "blog post" in contents or "carousel" in contents.lower():
+        return MagicMock(text="Some prose about enzymes.")
+    if "flashcard" in contents.lower():
+        return MagicMock(text='[{"front": "Enzyme", "back": "Biological catalyst"}]')
+    if "quiz" in contents:
+        return MagicMock(text='[{"question": "What lowers activation energy?", "options": ["Enzymes"], "answer": "Enzymes"}]')
+    return MagicMock(text='[{"title": "Enzymes", "points": ["Catalysts"], "notes": ""}]')
+
+async def seed_deck() -> int:
+    async with AsyncSessionLocal() as db:
+        user = User(email="packer@replit.user", replit_id="pack-1", username="packer")
+        db.add(user)
+        await db.commit()
+        deck = SlideDeck(user_id=user.id, video_url="https://youtube.com/watch?v=pack", title="Enzymes")
+        db.add(deck)
+        await db.commit()
+        return deck.id
+
+@pytest.mark.asyncio
+async def test_study_pack_streams_artifacts_concurrently_and_persists():
+    deck_id = await seed_deck()
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = slow_generate
+    with patch("app.services.gemini_engine.client", mock_client), \
+         patch("app.routers.editor.STUDY_PACK_CONCURRENCY", 6):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            started = time.monotonic()
+            res = await ac.post("/editor/study-pack", json={"text": "Enzymes are catalysts.", "deck_id": deck_id}, headers=HEADERS)
+            elapsed = time.monotonic() - started
+            search = await ac.get("/api/search", params={"q": "activation"}, headers=HEADERS)
+
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert lines[-1] == {"status": "done", "completed": 6, "failed": 0}
+    by_kind = {line["artifact"]: line for line in lines[:-1]}
+    assert set(by_kind) == {"slides", "quiz", "flashcards", "blog", "carousel", "audio_script"}
+    assert by_kind["quiz"]["data"][0]["answer"] == "Enzymes"
+    assert by_kind["blog"]["data"] == "Some prose about enzymes."
+    # Six 0.3s generations ran side by side, not back to back
+    assert elapsed < 1.2
+
+    async with AsyncSessionLocal() as db:
+        saved = (await db.execute(select(DeckArtifact.artifact_type).where(DeckArtifact.deck_id == deck_id))).scalars().all()
+    assert sorted(saved) == sorted(by_kind)
+    assert search.json()["results"][0]["kind"] == "quiz"
+
+@pytest.mark.asyncio
+async def test_study_pack_reports_failures_per_artifact():
+    def flaky(model, contents, config=None):
+        if "quiz" in contents:
+            raise RuntimeError("quota exceeded")
+        return MagicMock(text='[{"front": "a", "back": "b"}]')
+    mock_client = MagicMock()
+    mock_client.models.generate_content.side_effect = flaky
+    with patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            res = await ac.post("/editor/study-pack", json={"text": "Notes", "artifacts": ["quiz", "flashcards"]})
+            bad = await ac.post("/editor/study-pack", json={"text": "Notes", "artifacts": ["poster"]})
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert {"artifact": "quiz", "status": "error", "error": "quota exceeded"} in lines
+    assert lines[-1] == {"status": "done", "completed": 1, "failed": 1}
+    assert bad.status_code == 400
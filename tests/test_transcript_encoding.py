@@ -0,0 +1,39 @@
+import pytest
+import json
+from unittest.mock import MagicMock, patch
+from app.services.gemini_engine import encode_transcript, resolve_timestamp, identify_viral_clips
+
+SEGMENTS = [
+    {"text": "So today we", "start": 0.0, "duration": 1.2},
+    {"text": "talk about entropy.", "start": 1.2, "duration": 1.5},
+    {"text": "It always", "start": 2.7, "duration": 0.2},
+    {"text": "increases!", "start": 2.9, "duration": 1.0},
+    {"text": "Why?", "start": 65.25, "duration": 2.0},
+]
+
+def test_encoder_merges_sentences_and_round_trips():
+    encoded, spans = encode_transcript(SEGMENTS)
+    assert encoded == "[00:00] So today we talk about entropy.\n[00:02] It always increases!\n[01:05] Why?"
+    assert spans["00:02"] == (2.7, 3.9)
+    assert resolve_timestamp("[01:05]", spans) == 65.25
+    assert resolve_timestamp("00:02", spans, edge="end") == 3.9
+    # Times between labels resolve to the containing span
+    assert resolve_timestamp("00:01", spans) == 0.0
+    assert resolve_timestamp(3600, spans) == 3600.0
+    assert resolve_timestamp("soon", spans) is None
+
+def test_encoding_is_much_smaller_than_repr():
+    segments = [{"text": f"word{i} and more", "start": i * 1.37, "duration": 1.37} for i in range(500)]
+    encoded, _ = encode_transcript(segments)
+    assert len(encoded) * 2 < len(str(segments))
+
+@pytest.mark.asyncio
+async def test_clip_answers_are_mapped_back_to_exact_seconds():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text='```json\n[{"start": "[00:02]", "end": "01:05", "viral_score": 80}]\n```')
+    with patch("app.services.gemini_engine.get_transcript", return_value=SEGMENTS), \
+         patch("app.services.gemini_engine.client", mock_client):
+        clips = json.loads(await identify_viral_clips("https://youtube.com/watch?v=123"))
+    assert clips == [{"viral_score": 80, "start_time": 2.7, "end_time": 67.25}]
+    prompt = mock_client.models.generate_content.call_args.kwargs["contents"]
+    assert "[01:05] Why?" in prompt
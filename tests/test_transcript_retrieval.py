@@ -0,0 +1,44 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.services.transcript_index import TranscriptIndex, text_to_spans
+
+def lecture(minutes: int = 120):
+    segments = []
+    for i in range(minutes * 30):
+        text = f"Routine remark number {i} about the course logistics."
+        if i == 3000:
+            text = "The Krebs cycle produces NADH and FADH2 in the mitochondria."
+        segments.append({"text": text, "start": i * 2.0, "duration": 2.0})
+    return segments
+
+def test_bm25_finds_passage_and_overlapping_chunks_merge():
+    spans = text_to_spans(" ".join(f"Sentence {i} is filler." for i in range(200)) + " Photosynthesis happens in chloroplasts.")
+    index = TranscriptIndex(spans, chunk_words=20, overlap_words=8)
+    # Consecutive chunks share spans
+    assert all(b[0] <= a[1] for a, b in zip(index.chunks, index.chunks[1:]))
+    passages = index.passages("where does photosynthesis happen?", k=3)
+    assert len(passages) == 1
+    assert passages[0][-1]["text"] == "Photosynthesis happens in chloroplasts."
+    assert index.passages("quantum chromodynamics") == []
+
+@pytest.mark.asyncio
+async def test_chat_sends_only_relevant_passages_and_caches_index():
+    mock_client = MagicMock()
+    mock_client.models.generate_content.return_value = MagicMock(text="It makes NADH.")
+    with patch("app.services.gemini_engine.get_transcript", return_value=lecture()) as mock_transcript, \
+         patch("app.services.gemini_engine.client", mock_client):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://localhost") as ac:
+            for question in ["What does the Krebs cycle produce?", "Where does the Krebs cycle happen?"]:
+                res = await ac.post("/editor/chat-video", json={
+                    "video_url": "https://youtube.com/watch?v=dQw4w9WgXcQ",
+                    "question": question
+                })
+                assert res.json() == {"answer": "It makes NADH."}
+
+    # Transcript fetched and indexed once for both turns
+    assert mock_transcript.call_count == 1
+    prompt = mock_client.models.generate_content.call_args.kwargs["contents"]
+    assert "[1:40:00] The Krebs cycle produces NADH" in prompt
+    assert len(prompt) < 5000